@@ -0,0 +1,194 @@
+# admission.py
+"""
+Admission control for /upload.
+
+- Per-request limits on body size and patch count (413 when exceeded).
+- A cap on uploads being processed at once (429 + Retry-After when full).
+- A FairScheduler that runs at most `max_concurrent` conversions, with a
+  bounded queue served round-robin per client. One client's huge soundset
+  therefore can't starve a small upload queued behind it; when the queue is
+  full, new work is refused with 429 + Retry-After.
+"""
+
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from config import (
+    UPLOAD_MAX_BYTES,
+    UPLOAD_MAX_PATCHES,
+    UPLOAD_MAX_ACTIVE_REQUESTS,
+    UPLOAD_MAX_QUEUED_PATCHES,
+)
+
+
+class AdmissionError(Exception):
+    """Request refused; carries the HTTP status and an optional Retry-After (seconds)."""
+
+    def __init__(self, message: str, status_code: int = 429, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+
+
+class FairScheduler:
+    """
+    Runs async jobs with bounded concurrency, serving per-client queues round-robin.
+
+    Args:
+        max_concurrent (int): Jobs running at once (e.g. the process pool size).
+        max_queued (int): Jobs waiting across all clients before submit() refuses.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int = UPLOAD_MAX_QUEUED_PATCHES):
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queued = max_queued
+        self._queues: "OrderedDict[str, Deque[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]]]" = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._avg_seconds = 0.0
+
+    def submit(self, client: str, job: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Queue `job` (a coroutine factory) for `client`.
+
+        Returns:
+            Future with the job's result.
+
+        Raises:
+            AdmissionError: 429 with a Retry-After estimate when the queue is full.
+        """
+        if self._queued >= self.max_queued:
+            raise AdmissionError("Conversion queue is full, try again later.", 429, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append((job, future))
+        self._queued += 1
+        self._dispatch()
+        return future
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (at least 1)."""
+        per_job = self._avg_seconds or 1.0
+        return max(1, math.ceil((self._queued + self._running) * per_job / self.max_concurrent))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "queued": self._queued,
+            "clients": len(self._queues),
+            "avg_job_seconds": round(self._avg_seconds, 4),
+        }
+
+    def discard_cancelled(self) -> int:
+        """Drop queued jobs whose futures were cancelled (e.g. a cancelled upload). Returns how many."""
+        dropped = 0
+        for client in list(self._queues):
+            queue = self._queues[client]
+            kept = deque(item for item in queue if not item[1].cancelled())
+            dropped += len(queue) - len(kept)
+            if kept:
+                self._queues[client] = kept
+            else:
+                del self._queues[client]
+        self._queued -= dropped
+        return dropped
+
+    def _dispatch(self) -> None:
+        while self._running < self.max_concurrent and self._queues:
+            client, queue = next(iter(self._queues.items()))
+            job, future = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(client)  # next job goes to the next client
+            else:
+                del self._queues[client]
+
+            if future.cancelled():
+                continue
+
+            self._running += 1
+            task = asyncio.ensure_future(job())
+            task.add_done_callback(lambda t, f=future, s=time.perf_counter(): self._finished(t, f, s))
+
+    def _finished(self, task: asyncio.Task, future: asyncio.Future, started: float) -> None:
+        self._running -= 1
+        elapsed = time.perf_counter() - started
+        self._avg_seconds = elapsed if not self._avg_seconds else 0.9 * self._avg_seconds + 0.1 * elapsed
+
+        if not future.cancelled():
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        self._dispatch()
+
+
+class UploadAdmission:
+    """
+    Per-request limits plus the shared scheduler. Use `async with admission.request(...)`
+    around an upload, then `check_bytes` / `check_patches` while streaming the body.
+    """
+
+    def __init__(self, scheduler: FairScheduler,
+                 max_bytes: int = UPLOAD_MAX_BYTES,
+                 max_patches: int = UPLOAD_MAX_PATCHES,
+                 max_active_requests: int = UPLOAD_MAX_ACTIVE_REQUESTS):
+        self.scheduler = scheduler
+        self.max_bytes = max_bytes
+        self.max_patches = max_patches
+        self.max_active_requests = max_active_requests
+        self.active_requests = 0
+        self.rejected = 0
+
+    def admit(self, content_length: Optional[int]) -> None:
+        """Refuse a request up front if it is too large or too many uploads are in progress."""
+        if content_length is not None:
+            self.check_bytes(content_length)
+        if self.active_requests >= self.max_active_requests:
+            self.rejected += 1
+            raise AdmissionError("Too many uploads in progress, try again later.", 429,
+                                 self.scheduler.retry_after())
+
+    def check_bytes(self, received: int) -> None:
+        if received > self.max_bytes:
+            self.rejected += 1
+            raise AdmissionError(f"Upload exceeds {self.max_bytes / (1 << 20):.1f} MB.", 413)
+
+    def check_patches(self, found: int) -> None:
+        if found > self.max_patches:
+            self.rejected += 1
+            raise AdmissionError(f"Upload contains more than {self.max_patches} patches.", 413)
+
+    def request(self, content_length: Optional[int]) -> "_AdmittedRequest":
+        self.admit(content_length)
+        return _AdmittedRequest(self)
+
+    def enter(self) -> None:
+        """Count an admitted upload as active; for uploads spanning several requests, pair with leave()."""
+        self.active_requests += 1
+
+    def leave(self) -> None:
+        self.active_requests -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active_requests": self.active_requests, "rejected": self.rejected, **self.scheduler.stats()}
+
+
+class _AdmittedRequest:
+    def __init__(self, admission: UploadAdmission):
+        self._admission = admission
+
+    async def __aenter__(self) -> "_AdmittedRequest":
+        self._admission.enter()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._admission.leave()
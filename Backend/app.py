@@ -1,14 +1,20 @@
 import os
 import uuid
-import zipfile
+import atexit
 import shutil
 import logging
+import threading
 
-from flask import Flask, render_template, request, send_file, after_this_request
+from flask import Flask, render_template, request, send_file, after_this_request, jsonify
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 
+from config import UPLOAD_MAX_BYTES, UPLOAD_MAX_PATCHES, UPLOAD_MAX_ACTIVE_REQUESTS, UPLOAD_RETRY_AFTER, CATALOG_PATH
 from sysex_parser import extract_sysex_from_midi
-from virus_to_vital_converter import load_sysex_txt_files, save_vital_patches
+from virus_to_vital_converter import save_vital_patches
+from conversion_pipeline import convert_stream, ingest_txt_folder
+from mapping_registry import get_registry
+from precompressed_zip import get_entry_cache, write_zip
 
 # -------------------------------------------------------------------
 # CONFIG
@@ -25,6 +31,10 @@ os.makedirs(VITAL_OUTPUT_FOLDER, exist_ok=True)
 os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
 
 app = Flask(__name__, template_folder=FRONTEND_TEMPLATES)
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES  # Werkzeug answers 413 above this
+upload_slots = threading.BoundedSemaphore(UPLOAD_MAX_ACTIVE_REQUESTS)
+catalog_lock = threading.Lock()
+_catalog = None  # one PatchCatalog connection for all requests, opened on first upload
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -51,6 +61,40 @@ def index():
 
 @app.route("/upload", methods=["POST"])
 def upload():
+    # Admission control: refuse instead of queueing when every upload slot is busy
+    if not upload_slots.acquire(blocking=False):
+        logging.warning("🚦 Upload refused: server busy")
+        return "Server busy, try again later.", 429, {"Retry-After": str(UPLOAD_RETRY_AFTER)}
+    try:
+        return _handle_upload()
+    finally:
+        upload_slots.release()
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return f"Upload exceeds {UPLOAD_MAX_BYTES / (1 << 20):.1f} MB.", 413
+
+
+@app.route("/mapping", methods=["GET"])
+def mapping_stats():
+    return jsonify(get_registry().stats())
+
+
+@app.route("/mapping/reload", methods=["POST"])
+def mapping_reload():
+    # Recompile virus_to_vital_map in place; a broken edit keeps the previous plan active
+    registry = get_registry()
+    try:
+        stats = registry.reload()
+    except Exception as e:
+        logging.error(f"❌ Mapping reload failed, keeping previous plan: {e}")
+        return jsonify({"error": str(e), **registry.stats()}), 422
+    logging.info(f"🔁 Mapping reloaded in {stats['compile_ms']} ms ({stats['entries']} entries)")
+    return jsonify(stats)
+
+
+def _handle_upload():
     try:
         if "midi_file" not in request.files:
             return "No MIDI file uploaded.", 400
@@ -64,6 +108,7 @@ def upload():
         os.makedirs(session_output_dir, exist_ok=True)
 
         all_vital_files = []
+        total_patches = 0
 
         for file in uploaded_files:
             filename = secure_filename(file.filename)
@@ -76,11 +121,23 @@ def upload():
 
             sysex_files = extract_sysex_from_midi(saved_midi_path, TEMP_SYSEX_FOLDER, verbose=False)
 
+            total_patches += len(sysex_files)
+            if total_patches > UPLOAD_MAX_PATCHES:
+                for sf in sysex_files:
+                    if os.path.exists(sf):
+                        os.remove(sf)
+                os.remove(saved_midi_path)
+                shutil.rmtree(session_output_dir, ignore_errors=True)
+                return f"Upload contains more than {UPLOAD_MAX_PATCHES} patches.", 413
+
             if not sysex_files:
                 logging.info(f"No valid Virus patches found in {saved_midi_path}. Skipping.")
             else:
-                patches = load_sysex_txt_files(TEMP_SYSEX_FOLDER, DEFAULT_VITAL_PATCH)
-                save_vital_patches(patches, session_output_dir)
+                blocks = list(ingest_txt_folder(TEMP_SYSEX_FOLDER))
+                _record_upload([block for _, block in blocks], f"upload:{session_id}/{filename}")
+                with open(DEFAULT_VITAL_PATCH, "r", encoding="utf-8") as f:
+                    patches = convert_stream(blocks, f.read())
+                save_vital_patches(patches, session_output_dir)  # written one at a time as they convert
 
                 # ✅ CLEANUP restored
                 for sf in sysex_files:
@@ -124,9 +181,13 @@ def upload():
             zip_name = "virus_vital_patches.zip"
             zip_path = os.path.join(session_output_dir, zip_name)
 
-            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-                for vfile in all_vital_files:
-                    zf.write(vfile, os.path.basename(vfile))
+            # Identical presets (re-uploads, duplicate patches) are deflated once and then only copied
+            cache = get_entry_cache()
+            entries = []
+            for vfile in all_vital_files:
+                with open(vfile, "rb") as f:
+                    entries.append((os.path.basename(vfile), cache.get_or_compress(f.read())))
+            write_zip(zip_path, entries)
 
             @after_this_request
             def cleanup(response):
@@ -153,11 +214,27 @@ def upload():
             logging.info(f"🎯 Sending ZIP with patches: {zip_path}")
             return send_file(zip_path, as_attachment=True)
 
+    except HTTPException:
+        raise  # e.g. 413 from MAX_CONTENT_LENGTH while reading request.files; Flask renders it
     except Exception as e:
         logging.exception("❌ Error during upload.")
         return f"Internal Server Error: {str(e)}", 500
 
 
+def _record_upload(blocks, source):
+    # Keep a persistent record of uploaded patches; the outputs themselves are deleted after download
+    global _catalog
+    try:
+        with catalog_lock:
+            if _catalog is None:
+                from patch_catalog import PatchCatalog
+                _catalog = PatchCatalog(CATALOG_PATH, check_same_thread=False)
+                atexit.register(_catalog.close)
+            _catalog.add_blocks(blocks, source)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not record upload in catalog: {e}")
+
+
 def cleanup_folders():
     try:
         if os.path.exists(TEMP_SYSEX_FOLDER):
@@ -0,0 +1,847 @@
+# asgi_app.py
+"""
+Async (ASGI) variant of the upload service.
+
+Upload bodies are scanned for Virus dumps while they stream in, patches
+convert in a process pool (which maps the shared template/tables from
+shared_assets) under admission control, and results are streamed back as
+they complete. Converted presets are cached deflated, so ZIPs are
+assembled by copying stored bytes. Slow clients only hold a coroutine,
+never a CPU worker. See each route handler for its endpoint and the
+README for the upload protocols.
+
+Run from the Backend folder:
+    uvicorn asgi_app:app --port 5000
+"""
+
+import io
+import os
+import sys
+import math
+import asyncio
+import logging
+import uuid
+import hashlib
+import threading
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import AsyncIterator, List, Optional, Union
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+
+from config import DEFAULT_VITAL_PRESET_PATH, VITAL_OUTPUT_COMPACT, STREAM_MAX_IN_FLIGHT, UPLOAD_WORKERS, \
+    CATALOG_PATH, SIMILARITY_DUP_THRESHOLD, CHUNKED_UPLOAD_PARALLEL, CHUNKED_UPLOAD_SWEEP_INTERVAL, BATCH_TASK_SIZE
+from sysex_parser import SysExStreamScanner, VIRUS_PARAM_BLOCK_SIZE
+from admission import AdmissionError, FairScheduler, UploadAdmission
+from mapping_registry import get_registry
+from precompressed_zip import CompressedEntry, compress_entry, get_entry_cache, gzip_member, ZipAssembler
+from batch_frames import FRAME_ERROR, FRAME_PRESET, encode_frame
+from upload_progress import FINAL_STATES, ProgressRegistry, UploadCancelled, UploadProgress
+from chunked_upload import ChunkError, SessionStore, UploadSession
+
+FRONTEND_TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Frontend", "templates")
+
+templates = Jinja2Templates(directory=FRONTEND_TEMPLATES)
+
+# -------------------------------------------------------------------
+# Worker side
+# -------------------------------------------------------------------
+_worker_template: Optional[str] = None
+
+
+def _init_worker(asset_layout, mapping_sources) -> None:
+    from shared_assets import attach_shared_assets
+    from mapping_registry import install_sources
+
+    global _worker_template
+    _worker_template = attach_shared_assets(asset_layout)
+    # The parent's accepted map, not whatever is on disk now
+    install_sources(mapping_sources)
+
+
+def _convert_block(param_block: bytes, mapping_token: str, mapping_sources=None) -> CompressedEntry:
+    """
+    Convert one parameter block in a worker process; returns the preset JSON, deflated for the ZIP.
+    `mapping_token` is the parent's mapping plan; `mapping_sources` comes along once the parent
+    has reloaded since the pool started (see MappingRegistry.ensure).
+    """
+    from virus_to_vital_converter import convert_param_block
+    from mapping_registry import get_registry
+
+    get_registry().ensure(mapping_token, mapping_sources)
+    with contextlib.redirect_stdout(io.StringIO()):
+        preset = convert_param_block(param_block, _worker_template, VITAL_OUTPUT_COMPACT).encode("utf-8")
+    return compress_entry(preset)
+
+
+def _convert_batch(param_blocks: List[bytes], mapping_token: str,
+                   mapping_sources=None) -> List[Union[CompressedEntry, str]]:
+    """
+    Convert several blocks in one worker call (one round-trip instead of one per patch).
+    A block that fails yields its error message instead of an entry.
+    """
+    from virus_to_vital_converter import convert_param_block
+    from mapping_registry import get_registry
+
+    get_registry().ensure(mapping_token, mapping_sources)
+    results: List[Union[CompressedEntry, str]] = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for param_block in param_blocks:
+            try:
+                preset = convert_param_block(param_block, _worker_template, VITAL_OUTPUT_COMPACT)
+                results.append(compress_entry(preset.encode("utf-8")))
+            except Exception as e:
+                results.append(f"{type(e).__name__}: {e}")
+    return results
+
+
+# -------------------------------------------------------------------
+# Patch catalog
+# -------------------------------------------------------------------
+_catalog = None  # one PatchCatalog connection for all requests, opened on first upload
+_catalog_lock = threading.Lock()
+
+
+def _record_upload(blocks: List[bytes], source: str) -> None:
+    """Keep a persistent record of uploaded patches (runs in a thread; the presets themselves aren't kept)."""
+    global _catalog
+    try:
+        with _catalog_lock:
+            if _catalog is None:
+                from patch_catalog import PatchCatalog
+                _catalog = PatchCatalog(CATALOG_PATH, check_same_thread=False)
+            _catalog.add_blocks(blocks, source)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not record upload in catalog: {e}")
+
+
+def _close_catalog() -> None:
+    global _catalog
+    with _catalog_lock:
+        if _catalog is not None:
+            _catalog.close()
+            _catalog = None
+
+
+# -------------------------------------------------------------------
+# Conversions of one upload job
+# -------------------------------------------------------------------
+def _entry_key(param_block: bytes, mapping_token: str, template_version: str) -> str:
+    """Cache key for a converted preset: same block, mapping, template and output format → same bytes."""
+    digest = hashlib.sha1(param_block)
+    digest.update(f"{mapping_token}:{template_version}:{int(VITAL_OUTPUT_COMPACT)}".encode())
+    return digest.hexdigest()
+
+
+class _Conversions:
+    """
+    Patches of one upload job: cache lookups, fair submission to the process pool
+    (at most STREAM_MAX_IN_FLIGHT at once), progress counting and the catalog record.
+    """
+
+    def __init__(self, app: Starlette, client: str, progress: UploadProgress):
+        self.loop = asyncio.get_running_loop()
+        self.pool: ProcessPoolExecutor = app.state.pool
+        self.admission: UploadAdmission = app.state.admission
+        self.client = client
+        self.progress = progress
+        self.cache = get_entry_cache()
+        registry = get_registry()
+        self.mapping_token = registry.sources.token
+        # Workers started with the pool's sources; once the parent has reloaded, some workers may
+        # have moved on (even if the map was reverted to the start token), so always ship the text
+        self.mapping_sources = registry.sources if registry.reloads else None
+        self.template_version = app.state.template_version
+        self.in_flight = asyncio.Semaphore(STREAM_MAX_IN_FLIGHT)
+        self.futures: List["asyncio.Future[CompressedEntry]"] = []
+        self.blocks: List[bytes] = []
+        self._batches: List[asyncio.Future] = []
+
+    async def _convert(self, block: bytes, key: str) -> CompressedEntry:
+        try:
+            entry = await self.loop.run_in_executor(
+                self.pool, _convert_block, block, self.mapping_token, self.mapping_sources)
+        finally:
+            self.in_flight.release()
+        self.cache.put(key, entry)
+        self.progress.converted()
+        return entry
+
+    async def add(self, block: bytes) -> "asyncio.Future[CompressedEntry]":
+        """
+        Queue one parameter block; waits while this job's conversions are saturated,
+        which stops the caller from reading more of the upload (backpressure).
+
+        Raises:
+            UploadCancelled, AdmissionError
+        """
+        self.progress.check_cancelled()
+        self.admission.check_patches(len(self.futures) + 1)
+        self.progress.update(patches_found=len(self.futures) + 1)
+        key = _entry_key(block, self.mapping_token, self.template_version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            future = self.loop.create_future()
+            future.set_result(cached)
+            self.progress.converted()
+        else:
+            await self.in_flight.acquire()
+            try:
+                future = self.admission.scheduler.submit(self.client, partial(self._convert, block, key))
+            except AdmissionError:
+                self.in_flight.release()
+                raise
+        self.futures.append(future)
+        self.blocks.append(block)
+        return future
+
+    async def _convert_batch(self, blocks: List[bytes], keys: List[str],
+                             futures: List["asyncio.Future[CompressedEntry]"]) -> None:
+        try:
+            results = await self.loop.run_in_executor(
+                self.pool, _convert_batch, blocks, self.mapping_token, self.mapping_sources)
+        finally:
+            self.in_flight.release()
+        for key, result, future in zip(keys, results, futures):
+            if future.done():
+                continue
+            if isinstance(result, str):
+                future.set_exception(RuntimeError(result))
+            else:
+                self.cache.put(key, result)
+                future.set_result(result)
+            self.progress.converted()
+
+    @staticmethod
+    def _batch_done(futures: List[asyncio.Future], job: asyncio.Future) -> None:
+        # The pool task failed or was dropped: its blocks share that fate
+        for future in futures:
+            if future.done():
+                continue
+            if job.cancelled():
+                future.cancel()
+            elif job.exception() is not None:
+                future.set_exception(job.exception())
+
+    async def add_batch(self, blocks: List[bytes]) -> List["asyncio.Future[CompressedEntry]"]:
+        """
+        Like add() for several blocks, with the cache misses converted as one pool task.
+        A failed block's future raises RuntimeError with the worker's message.
+        """
+        self.progress.check_cancelled()
+        self.admission.check_patches(len(self.futures) + len(blocks))
+        self.progress.update(patches_found=len(self.futures) + len(blocks))
+        futures, missing, keys, pending = [], [], [], []
+        for block in blocks:
+            key = _entry_key(block, self.mapping_token, self.template_version)
+            future = self.loop.create_future()
+            cached = self.cache.get(key)
+            if cached is not None:
+                future.set_result(cached)
+                self.progress.converted()
+            else:
+                missing.append(block)
+                keys.append(key)
+                pending.append(future)
+            futures.append(future)
+
+        if missing:
+            await self.in_flight.acquire()
+            try:
+                job = self.admission.scheduler.submit(self.client, partial(self._convert_batch, missing, keys, pending))
+            except AdmissionError:
+                self.in_flight.release()
+                raise
+            job.add_done_callback(partial(self._batch_done, pending))
+            self._batches.append(job)
+        self.futures.extend(futures)
+        self.blocks.extend(blocks)
+        return futures
+
+    def record(self, source: str, results: Optional[List[asyncio.Future]] = None) -> None:
+        """
+        Add every block of this job to the patch catalog, in the background.
+
+        Args:
+            source: Catalog source name for the upload.
+            results: The job's futures in output order, if that isn't the order blocks were added in.
+        """
+        blocks = self.blocks
+        if results is not None:
+            block_of = {id(future): block for future, block in zip(self.futures, self.blocks)}
+            blocks = [block_of[id(future)] for future in results]
+        if blocks:
+            self.loop.run_in_executor(None, _record_upload, list(blocks), source)
+
+    def cancel(self) -> None:
+        """Drop every conversion nobody will read."""
+        for future in self.futures + self._batches:
+            future.cancel()
+        self.admission.scheduler.discard_cancelled()
+
+    def fail(self, error: Exception) -> None:
+        self.cancel()
+        self.progress.update(state="failed", error=str(error) or type(error).__name__)
+
+    async def response(self, results: List["asyncio.Future[CompressedEntry]"]) -> Response:
+        """The converted presets: one .vital, or a ZIP streamed as results complete."""
+        job_header = {"X-Upload-Job": self.progress.job}
+        if not results:
+            self.fail(ValueError("No valid Virus patches found."))
+            return PlainTextResponse("No valid Virus patches found.", status_code=400, headers=job_header)
+
+        self.progress.update(state="converting")
+        names = [f"patch_{i:03}.vital" for i in range(1, len(results) + 1)]
+        if len(results) == 1:
+            try:
+                preset = (await results[0]).decompress()
+            except Exception as e:
+                self.fail(e)
+                raise
+            self.progress.sent(len(preset))
+            self.progress.update(state="done")
+            return Response(preset, media_type="application/octet-stream",
+                            headers={"Content-Disposition": f'attachment; filename="{names[0]}"', **job_header})
+
+        return StreamingResponse(self._zip_stream(names, results), media_type="application/zip",
+                                 headers={"Content-Disposition": 'attachment; filename="virus_vital_patches.zip"',
+                                          **job_header})
+
+    async def _zip_stream(self, names: List[str],
+                          results: List["asyncio.Future[CompressedEntry]"]) -> AsyncIterator[bytes]:
+        # Entries arrive deflated, so assembling the ZIP is only header packing and copying
+        progress = self.progress
+        assembler = ZipAssembler()
+        try:
+            for name, result in zip(names, results):
+                entry = await result
+                progress.check_cancelled()
+                chunk = assembler.add(name, entry)
+                yield chunk
+                progress.sent(len(chunk))
+            chunk = assembler.finish()
+            yield chunk
+            progress.sent(len(chunk))
+            progress.update(state="done")
+            logging.info(f"📈 Upload {progress.job}: {len(names)} patch(es), first result after "
+                         f"{progress.first_result_ms} ms, first byte after {progress.first_byte_ms} ms")
+        except UploadCancelled:
+            logging.info(f"🛑 Upload {progress.job} cancelled while sending")
+        except Exception as e:
+            progress.update(state="failed", error=str(e) or type(e).__name__)
+            raise
+        finally:
+            # Client gone or job cancelled: drop conversions nobody will read
+            self.cancel()
+            if progress.state not in FINAL_STATES:
+                progress.update(state="failed", error="Connection closed before the ZIP was complete")
+
+
+def _new_job(request: Request) -> UploadProgress:
+    """
+    Progress for the job named by ?job= (or a fresh one).
+
+    Raises:
+        AdmissionError: 400 for a bad job id, 409 if the job was already used.
+    """
+    try:
+        progress = request.app.state.progress.get(request.query_params.get("job") or uuid.uuid4().hex)
+    except ValueError as e:
+        raise AdmissionError(str(e), 400) from None
+    if progress.state != "waiting":
+        raise AdmissionError(f"Upload job {progress.job} already exists.", 409)
+    return progress
+
+
+def _client(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def _content_length(request: Request) -> Optional[int]:
+    """
+    The declared body size, if any.
+
+    Raises:
+        AdmissionError: 400 for a malformed Content-Length header.
+    """
+    value = request.headers.get("content-length")
+    if value is None:
+        return None
+    try:
+        length = int(value)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise AdmissionError("Invalid Content-Length header.", 400)
+    return length
+
+
+async def _receive(request: Request, admission: UploadAdmission,
+                   progress: Optional[UploadProgress] = None) -> AsyncIterator[bytes]:
+    """
+    The request body chunk by chunk, checking cancellation and the byte cap and
+    counting received bytes before each chunk is handed on.
+
+    Raises:
+        UploadCancelled, AdmissionError
+    """
+    received = 0
+    async for chunk in request.stream():
+        if progress is not None:
+            progress.check_cancelled()
+        received += len(chunk)
+        admission.check_bytes(received)
+        if progress is not None:
+            progress.update(bytes_received=received)
+        yield chunk
+
+
+async def _packed_blocks(body: AsyncIterator[bytes], group: int = 1) -> AsyncIterator[bytes]:
+    """
+    Packed parameter blocks from `body`, `group` blocks at a time (the last group may be shorter).
+
+    Raises:
+        AdmissionError: 400 if the body isn't a whole number of blocks.
+    """
+    size = VIRUS_PARAM_BLOCK_SIZE * group
+    buffer = bytearray()
+    async for chunk in body:
+        buffer += chunk
+        whole = len(buffer) - len(buffer) % size
+        for start in range(0, whole, size):
+            yield bytes(buffer[start:start + size])
+        del buffer[:whole]
+    if len(buffer) % VIRUS_PARAM_BLOCK_SIZE:
+        raise AdmissionError(f"Body must be a multiple of {VIRUS_PARAM_BLOCK_SIZE} bytes.", 400)
+    if buffer:
+        yield bytes(buffer)
+
+
+# -------------------------------------------------------------------
+# Routes
+# -------------------------------------------------------------------
+async def index(request: Request) -> Response:
+    return templates.TemplateResponse(request, "index.html")
+
+
+async def upload(request: Request) -> Response:
+    """
+    POST /upload?job=<job>: a multipart form or a raw .mid/.syx body, scanned as it
+    streams in. Responds with one .vital or a ZIP streamed as conversions complete.
+    """
+    admission: UploadAdmission = request.app.state.admission
+    client = _client(request)
+    scanner = SysExStreamScanner()
+    try:
+        content_length = _content_length(request)
+        progress = _new_job(request)
+    except AdmissionError as e:
+        return PlainTextResponse(str(e), status_code=e.status_code)
+    conversions = _Conversions(request.app, client, progress)
+    job_header = {"X-Upload-Job": progress.job}
+
+    progress.start(content_length)
+    try:
+        async with admission.request(content_length):
+            async for chunk in _receive(request, admission, progress):
+                for block in scanner.feed(chunk):
+                    await conversions.add(block)
+    except AdmissionError as e:
+        conversions.fail(e)
+        logging.warning(f"🚦 Refused upload from {client}: {e} ({e.status_code})")
+        return PlainTextResponse(str(e), status_code=e.status_code, headers={**e.headers(), **job_header})
+    except UploadCancelled as e:
+        conversions.cancel()
+        logging.info(f"🛑 {e} after {scanner.bytes_seen} bytes")
+        # 499 = client closed request (nginx); the page has usually aborted already
+        return PlainTextResponse("Upload cancelled.", status_code=499, headers=job_header)
+    except Exception as e:
+        conversions.fail(e)
+        raise
+
+    logging.info(f"📥 Streamed {scanner.bytes_seen} bytes, found {len(conversions.futures)} Virus patch(es)")
+    conversions.record(f"upload:{progress.job}")
+    return await conversions.response(conversions.futures)
+
+
+async def upload_blocks(request: Request) -> Response:
+    """
+    Compact upload: the body is N packed 256-byte Virus parameter blocks (what the page
+    extracts from .mid files in the browser). Same response as /upload; no scanning needed.
+    """
+    admission: UploadAdmission = request.app.state.admission
+    client = _client(request)
+    try:
+        content_length = _content_length(request)
+        if content_length and content_length % VIRUS_PARAM_BLOCK_SIZE:
+            raise AdmissionError(f"Body must be a multiple of {VIRUS_PARAM_BLOCK_SIZE} bytes.", 400)
+        progress = _new_job(request)
+    except AdmissionError as e:
+        return PlainTextResponse(str(e), status_code=e.status_code)
+    conversions = _Conversions(request.app, client, progress)
+    job_header = {"X-Upload-Job": progress.job}
+
+    progress.start(content_length)
+    try:
+        async with admission.request(content_length):
+            async for block in _packed_blocks(_receive(request, admission, progress)):
+                await conversions.add(block)
+    except AdmissionError as e:
+        conversions.fail(e)
+        logging.warning(f"🚦 Refused block upload from {client}: {e} ({e.status_code})")
+        return PlainTextResponse(str(e), status_code=e.status_code, headers={**e.headers(), **job_header})
+    except UploadCancelled as e:
+        conversions.cancel()
+        logging.info(f"🛑 {e} after {progress.bytes_received} bytes")
+        return PlainTextResponse("Upload cancelled.", status_code=499, headers=job_header)
+    except Exception as e:
+        conversions.fail(e)
+        raise
+
+    logging.info(f"📥 Received {len(conversions.futures)} packed Virus patch(es) ({progress.bytes_received} bytes)")
+    conversions.record(f"upload:{progress.job}")
+    return await conversions.response(conversions.futures)
+
+
+async def convert_batch(request: Request) -> Response:
+    """
+    Programmatic batch conversion: N packed 256-byte blocks in, N length-prefixed
+    frames out (gzip-compressed .vital or an error message per block; see batch_frames).
+    Cache misses go to the pool BATCH_TASK_SIZE blocks per task; frames stream in order.
+    """
+    admission: UploadAdmission = request.app.state.admission
+    client = _client(request)
+    try:
+        content_length = _content_length(request)
+        if content_length and content_length % VIRUS_PARAM_BLOCK_SIZE:
+            raise AdmissionError(f"Body must be a multiple of {VIRUS_PARAM_BLOCK_SIZE} bytes.", 400)
+        progress = _new_job(request)
+    except AdmissionError as e:
+        return PlainTextResponse(str(e), status_code=e.status_code)
+    conversions = _Conversions(request.app, client, progress)
+
+    progress.start(content_length)
+    try:
+        async with admission.request(content_length):
+            async for group in _packed_blocks(_receive(request, admission, progress), BATCH_TASK_SIZE):
+                await conversions.add_batch(_split_blocks(group))
+    except AdmissionError as e:
+        conversions.fail(e)
+        logging.warning(f"🚦 Refused batch from {client}: {e} ({e.status_code})")
+        return PlainTextResponse(str(e), status_code=e.status_code, headers=e.headers())
+    except UploadCancelled:
+        conversions.cancel()
+        return PlainTextResponse("Upload cancelled.", status_code=499)
+    except Exception as e:
+        conversions.fail(e)
+        raise
+
+    if not conversions.futures:
+        conversions.fail(ValueError("No valid Virus patches found."))
+        return PlainTextResponse("No valid Virus patches found.", status_code=400,
+                                 headers={"X-Upload-Job": progress.job})
+
+    logging.info(f"📦 Batch of {len(conversions.futures)} block(s) from {client}")
+    conversions.record(f"batch:{progress.job}")
+    progress.update(state="converting")
+    return StreamingResponse(_batch_frames(conversions), media_type="application/octet-stream",
+                             headers={"X-Upload-Job": progress.job, "X-Batch-Count": str(len(conversions.futures))})
+
+
+def _split_blocks(data: bytes) -> List[bytes]:
+    return [bytes(data[i:i + VIRUS_PARAM_BLOCK_SIZE]) for i in range(0, len(data), VIRUS_PARAM_BLOCK_SIZE)]
+
+
+async def _batch_frames(conversions: _Conversions) -> AsyncIterator[bytes]:
+    progress = conversions.progress
+    try:
+        for future in conversions.futures:
+            try:
+                frame = encode_frame(FRAME_PRESET, gzip_member(await future))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                frame = encode_frame(FRAME_ERROR, str(e).encode("utf-8"))
+            progress.check_cancelled()
+            yield frame
+            progress.sent(len(frame))
+        progress.update(state="done")
+    except UploadCancelled:
+        logging.info(f"🛑 Batch {progress.job} cancelled while sending")
+    finally:
+        conversions.cancel()
+        if progress.state not in FINAL_STATES:
+            progress.update(state="failed", error="Connection closed before the batch was complete")
+
+
+async def upload_progress(request: Request) -> Response:
+    """Server-Sent Events for an upload job; subscribe before (or while) posting to /upload?job=<job>."""
+    try:
+        progress = request.app.state.progress.get(request.path_params["job"])
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+    return StreamingResponse(progress.events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def cancel_upload(request: Request) -> Response:
+    """Stop a job: its upload is refused from the next chunk on and its queued conversions are dropped."""
+    progress = request.app.state.progress.find(request.path_params["job"])
+    if progress is None:
+        return PlainTextResponse("Unknown upload job.", status_code=404)
+    progress.cancel()
+    return JSONResponse(progress.snapshot())
+
+
+async def chunked_start(request: Request) -> Response:
+    """Open a resumable upload: {"files": [{"name": ..., "size": ...}, ...]} → session id and chunk size."""
+    admission: UploadAdmission = request.app.state.admission
+    uploads: SessionStore = request.app.state.uploads
+    try:
+        files = [(str(f["name"]), f["size"]) for f in (await request.json())["files"]]
+    except (ValueError, KeyError, TypeError):
+        return PlainTextResponse('Expected {"files": [{"name": ..., "size": ...}, ...]}.', status_code=400)
+
+    total_size = sum(size for _, size in files if isinstance(size, int))
+    try:
+        # Counts against the same active-upload cap as /upload until finished, deleted or expired
+        admission.admit(total_size)
+        progress = _new_job(request)
+        conversions = _Conversions(request.app, _client(request), progress)
+        session = uploads.create(files, conversions.add, context=conversions,
+                                 on_progress=lambda received, _: progress.update(bytes_received=received))
+    except (AdmissionError, ChunkError) as e:
+        headers = e.headers() if isinstance(e, AdmissionError) else {}
+        return PlainTextResponse(str(e), status_code=e.status_code, headers=headers)
+    admission.enter()
+
+    progress.start(session.total_size)
+    logging.info(f"📤 Chunked upload {session.id} opened: {len(files)} file(s), {session.total_size} bytes")
+    return JSONResponse({**session.status(), "job": progress.job, "parallel": CHUNKED_UPLOAD_PARALLEL},
+                        status_code=201)
+
+
+def _find_session(request: Request) -> Optional[UploadSession]:
+    try:
+        return request.app.state.uploads.get(request.path_params["upload"])
+    except KeyError:
+        return None
+
+
+async def chunked_status(request: Request) -> Response:
+    """Received bytes and early chunks per file, so a client can resume."""
+    session = _find_session(request)
+    if session is None:
+        return PlainTextResponse("Unknown or expired upload.", status_code=404)
+    return JSONResponse(session.status())
+
+
+async def chunked_put(request: Request) -> Response:
+    """One chunk of one file: PUT /uploads/<id>/<file index>?offset=<byte offset>."""
+    uploads: SessionStore = request.app.state.uploads
+    session = _find_session(request)
+    if session is None:
+        return PlainTextResponse("Unknown or expired upload.", status_code=404)
+    try:
+        offset = int(request.query_params["offset"])
+    except (KeyError, ValueError):
+        return PlainTextResponse("offset query parameter required.", status_code=400)
+
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > session.chunk_size:
+            return PlainTextResponse(f"Chunks may be at most {session.chunk_size} bytes.", status_code=413)
+
+    conversions: _Conversions = session.context
+    try:
+        status = await session.put_chunk(request.path_params["file"], offset, bytes(data))
+    except ChunkError as e:
+        headers = {"Retry-After": "1"} if e.status_code == 429 else {}
+        return PlainTextResponse(str(e), status_code=e.status_code, headers=headers)
+    except AdmissionError as e:
+        uploads.remove(session.id)
+        conversions.fail(e)
+        logging.warning(f"🚦 Refused chunked upload {session.id}: {e} ({e.status_code})")
+        return PlainTextResponse(str(e), status_code=e.status_code, headers=e.headers())
+    except UploadCancelled as e:
+        uploads.remove(session.id)
+        conversions.cancel()
+        logging.info(f"🛑 {e} after {session.bytes_received} bytes")
+        return PlainTextResponse("Upload cancelled.", status_code=499)
+    return JSONResponse(status)
+
+
+async def chunked_finish(request: Request) -> Response:
+    """All chunks are in: respond with the presets (conversions have been running all along)."""
+    uploads: SessionStore = request.app.state.uploads
+    session = _find_session(request)
+    if session is None:
+        return PlainTextResponse("Unknown or expired upload.", status_code=404)
+    try:
+        results = await session.results()
+    except ChunkError:
+        return JSONResponse(session.status(), status_code=409)
+
+    uploads.remove(session.id)
+    logging.info(f"📥 Chunked upload {session.id}: {session.total_size} bytes, {len(results)} Virus patch(es)")
+    conversions: _Conversions = session.context
+    conversions.record(f"upload:{conversions.progress.job}/" + "+".join(f.name for f in session.files), results)
+    return await conversions.response(results)
+
+
+async def chunked_delete(request: Request) -> Response:
+    """Abandon a chunked upload and drop its queued conversions."""
+    session = request.app.state.uploads.remove(request.path_params["upload"])
+    if session is None:
+        return PlainTextResponse("Unknown or expired upload.", status_code=404)
+    session.context.progress.cancel()
+    session.context.cancel()
+    return Response(status_code=204)
+
+
+def _expire_upload(session: UploadSession) -> None:
+    conversions: _Conversions = session.context
+    conversions.fail(TimeoutError("Upload expired before it was finished"))
+    logging.info(f"⌛ Chunked upload {session.id} expired after {session.bytes_received} bytes")
+
+
+async def _sweep_uploads(uploads: SessionStore) -> None:
+    # Abandoned sessions hold their buffered chunks and converted presets until swept
+    while True:
+        await asyncio.sleep(CHUNKED_UPLOAD_SWEEP_INTERVAL)
+        uploads.expire()
+
+
+async def dedup(request: Request) -> Response:
+    """
+    Near-duplicate report for an uploaded bank (raw .mid/.syx body), so it can be
+    trimmed before conversion. Optional query parameters: threshold, method=exact|lsh.
+    """
+    from virus_bank import VirusBank
+    from patch_similarity import find_duplicates
+
+    admission: UploadAdmission = request.app.state.admission
+    scanner = SysExStreamScanner()
+    blocks: List[bytes] = []
+    try:
+        threshold = float(request.query_params.get("threshold", SIMILARITY_DUP_THRESHOLD))
+    except ValueError:
+        threshold = math.nan
+    if not 0.0 <= threshold <= 1.0:  # also rejects nan
+        return PlainTextResponse("threshold must be a number from 0 to 1.", status_code=400)
+    methods = {None: None, "exact": False, "lsh": True}
+    method = request.query_params.get("method")
+    if method not in methods:
+        return PlainTextResponse("method must be exact or lsh.", status_code=400)
+
+    try:
+        # The O(N²) comparison runs inside the admitted request, so it counts against the cap
+        async with admission.request(_content_length(request)):
+            async for chunk in _receive(request, admission):
+                blocks.extend(scanner.feed(chunk))
+                admission.check_patches(len(blocks))
+
+            if not blocks:
+                return PlainTextResponse("No valid Virus patches found.", status_code=400)
+            bank = VirusBank.from_blocks(blocks)
+            report = await asyncio.get_running_loop().run_in_executor(
+                None, partial(find_duplicates, bank.blocks, threshold, methods[method], bank.names))
+    except AdmissionError as e:
+        return PlainTextResponse(str(e), status_code=e.status_code, headers=e.headers())
+    return JSONResponse(report)
+
+
+async def admission_stats(request: Request) -> Response:
+    """Active uploads, rejections and the fair scheduler's queue."""
+    return JSONResponse(request.app.state.admission.stats())
+
+
+async def entry_cache_stats(request: Request) -> Response:
+    """Size, hits and misses of the converted-preset cache (see precompressed_zip)."""
+    return JSONResponse(get_entry_cache().stats())
+
+
+async def mapping_stats(request: Request) -> Response:
+    """Token, entry counts and compile time of the active mapping plan (see mapping_registry)."""
+    return JSONResponse(get_registry().stats())
+
+
+async def mapping_reload(request: Request) -> Response:
+    """Recompile virus_to_vital_map without a restart; workers pick it up on their next patch."""
+    registry = get_registry()
+    try:
+        stats = await asyncio.get_running_loop().run_in_executor(None, registry.reload)
+    except Exception as e:
+        logging.error(f"❌ Mapping reload failed, keeping previous plan: {e}")
+        return JSONResponse({"error": str(e), **registry.stats()}, status_code=422)
+    logging.info(f"🔁 Mapping reloaded in {stats['compile_ms']} ms ({stats['entries']} entries)")
+    return JSONResponse(stats)
+
+
+# -------------------------------------------------------------------
+# App
+# -------------------------------------------------------------------
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    from shared_assets import build_shared_assets, release_shared_assets
+
+    workers = UPLOAD_WORKERS or os.cpu_count() or 1
+    asset_layout = build_shared_assets(DEFAULT_VITAL_PRESET_PATH)
+    with open(DEFAULT_VITAL_PRESET_PATH, "rb") as f:
+        app.state.template_version = hashlib.sha1(f.read()).hexdigest()
+    app.state.pool = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(asset_layout, get_registry().sources),
+    )
+    # One queued conversion per worker keeps the pool busy without letting one client hog it
+    app.state.admission = UploadAdmission(FairScheduler(max_concurrent=workers * 2))
+    app.state.progress = ProgressRegistry()
+    app.state.uploads = SessionStore(on_expire=_expire_upload,
+                                     on_close=lambda session: app.state.admission.leave())
+    sweeper = asyncio.create_task(_sweep_uploads(app.state.uploads))
+    logging.info("🚀 ASGI app started, conversion pool ready.")
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        app.state.pool.shutdown(cancel_futures=True)
+        _close_catalog()
+        release_shared_assets(asset_layout)
+
+
+app = Starlette(
+    routes=[
+        Route("/", index, methods=["GET"]),
+        Route("/upload", upload, methods=["POST"]),
+        Route("/upload/blocks", upload_blocks, methods=["POST"]),
+        Route("/convert/batch", convert_batch, methods=["POST"]),
+        Route("/uploads", chunked_start, methods=["POST"]),
+        Route("/uploads/{upload}", chunked_status, methods=["GET"]),
+        Route("/uploads/{upload}", chunked_delete, methods=["DELETE"]),
+        Route("/uploads/{upload}/finish", chunked_finish, methods=["POST"]),
+        Route("/uploads/{upload}/{file:int}", chunked_put, methods=["PUT"]),
+        Route("/progress/{job}", upload_progress, methods=["GET"]),
+        Route("/progress/{job}/cancel", cancel_upload, methods=["POST"]),
+        Route("/dedup", dedup, methods=["POST"]),
+        Route("/admission", admission_stats, methods=["GET"]),
+        Route("/cache", entry_cache_stats, methods=["GET"]),
+        Route("/mapping", mapping_stats, methods=["GET"]),
+        Route("/mapping/reload", mapping_reload, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s",
+                        stream=sys.stdout)
+    uvicorn.run(app, port=5000)
@@ -0,0 +1,68 @@
+# batch_frames.py
+"""
+Binary framing for POST /convert/batch (ASGI app), for scripts and pipelines.
+
+Request body: N packed 256-byte Virus parameter blocks, e.g.
+    b"".join(extract_param_blocks_from_midi("bank.mid"))
+
+Response: exactly N frames, in request order:
+    uint32 big-endian payload length | uint8 kind | payload
+
+    kind 0 (FRAME_PRESET): the .vital JSON as a gzip member (gzip.decompress)
+    kind 1 (FRAME_ERROR):  UTF-8 message explaining why that block failed
+
+    for preset in iter_presets(response.raw):
+        ...
+"""
+
+import io
+import gzip
+import struct
+from typing import BinaryIO, Iterator, Tuple, Union
+
+FRAME_HEADER = struct.Struct(">IB")
+FRAME_PRESET = 0
+FRAME_ERROR = 1
+
+
+class BatchError(Exception):
+    """A block in a batch could not be converted."""
+
+
+def encode_frame(kind: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload), kind) + payload
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        part = stream.read(size - len(data))
+        if not part:
+            raise EOFError(f"Batch response ended mid-frame ({len(data)} of {size} bytes)")
+        data += part
+    return bytes(data)
+
+
+def iter_frames(source: Union[bytes, BinaryIO]) -> Iterator[Tuple[int, bytes]]:
+    """Yield (kind, payload) for every frame of a batch response (bytes or a readable stream)."""
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < FRAME_HEADER.size:
+            header += _read_exactly(stream, FRAME_HEADER.size - len(header))
+        length, kind = FRAME_HEADER.unpack(header)
+        yield kind, _read_exactly(stream, length)
+
+
+def iter_presets(source: Union[bytes, BinaryIO]) -> Iterator[Union[str, BatchError]]:
+    """
+    Preset JSON text per block, in request order; failed blocks yield a BatchError
+    (returned, not raised, so one bad patch doesn't end the batch).
+    """
+    for kind, payload in iter_frames(source):
+        if kind == FRAME_PRESET:
+            yield gzip.decompress(payload).decode("utf-8")
+        else:
+            yield BatchError(payload.decode("utf-8", "replace"))
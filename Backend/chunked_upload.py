@@ -0,0 +1,227 @@
+# chunked_upload.py
+"""
+Resumable, chunked uploads that feed the SysEx scanner as chunks land (ASGI app).
+
+    POST   /uploads?job=<job>         {"files": [{"name", "size"}, ...]}  → session id, chunk size
+    PUT    /uploads/<id>/<file>?offset=N   one chunk (any order, in parallel)
+    GET    /uploads/<id>              what has been received (to resume)
+    POST   /uploads/<id>/finish       the converted presets (.vital or ZIP)
+    DELETE /uploads/<id>              drop the session
+
+Each file has its own SysExStreamScanner. Chunks that arrive ahead of the
+next expected offset wait in memory (bounded per session); as soon as the
+gap is filled they are fed in order, and every completed patch is handed to
+`on_block` (which queues its conversion). Conversion therefore runs while
+the rest of the upload is still arriving. A retried chunk that was already
+received is acknowledged and ignored, so clients can resume after a dropped
+connection by re-sending whatever GET /uploads/<id> doesn't list.
+"""
+
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import (
+    CHUNKED_UPLOAD_CHUNK_SIZE,
+    CHUNKED_UPLOAD_MAX_AHEAD,
+    CHUNKED_UPLOAD_MAX_SESSIONS,
+    CHUNKED_UPLOAD_TTL,
+)
+from sysex_parser import SysExStreamScanner
+
+BlockHandler = Callable[[bytes], Awaitable[asyncio.Future]]
+
+
+class ChunkError(Exception):
+    """Bad or untimely chunk; carries the HTTP status (400 bad request, 429 too far ahead, ...)."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _FileStream:
+    __slots__ = ("name", "size", "received", "pending", "scanner", "lock", "results")
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.received = 0                      # contiguous bytes fed to the scanner
+        self.pending: Dict[int, bytes] = {}    # offset → chunk that arrived early
+        self.scanner = SysExStreamScanner()
+        self.lock = asyncio.Lock()
+        self.results: List[asyncio.Future] = []
+
+    def status(self) -> Dict[str, Any]:
+        return {"name": self.name, "size": self.size, "received": self.received,
+                "pending": sorted(self.pending), "patches": len(self.results)}
+
+
+class UploadSession:
+    """
+    One resumable upload of one or more files.
+
+    Args:
+        files: (name, size) per file, in the order their patches should appear.
+        on_block: Called with each completed parameter block, in order; returns its conversion future.
+        on_progress: Called with (bytes received so far, patches found) after every fed chunk.
+        context: Caller's state for this upload (e.g. its conversion job).
+    """
+
+    def __init__(self, session_id: str, files: Sequence[Tuple[str, int]], on_block: BlockHandler,
+                 on_progress: Optional[Callable[[int, int], None]] = None, context: Any = None,
+                 chunk_size: int = CHUNKED_UPLOAD_CHUNK_SIZE, max_ahead: int = CHUNKED_UPLOAD_MAX_AHEAD):
+        self.id = session_id
+        self.context = context
+        self.files = [_FileStream(name, size) for name, size in files]
+        self.total_size = sum(size for _, size in files)
+        self.chunk_size = chunk_size
+        self.max_ahead = max_ahead
+        self._on_block = on_block
+        self._on_progress = on_progress
+        self.touched = time.monotonic()
+
+    @property
+    def complete(self) -> bool:
+        return all(f.received == f.size for f in self.files)
+
+    @property
+    def bytes_received(self) -> int:
+        return sum(f.received for f in self.files)
+
+    @property
+    def patch_count(self) -> int:
+        return sum(len(f.results) for f in self.files)
+
+    def _pending_bytes(self) -> int:
+        return sum(len(chunk) for f in self.files for chunk in f.pending.values())
+
+    async def put_chunk(self, index: int, offset: int, data: bytes) -> Dict[str, Any]:
+        """
+        Store one chunk and feed every now-contiguous byte of that file to its scanner.
+
+        Raises:
+            ChunkError: Unknown file, chunk outside the file or too large (400), or too far
+                ahead of the contiguous data while other chunks are still missing (429).
+        """
+        self.touched = time.monotonic()
+        if not 0 <= index < len(self.files):
+            raise ChunkError(f"No file #{index} in this upload")
+        f = self.files[index]
+        if len(data) > self.chunk_size:
+            raise ChunkError(f"Chunks may be at most {self.chunk_size} bytes")
+        if offset < 0 or offset + len(data) > f.size:
+            raise ChunkError(f"Chunk {offset}+{len(data)} is outside {f.name} ({f.size} bytes)")
+
+        if offset + len(data) > f.received:
+            if offset < f.received:  # overlaps what we already have (a resend); keep only the new tail
+                data, offset = data[f.received - offset:], f.received
+            if offset > f.received and offset not in f.pending:
+                if self._pending_bytes() + len(data) > self.max_ahead:
+                    raise ChunkError("Too far ahead of the missing chunks, retry shortly", 429)
+            if data and len(data) >= len(f.pending.get(offset, b"")):
+                f.pending[offset] = data
+
+        # Parallel requests for the same file take turns; whoever holds the lock drains every gapless chunk
+        async with f.lock:
+            while f.received in f.pending:
+                chunk = f.pending.pop(f.received)
+                f.received += len(chunk)
+                for block in f.scanner.feed(chunk):
+                    f.results.append(await self._on_block(block))
+                if self._on_progress is not None:
+                    self._on_progress(self.bytes_received, self.patch_count)
+            for stale in [o for o in f.pending if o < f.received]:
+                del f.pending[stale]
+        self.touched = time.monotonic()
+        return f.status()
+
+    async def results(self) -> List[asyncio.Future]:
+        """
+        Conversion futures of every patch, file by file in upload order.
+
+        Raises:
+            ChunkError: 409 if some bytes are still missing.
+        """
+        if not self.complete:
+            raise ChunkError("Upload is incomplete; see GET /uploads/<id> for what is missing", 409)
+        for f in self.files:
+            async with f.lock:  # let a request still feeding the last chunk finish
+                pass
+        return [result for f in self.files for result in f.results]
+
+    def status(self) -> Dict[str, Any]:
+        return {"id": self.id, "chunk_size": self.chunk_size, "complete": self.complete,
+                "bytes_received": self.bytes_received, "total_size": self.total_size,
+                "files": [f.status() for f in self.files]}
+
+
+class SessionStore:
+    """
+    Open upload sessions. Sessions idle for `ttl` seconds are dropped by expire()
+    (call it periodically) or when next looked up, and `on_expire` is called for
+    them, e.g. to cancel their queued conversions. `on_close` is called for every
+    session that leaves the store, however it leaves.
+    """
+
+    def __init__(self, max_sessions: int = CHUNKED_UPLOAD_MAX_SESSIONS, ttl: float = CHUNKED_UPLOAD_TTL,
+                 on_expire: Optional[Callable[[UploadSession], None]] = None,
+                 on_close: Optional[Callable[[UploadSession], None]] = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self.on_close = on_close
+        self._sessions: "OrderedDict[str, UploadSession]" = OrderedDict()
+
+    def create(self, files: Sequence[Tuple[str, int]], on_block: BlockHandler,
+               on_progress: Optional[Callable[[int, int], None]] = None, context: Any = None) -> UploadSession:
+        """
+        Raises:
+            ChunkError: 400 for a bad file list, 429 when too many uploads are open.
+        """
+        if not files:
+            raise ChunkError("An upload needs at least one file")
+        for name, size in files:
+            if not isinstance(size, int) or size < 0:
+                raise ChunkError(f"Bad size for {name!r}")
+        self.expire()
+        if len(self._sessions) >= self.max_sessions:
+            raise ChunkError("Too many uploads in progress, try again later.", 429)
+
+        session = UploadSession(uuid.uuid4().hex, files, on_block, on_progress, context)
+        self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> UploadSession:
+        session = self._sessions.get(session_id)
+        if session is not None and session.touched < time.monotonic() - self.ttl:
+            self._expire(session)
+            session = None
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def remove(self, session_id: str) -> Optional[UploadSession]:
+        session = self._sessions.pop(session_id, None)
+        if session is not None and self.on_close is not None:
+            self.on_close(session)
+        return session
+
+    def _expire(self, session: UploadSession) -> None:
+        self.remove(session.id)
+        if self.on_expire is not None:
+            self.on_expire(session)
+
+    def expire(self) -> int:
+        """Drop every session idle for longer than the TTL; returns how many were dropped."""
+        cutoff = time.monotonic() - self.ttl
+        expired = [s for s in self._sessions.values() if s.touched < cutoff]
+        for session in expired:
+            self._expire(session)
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": len(self._sessions),
+                "bytes_pending": sum(s._pending_bytes() for s in self._sessions.values())}
@@ -0,0 +1,597 @@
+# cli.py
+"""
+Offline batch converter for Virus SysEx banks.
+
+Usage (from the Backend folder):
+    python cli.py convert <dirs|files> -o out/ -j 8
+    python cli.py diff old_out/ new_out/
+    python cli.py bank <dirs|files> -o library.npy
+    python cli.py dedup <library.npy|dirs|files> -o unique.npy
+    python cli.py catalog find "Chorus_Mode>0" "Osc3_Wave_Select>0"
+    python cli.py archive pack out/ -o bank.vdelta
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import DEFAULT_VITAL_PRESET_PATH, VITAL_OUTPUT_COMPACT, VITAL_OUTPUT_COMPRESS, DIFF_ATOL, DIFF_RTOL, \
+    DIFF_WAVE_TOL, SIMILARITY_DUP_THRESHOLD, CATALOG_PATH, DELTA_TEMPLATE_STORE
+
+SOURCE_EXTENSIONS = (".mid", ".midi", ".syx")
+STAMP_FILENAME = ".source.json"
+
+
+# -------------------------------------------------------------------
+# Directory walking
+# -------------------------------------------------------------------
+def _scan_dir(path: str) -> Tuple[List[str], List[str]]:
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(SOURCE_EXTENSIONS):
+                    files.append(entry.path)
+    except OSError as e:
+        print(f"⚠️ Cannot read {path}: {e}", file=sys.stderr)
+    return files, subdirs
+
+
+def walk_sources(paths: List[str], max_workers: int = 8) -> List[Tuple[str, str]]:
+    """
+    Collects MIDI/SysEx sources under the given files and directories, scanning
+    subdirectories concurrently.
+
+    Returns:
+        Sorted list of (source_path, root) tuples; root is the directory the source
+        was found under, used to mirror the folder structure in the output.
+    """
+    sources: List[Tuple[str, str]] = []
+    roots = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for path in paths:
+            if os.path.isdir(path):
+                future = pool.submit(_scan_dir, path)
+                roots[future] = path
+                pending.add(future)
+            elif os.path.isfile(path) and path.lower().endswith(SOURCE_EXTENSIONS):
+                sources.append((path, os.path.dirname(path)))
+            else:
+                print(f"⚠️ Skipping {path}: not a directory or MIDI/SysEx file", file=sys.stderr)
+
+        while pending:
+            future = next(as_completed(pending))
+            pending.remove(future)
+            root = roots.pop(future)
+            files, subdirs = future.result()
+            sources.extend((f, root) for f in files)
+            for subdir in subdirs:
+                sub_future = pool.submit(_scan_dir, subdir)
+                roots[sub_future] = root
+                pending.add(sub_future)
+
+    return sorted(sources)
+
+
+# -------------------------------------------------------------------
+# Up-to-date checks
+# -------------------------------------------------------------------
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def output_dir_for(source: str, root: str, output_root: str, root_prefix: bool = False) -> str:
+    """
+    Mirrors source under output_root as a folder named after the file, extension
+    included (bank.mid → bank_mid/), so bank.mid and bank.syx don't share one.
+    With root_prefix, the folder also goes under the root's own name, keeping
+    sources from different roots apart.
+    """
+    root = root or "."
+    stem, ext = os.path.splitext(os.path.relpath(source, root))
+    rel = stem + ext.replace(".", "_")
+    if root_prefix:
+        rel = os.path.join(os.path.basename(os.path.abspath(root)), rel)
+    return os.path.join(output_root, rel)
+
+
+def assign_output_dirs(sources: List[Tuple[str, str]], output_root: str) -> List[Tuple[str, str]]:
+    """
+    Output folder for every (source, root), sorted as given. A file listed twice
+    is converted once; folders that would still collide (same root names, or names
+    differing only in case) get a _2, _3, ... suffix, stable as long as the
+    source list is.
+    """
+    root_prefix = len({os.path.abspath(root or ".") for _, root in sources}) > 1
+    assigned: List[Tuple[str, str]] = []
+    seen_sources = set()
+    taken = set()
+    for source, root in sources:
+        if os.path.abspath(source) in seen_sources:
+            continue
+        seen_sources.add(os.path.abspath(source))
+        base = out_dir = output_dir_for(source, root, output_root, root_prefix)
+        n = 1
+        while out_dir.lower() in taken:
+            n += 1
+            out_dir = f"{base}_{n}"
+        if n > 1:
+            print(f"⚠️ {source}: output folder {base} is already used, writing to {out_dir}", file=sys.stderr)
+        taken.add(out_dir.lower())
+        assigned.append((source, out_dir))
+    return assigned
+
+
+def is_up_to_date(source: str, out_dir: str) -> bool:
+    """
+    A source is up to date when its stamp records the same size and mtime, or
+    (if it was touched) the same content hash as the last conversion.
+    """
+    stamp_path = os.path.join(out_dir, STAMP_FILENAME)
+    try:
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    st = os.stat(source)
+    if stamp.get("size") == st.st_size and stamp.get("mtime") == st.st_mtime:
+        return True
+    if stamp.get("size") == st.st_size and stamp.get("sha1") == file_sha1(source):
+        stamp["mtime"] = st.st_mtime
+        with open(stamp_path, "w", encoding="utf-8") as f:
+            json.dump(stamp, f)
+        return True
+    return False
+
+
+# -------------------------------------------------------------------
+# Worker side
+# -------------------------------------------------------------------
+_worker_template: Optional[str] = None
+_worker_quiet = True
+
+
+def _init_worker(asset_layout: Dict[str, Any], quiet: bool) -> None:
+    """Attach the shared read-only assets (template + tables) built by the parent."""
+    from shared_assets import attach_shared_assets
+
+    global _worker_template, _worker_quiet
+    _worker_template = attach_shared_assets(asset_layout)
+    _worker_quiet = quiet
+
+
+def read_param_blocks(source: str) -> List[bytes]:
+    from sysex_parser import extract_param_blocks_from_midi, extract_param_blocks_from_syx
+
+    if source.lower().endswith(".syx"):
+        return extract_param_blocks_from_syx(source)
+    return extract_param_blocks_from_midi(source)
+
+
+def convert_source(source: str, out_dir: str, compact: bool, compress: bool) -> Dict[str, Any]:
+    """Convert one MIDI/SysEx file into out_dir. Runs inside a worker process."""
+    from virus_to_vital_converter import convert_param_block, write_vital_file
+    from mapping_deps import new_manifest, record_output, save_manifest
+
+    started = time.perf_counter()
+    result = {"source": source, "patches": 0, "bytes": 0, "error": None, "patched": False}
+    sink = io.StringIO() if _worker_quiet else sys.stdout
+
+    try:
+        with contextlib.redirect_stdout(sink):
+            blocks = read_param_blocks(source)
+            os.makedirs(out_dir, exist_ok=True)
+            manifest = new_manifest(_worker_template)
+            outputs = []
+            for i, block in enumerate(blocks, start=1):
+                key_log = {}
+                preset_json = convert_param_block(block, _worker_template, compact, key_log=key_log)
+                out_path = os.path.join(out_dir, f"patch_{i:03}.vital")
+                result["bytes"] += write_vital_file(out_path, preset_json, compress)
+                outputs.append(os.path.basename(out_path))
+                record_output(manifest, outputs[-1], block, key_log)
+            save_manifest(out_dir, manifest)
+
+        st = os.stat(source)
+        with open(os.path.join(out_dir, STAMP_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({
+                "source": os.path.abspath(source),
+                "size": st.st_size,
+                "mtime": st.st_mtime,
+                "sha1": file_sha1(source),
+                "outputs": outputs,
+            }, f)
+        result["patches"] = len(blocks)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def patch_source(source: str, out_dir: str, changed: List[str], compact: bool, compress: bool) -> Dict[str, Any]:
+    """
+    Re-apply only the changed mapping entries to a source's cached outputs,
+    falling back to a full conversion when the patch is not safe.
+    """
+    from mapping_deps import load_manifest, patch_outputs
+
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO() if _worker_quiet else sys.stdout):
+            manifest = load_manifest(out_dir)
+            patched = None
+            if manifest is not None:
+                patched = patch_outputs(out_dir, manifest, changed, json.loads(_worker_template), compact, compress)
+    except Exception as e:
+        return {"source": source, "patches": 0, "bytes": 0, "patched": True,
+                "error": f"{type(e).__name__}: {e}", "seconds": time.perf_counter() - started}
+
+    if patched is None:
+        return convert_source(source, out_dir, compact, compress)
+    return {"source": source, "patches": patched, "bytes": 0, "patched": True, "error": None,
+            "seconds": time.perf_counter() - started}
+
+
+def record_in_catalog(catalog, source: str, out_dir: str) -> None:
+    """Record a converted source's patches and outputs (read back from its manifest)."""
+    from mapping_deps import load_manifest
+
+    manifest = load_manifest(out_dir)
+    if manifest is None:
+        return
+    catalog.record_outputs(out_dir, manifest, os.path.abspath(source))
+
+
+# -------------------------------------------------------------------
+# Command: convert
+# -------------------------------------------------------------------
+def run_convert(args: argparse.Namespace) -> int:
+    if not os.path.isfile(args.template):
+        print(f"❌ Template preset not found: {args.template} (use --template)", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    sources = walk_sources(args.paths, max_workers=max(args.jobs, 4))
+    print(f"🔍 Found {len(sources)} MIDI/SysEx file(s) in {time.perf_counter() - started:.2f}s")
+
+    from mapping_deps import load_manifest, plan_update
+
+    with open(args.template, "r", encoding="utf-8") as f:
+        template_json = f.read()
+
+    jobs = []
+    patch_jobs = []
+    skipped = 0
+    for source, out_dir in assign_output_dirs(sources, args.output):
+        if not args.force and is_up_to_date(source, out_dir):
+            # Source unchanged: only redo what a mapping/code change invalidated
+            action, changed = plan_update(load_manifest(out_dir), template_json)
+            if action == "skip":
+                skipped += 1
+                continue
+            if action == "patch":
+                patch_jobs.append((source, out_dir, changed))
+                continue
+        jobs.append((source, out_dir))
+
+    converted = patched = failed = patches = total_bytes = 0
+    from shared_assets import build_shared_assets, release_shared_assets
+
+    catalog = None
+    if args.catalog and (jobs or patch_jobs):
+        from patch_catalog import PatchCatalog
+        catalog = PatchCatalog(args.catalog)
+    out_dirs = {source: out_dir for source, out_dir in jobs}
+    out_dirs.update((source, out_dir) for source, out_dir, _ in patch_jobs)
+
+    # Workers only start on first submit, so nothing to share if everything is up to date
+    asset_layout = build_shared_assets(args.template) if jobs or patch_jobs else None
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.jobs,
+            initializer=_init_worker,
+            initargs=(asset_layout, not args.verbose),
+        ) as pool:
+            futures = [
+                pool.submit(convert_source, source, out_dir, not args.pretty, args.compress)
+                for source, out_dir in jobs
+            ] + [
+                pool.submit(patch_source, source, out_dir, changed, not args.pretty, args.compress)
+                for source, out_dir, changed in patch_jobs
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                if result["error"]:
+                    failed += 1
+                    print(f"❌ {result['source']}: {result['error']}", file=sys.stderr)
+                    continue
+                if result["patched"]:
+                    patched += 1
+                else:
+                    converted += 1
+                patches += result["patches"]
+                total_bytes += result["bytes"]
+                if catalog is not None:
+                    record_in_catalog(catalog, result["source"], out_dirs[result["source"]])
+                if args.verbose:
+                    print(f"📎 {result['source']} → {result['patches']} patch(es) in {result['seconds']:.2f}s")
+    finally:
+        if asset_layout is not None:
+            release_shared_assets(asset_layout)
+        if catalog is not None:
+            catalog.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"✅ {converted} converted, {patched} patched, {skipped} up to date, {failed} failed — "
+        f"{patches} patches, {total_bytes / 1e6:.1f} MB in {elapsed:.2f}s "
+        f"({patches / elapsed if elapsed else 0:.1f} patches/s, {args.jobs} worker(s))"
+    )
+    return 1 if failed else 0
+
+
+# -------------------------------------------------------------------
+# Command: diff
+# -------------------------------------------------------------------
+def run_diff(args: argparse.Namespace) -> int:
+    from vital_diff import diff_folders, format_report, is_identical
+
+    started = time.perf_counter()
+    result = diff_folders(args.a, args.b, atol=args.atol, rtol=args.rtol, wave_tol=args.wave_tol,
+                          ignore=tuple(args.ignore))
+    reports = result["reports"]
+    changed = [r for r in reports if not is_identical(r)]
+
+    for report in changed[:args.limit]:
+        print("\n".join(format_report(report)))
+    for name in result["only_a"]:
+        print(f"- only in {args.a}: {name}")
+    for name in result["only_b"]:
+        print(f"+ only in {args.b}: {name}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+    print(
+        f"{'✅' if not changed and not result['only_a'] and not result['only_b'] else '❗'} "
+        f"{len(reports) - len(changed)} identical, {len(changed)} different, "
+        f"{len(result['only_a']) + len(result['only_b'])} unmatched — {time.perf_counter() - started:.2f}s"
+    )
+    return 1 if changed or result["only_a"] or result["only_b"] else 0
+
+
+# -------------------------------------------------------------------
+# Command: bank
+# -------------------------------------------------------------------
+def run_bank(args: argparse.Namespace) -> int:
+    from virus_bank import VirusBank
+
+    started = time.perf_counter()
+    sources = walk_sources(args.paths)
+    bank = VirusBank.from_sources(source for source, _ in sources)
+    if not len(bank):
+        print("❌ No Virus patches found.", file=sys.stderr)
+        return 1
+
+    path = bank.save(args.output)
+    for index, name in enumerate(bank.names[:args.limit], start=1):
+        print(f"  {index:5}  {name}")
+    print(f"✅ {len(bank)} patch(es) from {len(sources)} file(s) → {path} "
+          f"({bank.blocks.nbytes / 1024:.1f} KB) in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def load_bank(paths: List[str]):
+    """VirusBank from .npy banks (memory-mapped) and/or MIDI/SysEx files and directories."""
+    import numpy as np
+    from virus_bank import VirusBank
+
+    banks = [VirusBank.load(path) for path in paths if path.lower().endswith(".npy")]
+    others = [path for path in paths if not path.lower().endswith(".npy")]
+    if others:
+        banks.append(VirusBank.from_sources(source for source, _ in walk_sources(others)))
+    if len(banks) == 1:
+        return banks[0]
+    return VirusBank(np.concatenate([bank.blocks for bank in banks]))
+
+
+# -------------------------------------------------------------------
+# Command: dedup
+# -------------------------------------------------------------------
+def run_dedup(args: argparse.Namespace) -> int:
+    from virus_bank import VirusBank
+    from patch_similarity import find_duplicates
+
+    bank = load_bank(args.paths)
+    if not len(bank):
+        print("❌ No Virus patches found.", file=sys.stderr)
+        return 1
+
+    report = find_duplicates(bank.blocks, args.threshold, args.approximate, bank.names)
+    for group, names in list(zip(report["groups"], report["names"]))[:args.limit]:
+        print(f"🔁 {names[0]!r} (#{group[0] + 1}) ≈ " + ", ".join(f"{n!r} (#{i + 1})" for i, n in zip(group[1:], names[1:])))
+
+    if args.output:
+        path = VirusBank(bank.blocks[report["keep"]]).save(args.output)
+        print(f"💾 Unique patches → {path}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ {report['patches']} patch(es), {report['unique']} unique, {len(report['groups'])} duplicate group(s) "
+          f"— {report['method']} search in {report['seconds']:.2f}s")
+    return 0
+
+
+# -------------------------------------------------------------------
+# Command: catalog
+# -------------------------------------------------------------------
+def run_catalog(args: argparse.Namespace) -> int:
+    from patch_catalog import PatchCatalog
+
+    with PatchCatalog(args.catalog) as catalog:
+        if args.action == "add":
+            started = time.perf_counter()
+            paths = [p for p in args.args if p.lower().endswith(".npy")]
+            paths += [source for source, _ in walk_sources([p for p in args.args if not p.lower().endswith(".npy")])]
+            total = sum(catalog.ingest_source(path) for path in paths)
+            print(f"✅ Catalogued {total} patch(es) from {len(paths)} file(s) in {time.perf_counter() - started:.2f}s")
+
+        elif args.action == "find":
+            started = time.perf_counter()
+            try:
+                rows = catalog.find(*args.args, name=args.name, limit=args.limit)
+            except ValueError as e:
+                print(f"❌ {e}", file=sys.stderr)
+                return 2
+            if args.json:
+                print(json.dumps(rows, indent=2))
+            else:
+                for row in rows:
+                    status = f"→ {row['output_path']}" if row["output_path"] else "(not converted)"
+                    print(f"  {row['block_hash'][:12]}  {row['name']!r:14} {row['source'] or ''} {status}")
+                print(f"🔎 {len(rows)} match(es) in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        else:
+            print(json.dumps(catalog.stats(), indent=2))
+    return 0
+
+
+# -------------------------------------------------------------------
+# Command: archive
+# -------------------------------------------------------------------
+def run_archive(args: argparse.Namespace) -> int:
+    from vital_delta import TemplateStore, read_archive, write_archive
+    from virus_to_vital_converter import load_vital_file_as_dict, serialize_vital_preset, write_vital_file
+
+    started = time.perf_counter()
+    store = TemplateStore(args.store)
+
+    if args.action == "pack":
+        if not os.path.isfile(args.template):
+            print(f"❌ Template preset not found: {args.template} (use --template)", file=sys.stderr)
+            return 2
+        with open(args.template, "r", encoding="utf-8") as f:
+            template_json = f.read()
+
+        files = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(args.input) for name in names if name.lower().endswith(".vital")
+        )
+        raw_bytes = sum(os.path.getsize(path) for path in files)
+        presets = ((os.path.relpath(path, args.input), load_vital_file_as_dict(path)) for path in files)
+        stats = write_archive(args.output, presets, template_json, store)
+        print(f"✅ {stats['presets']} preset(s), {stats['frames']} distinct frame(s) → {args.output}: "
+              f"{raw_bytes / 1e6:.1f} MB → {stats['bytes'] / 1e6:.2f} MB in {time.perf_counter() - started:.2f}s")
+    else:
+        count = 0
+        for name, preset in read_archive(args.input, store):
+            out_path = os.path.join(args.output, name)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            write_vital_file(out_path, serialize_vital_preset(preset, not args.pretty), args.compress)
+            count += 1
+        print(f"✅ Restored {count} preset(s) → {args.output} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Virus SysEx → Vital batch converter")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="Convert MIDI/SysEx files or directories of them")
+    convert.add_argument("paths", nargs="+", help="Files and/or directories to convert")
+    convert.add_argument("-o", "--output", required=True, help="Output root directory")
+    convert.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    convert.add_argument("--template", default=DEFAULT_VITAL_PRESET_PATH, help="Template .vital preset")
+    convert.add_argument("--force", action="store_true", help="Reconvert even if outputs are up to date")
+    convert.add_argument("--compress", action="store_true", default=VITAL_OUTPUT_COMPRESS,
+                         help="zlib-compress the written presets")
+    convert.add_argument("--pretty", action="store_true", default=not VITAL_OUTPUT_COMPACT,
+                         help="Use spaced JSON separators instead of compact output")
+    convert.add_argument("-v", "--verbose", action="store_true", help="Show per-file and per-patch output")
+    convert.add_argument("--catalog", default=CATALOG_PATH, help="Record patches and outputs in this SQLite catalog")
+    convert.add_argument("--no-catalog", dest="catalog", action="store_const", const=None,
+                         help="Don't record conversions in the catalog")
+    convert.set_defaults(func=run_convert)
+
+    diff = sub.add_parser("diff", help="Structurally compare two folders of .vital presets")
+    diff.add_argument("a", help="Reference folder")
+    diff.add_argument("b", help="Folder to compare against the reference")
+    diff.add_argument("--atol", type=float, default=DIFF_ATOL, help="Absolute tolerance for numeric settings")
+    diff.add_argument("--rtol", type=float, default=DIFF_RTOL, help="Relative tolerance for numeric settings")
+    diff.add_argument("--wave-tol", type=float, default=DIFF_WAVE_TOL, help="Max sample error in wave_data")
+    diff.add_argument("--ignore", action="append", default=[], help="Dotted path to skip, e.g. settings.lfos")
+    diff.add_argument("--limit", type=int, default=20, help="Maximum presets to print")
+    diff.add_argument("--json", help="Write the full report to this file")
+    diff.set_defaults(func=run_diff)
+
+    bank = sub.add_parser("bank", help="Pack every patch from MIDI/SysEx files into one (N, 256) .npy bank")
+    bank.add_argument("paths", nargs="+", help="Files and/or directories to collect")
+    bank.add_argument("-o", "--output", required=True, help="Output .npy file")
+    bank.add_argument("--limit", type=int, default=20, help="Maximum patch names to print")
+    bank.set_defaults(func=run_bank)
+
+    dedup = sub.add_parser("dedup", help="Find near-duplicate patches in a bank before converting it")
+    dedup.add_argument("paths", nargs="+", help=".npy banks and/or MIDI/SysEx files and directories")
+    dedup.add_argument("-o", "--output", help="Write the unique patches to this .npy bank")
+    dedup.add_argument("--threshold", type=float, default=SIMILARITY_DUP_THRESHOLD,
+                       help="Max weighted RMS parameter distance (0..1) for a duplicate")
+    search = dedup.add_mutually_exclusive_group()
+    search.add_argument("--exact", dest="approximate", action="store_false", default=None,
+                        help="Always use exact search")
+    search.add_argument("--approximate", dest="approximate", action="store_true",
+                        help="Always use the LSH index")
+    dedup.add_argument("--limit", type=int, default=20, help="Maximum duplicate groups to print")
+    dedup.add_argument("--json", help="Write the full report to this file")
+    dedup.set_defaults(func=run_dedup)
+
+    catalog = sub.add_parser("catalog", help="Query or fill the SQLite patch catalog")
+    catalog.add_argument("action", choices=["add", "find", "stats"],
+                         help="add <files|dirs|.npy>, find <conditions like Chorus_Mode>0>, stats")
+    catalog.add_argument("args", nargs="*", help="Sources for add, conditions for find")
+    catalog.add_argument("--catalog", default=CATALOG_PATH, help="SQLite catalog file")
+    catalog.add_argument("--name", help="SQL LIKE pattern on the patch name (find)")
+    catalog.add_argument("--limit", type=int, default=50, help="Maximum results (find)")
+    catalog.add_argument("--json", action="store_true", help="Print results as JSON (find)")
+    catalog.set_defaults(func=run_catalog)
+
+    archive = sub.add_parser("archive", help="Pack .vital presets as deltas against the template, or restore them")
+    archive.add_argument("action", choices=["pack", "unpack"])
+    archive.add_argument("input", help="Folder of .vital presets (pack) or archive file (unpack)")
+    archive.add_argument("-o", "--output", required=True, help="Archive file (pack) or output folder (unpack)")
+    archive.add_argument("--template", default=DEFAULT_VITAL_PRESET_PATH, help="Template .vital preset (pack)")
+    archive.add_argument("--store", default=DELTA_TEMPLATE_STORE, help="Folder of versioned templates")
+    archive.add_argument("--compress", action="store_true", default=VITAL_OUTPUT_COMPRESS,
+                         help="zlib-compress the restored presets (unpack)")
+    archive.add_argument("--pretty", action="store_true", default=not VITAL_OUTPUT_COMPACT,
+                         help="Use spaced JSON separators (unpack)")
+    archive.set_defaults(func=run_archive)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
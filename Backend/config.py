@@ -9,6 +9,61 @@ TEMP_SYSEX_FOLDER = "/Users/nathannguyen/Documents/Midi_To_serum/Temp_sysex_hold
 # Folder to store the final converted .vital patches
 OUTPUT_PATCH_FOLDER = "/Users/nathannguyen/Documents/Midi_To_serum/Backend/output"
 
+# Versioned copies of the template that delta-encoded presets refer to (vital_delta)
+DELTA_TEMPLATE_STORE = "/Users/nathannguyen/Documents/Midi_To_serum/Presets/templates"
+
+# SQLite catalog of every ingested / converted patch (patch_catalog, `cli.py catalog`)
+CATALOG_PATH = "/Users/nathannguyen/Documents/Midi_To_serum/Backend/patch_catalog.sqlite"
+
 
 DEFAULT_FRAME_SIZE = 2048
-DEFAULT_LFO_FRAME_SIZE = 16 
+DEFAULT_LFO_FRAME_SIZE = 16
+LFO_RANDOM_SEED = 0x5EED  # Base seed for S&H / glide LFO shapes (keeps conversions reproducible)
+DEFAULT_MORPH_FRAMES = 5  # Keyframes per Osc Shape morph table (Vital crossfades between them)
+VITAL_MAX_WAVE_FRAME = 256  # Highest keyframe position / osc_N_wave_frame value in Vital
+
+# Output format for generated .vital files
+VITAL_OUTPUT_COMPACT = True  # Use compact JSON separators (no whitespace)
+VITAL_OUTPUT_COMPRESS = False  # zlib-compress presets (for caches/archives; loaders auto-detect)
+VITAL_COMPRESSION_LEVEL = 6
+
+# Tolerances for vital_diff / `cli.py diff`
+DIFF_ATOL = 1e-6  # Absolute tolerance for numeric settings
+DIFF_RTOL = 1e-5  # Relative tolerance for numeric settings
+DIFF_WAVE_TOL = 1e-4  # Max absolute sample error in decoded wave_data
+
+# Golden-output regression harness (regression.py)
+REGRESSION_MAX_SLOWDOWN = 20.0  # Allowed patches/s drop vs the stored baseline, in percent
+REGRESSION_FLOAT_DIGITS = 6  # Decimal places kept when digesting settings
+REGRESSION_WAVE_STEP = 1e-4  # Quantisation step for wave_data samples when digesting
+
+# Streaming conversion (conversion_pipeline)
+STREAM_MAX_IN_FLIGHT = 8  # Patches per upload submitted to the ASGI conversion pool ahead of the response
+
+# ASGI upload service (asgi_app)
+UPLOAD_WORKERS = None  # Conversion processes; None = os.cpu_count()
+UPLOAD_MAX_BYTES = 32 << 20  # Largest accepted /upload body (413 above this)
+UPLOAD_MAX_PATCHES = 2048  # Most Virus patches accepted in one upload (413 above this)
+UPLOAD_MAX_ACTIVE_REQUESTS = 32  # Uploads processed at once before new ones get 429
+UPLOAD_MAX_QUEUED_PATCHES = 1024  # Conversions waiting across all clients before new work gets 429
+UPLOAD_RETRY_AFTER = 5  # Retry-After (seconds) for the Flask app's busy response
+ENTRY_CACHE_MAX_BYTES = 256 << 20  # Deflated presets kept in memory for copy-only ZIP assembly (precompressed_zip)
+PROGRESS_EVENT_INTERVAL = 0.1  # Seconds between progress events sent to one subscriber (GET /progress/<job>)
+PROGRESS_KEEPALIVE = 15  # Seconds of silence before an SSE keepalive comment
+PROGRESS_KEEP_SECONDS = 60  # Finished upload jobs stay visible this long
+PROGRESS_MAX_JOBS = 1024  # Tracked upload jobs before the oldest finished or unstarted ones are dropped
+CHUNKED_UPLOAD_CHUNK_SIZE = 256 << 10  # Largest chunk accepted by PUT /uploads/<id>/<file> (see chunked_upload)
+CHUNKED_UPLOAD_PARALLEL = 4  # Chunks the upload page sends at once
+CHUNKED_UPLOAD_MAX_AHEAD = 8 << 20  # Out-of-order chunk bytes held per session before 429
+CHUNKED_UPLOAD_MAX_SESSIONS = 64  # Open chunked uploads before new ones get 429
+CHUNKED_UPLOAD_TTL = 600  # Seconds an idle chunked upload can still be resumed
+CHUNKED_UPLOAD_SWEEP_INTERVAL = 30  # Seconds between sweeps for expired chunked uploads
+BATCH_TASK_SIZE = 8  # Blocks converted per pool task by POST /convert/batch
+
+# Patch similarity / dedup (patch_similarity, `cli.py dedup`, POST /dedup)
+SIMILARITY_DUP_THRESHOLD = 0.02  # Weighted RMS parameter distance (0..1) at or below which patches are duplicates
+SIMILARITY_EXACT_MAX = 20000  # Banks up to this size use exact search; larger ones use the LSH index
+SIMILARITY_LSH_TABLES = 8  # Hash tables in the LSH index (more = better recall, more memory)
+SIMILARITY_LSH_HASHES = 4  # Projections concatenated per table (more = smaller buckets)
+SIMILARITY_LSH_WIDTH = 0.1  # Bucket width of each projection, in distance units
+SIMILARITY_SEED = 0x51A  # Seed for the random projections (keeps results reproducible)
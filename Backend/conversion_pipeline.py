@@ -0,0 +1,99 @@
+# conversion_pipeline.py
+"""
+Streaming conversion pipeline: ingest → map → render → serialise → sink
+(the sink is virus_to_vital_converter.save_vital_patches, which accepts any iterable).
+
+Every stage is a generator that pulls one patch at a time from the stage
+before it, so only a bounded number of patches exist at once no matter how
+large the bank is.
+"""
+
+import os
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+from config import VITAL_OUTPUT_COMPACT
+from virus_patch import VirusPatch
+
+# (patch_filename, param_block)
+PatchBlock = Tuple[str, List[int]]
+# (patch_filename, PresetSlots, virus_params)
+MappedPatch = Tuple[str, Any, VirusPatch]
+
+
+# -------------------------------------------------------------------
+# Ingest
+# -------------------------------------------------------------------
+def ingest_txt_folder(folder_path: str) -> Iterator[PatchBlock]:
+    """Yield (patch_filename, param_block) for each 256-value SysEx .txt file in a folder."""
+    sysex_files = sorted(f for f in os.listdir(folder_path) if f.endswith(".txt"))
+
+    for i, name in enumerate(sysex_files, start=1):
+        file_path = os.path.join(folder_path, name)
+        with open(file_path, "r") as f:
+            hex_values = f.read().strip().split()
+
+        if len(hex_values) != 256:
+            logging.warning(f"⚠️  Skipping {file_path}: expected 256 params, got {len(hex_values)}")
+            continue
+
+        yield f"patch_{i:03}.vital", [int(h, 16) for h in hex_values]
+
+
+def ingest_source(path: str) -> Iterator[PatchBlock]:
+    """Yield (patch_filename, param_block) for each Virus single dump in a .mid/.midi/.syx file or .npy bank."""
+    from sysex_parser import iter_virus_param_blocks, extract_param_blocks_from_syx
+
+    if path.lower().endswith(".npy"):
+        from virus_bank import VirusBank
+        yield from VirusBank.load(path).iter_blocks()
+        return
+
+    if path.lower().endswith(".syx"):
+        for i, block in enumerate(extract_param_blocks_from_syx(path), start=1):
+            yield f"patch_{i:03}.vital", list(block)
+        return
+
+    for i, (_, _, block) in enumerate(iter_virus_param_blocks(path), start=1):
+        yield f"patch_{i:03}.vital", list(block)
+
+
+# -------------------------------------------------------------------
+# Map / render / serialise
+# -------------------------------------------------------------------
+def map_stage(blocks: Iterable[PatchBlock], base_vital_json: str) -> Iterator[MappedPatch]:
+    from virus_to_vital_converter import map_param_block
+
+    for name, param_block in blocks:
+        slots, virus_params = map_param_block(param_block, base_vital_json)
+        yield name, slots, virus_params
+
+
+def render_stage(mapped: Iterable[Tuple[str, Any, Mapping[str, int]]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    from virus_to_vital_converter import render_param_block
+
+    for name, slots, virus_params in mapped:
+        yield name, render_param_block(slots, virus_params)
+
+
+def serialize_stage(presets: Iterable[Tuple[str, Dict[str, Any]]],
+                    compact: bool = VITAL_OUTPUT_COMPACT) -> Iterator[Tuple[str, str]]:
+    """Yields (preset_json, patch_filename), the tuple layout save_vital_patches expects."""
+    from virus_to_vital_converter import serialize_vital_preset
+
+    for name, preset in presets:
+        yield serialize_vital_preset(preset, compact), name
+
+
+def convert_stream(blocks: Iterable[PatchBlock],
+                   base_vital_json: str,
+                   compact: bool = VITAL_OUTPUT_COMPACT) -> Iterator[Tuple[str, str]]:
+    """
+    Convert a stream of parameter blocks to (preset_json, patch_filename) tuples.
+
+    Args:
+        blocks: Iterable of (patch_filename, param_block), e.g. from ingest_source().
+        base_vital_json (str): Raw JSON text of the template preset.
+        compact (bool): Use compact JSON separators.
+    """
+    return serialize_stage(render_stage(map_stage(blocks, base_vital_json)), compact)
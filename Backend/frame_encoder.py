@@ -0,0 +1,74 @@
+# frame_encoder.py
+
+import binascii
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any
+
+import numpy as np
+from config import DEFAULT_FRAME_SIZE
+
+
+class FrameEncoder:
+    """
+    Encodes float wavetable frames to Vital's base64 float32 wave_data strings.
+
+    Samples are cast into one preallocated float32 buffer (no astype/tobytes
+    temporaries), hashed and base64-encoded straight from a memoryview of that
+    buffer. Encoded strings are interned by content hash, so identical frames
+    across oscillators and patches share a single string object.
+    """
+
+    def __init__(self, frame_size: int = DEFAULT_FRAME_SIZE, max_interned: int = 4096):
+        self._buffer = np.empty(frame_size, dtype=np.float32)
+        self._interned: "OrderedDict[bytes, str]" = OrderedDict()
+        self._max_interned = max_interned
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, waveform: np.ndarray) -> str:
+        """Return the base64 wave_data string for one frame."""
+        waveform = np.asarray(waveform)
+
+        with self._lock:
+            if waveform.dtype == np.float32 and waveform.flags.c_contiguous:
+                samples = waveform  # already in wire format, no copy needed
+            else:
+                if waveform.size != self._buffer.size:
+                    self._buffer = np.empty(waveform.size, dtype=np.float32)
+                np.copyto(self._buffer, waveform.reshape(-1), casting="same_kind")
+                samples = self._buffer
+
+            raw = memoryview(samples).cast("B")
+            key = hashlib.blake2b(raw, digest_size=16).digest()
+
+            encoded = self._interned.get(key)
+            if encoded is not None:
+                self._interned.move_to_end(key)
+                self.hits += 1
+                return encoded
+
+            encoded = binascii.b2a_base64(raw, newline=False).decode("ascii")
+            self._interned[key] = encoded
+            if len(self._interned) > self._max_interned:
+                self._interned.popitem(last=False)
+            self.misses += 1
+            return encoded
+
+    def clear(self) -> None:
+        with self._lock:
+            self._interned.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"interned": len(self._interned), "hits": self.hits, "misses": self.misses}
+
+
+_default_encoder = FrameEncoder()
+
+
+def encode_frame(waveform: np.ndarray) -> str:
+    """Encode a frame with the shared process-wide FrameEncoder."""
+    return _default_encoder.encode(waveform)
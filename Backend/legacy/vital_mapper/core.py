@@ -224,9 +224,9 @@ def modify_vital_preset(vital_preset: Dict[str, Any],
     shape2 = get_shape_for_osc2(stats)
     shape3 = get_shape_for_osc3(stats)
 
-    frames_osc1 = generate_osc1_frame(midi_data, frame_size=DEFAULT_FRAME_SIZE, shape=shape1)
-    frames_osc2 = generate_osc2_frame(midi_data, frame_size=DEFAULT_FRAME_SIZE, shape=shape2)
-    frames_osc3 = generate_osc3_frame(midi_data, frame_size=DEFAULT_FRAME_SIZE, shape=shape3)
+    frames_osc1 = generate_osc1_frame(midi_data, frame_size=DEFAULT_FRAME_SIZE, shape=shape1, stats=stats)
+    frames_osc2 = generate_osc2_frame(midi_data, frame_size=DEFAULT_FRAME_SIZE, shape=shape2, stats=stats)
+    frames_osc3 = generate_osc3_frame(midi_data, frame_size=DEFAULT_FRAME_SIZE, shape=shape3, stats=stats)
     frame_data = [frames_osc1, frames_osc2, frames_osc3]
 
 
@@ -313,14 +313,19 @@ def modify_vital_preset(vital_preset: Dict[str, Any],
 
 def save_vital_preset(vital_preset: Dict[str, Any],
                       output_path: str,
-                      frame_data_list: Optional[List[str]] = None) -> Optional[str]:
+                      frame_data_list: Optional[List[str]] = None,
+                      compact: bool = False,
+                      compress: bool = False) -> Optional[str]:
     """
-    Saves the modified Vital preset as an uncompressed JSON file to the given output_path.
+    Saves the modified Vital preset as a JSON file to the given output_path.
 
     Args:
         vital_preset (Dict[str, Any]): The modified Vital preset data.
         output_path (str): Full path where the preset should be saved (.vital extension).
         frame_data_list (Optional[List[str]]): Optional list of 3 wavetable frames (base64 strings).
+        compact (bool): Write compact JSON separators instead of indent=2.
+        compress (bool): zlib-compress the output, for caches and archives only; Vital
+            itself expects plain JSON (load_default_vital_preset reads both forms).
 
     Returns:
         Optional[str]: The output file path if successful, None otherwise.
@@ -337,7 +342,10 @@ def save_vital_preset(vital_preset: Dict[str, Any],
 
         vital_preset["settings"].setdefault("modulations", [])
 
-        json_data: str = json.dumps(vital_preset, indent=2)
+        if compact:
+            json_data: str = json.dumps(vital_preset, separators=(",", ":"))
+        else:
+            json_data = json.dumps(vital_preset, indent=2)
 
         if isinstance(frame_data_list, list) and len(frame_data_list) == 3:
             json_data = replace_three_wavetables(json_data, frame_data_list)
@@ -345,8 +353,17 @@ def save_vital_preset(vital_preset: Dict[str, Any],
         else:
             logging.warning("⚠️ No valid wave_data provided or not exactly 3 frames.")
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(json_data)
+        data = json_data.encode("utf-8")
+        if compress:
+            data = zlib.compress(data)
+        with open(output_path, "wb") as f:
+            f.write(data)
+        written = len(data)
+        if compress:
+            logging.info(
+                f"🗜️ Compressed preset {len(json_data) / 1024:.0f} KB → {written / 1024:.0f} KB "
+                f"({100 * (1 - written / max(len(json_data), 1)):.1f}% smaller)"
+            )
 
         logging.info(f"✅ Successfully saved Vital preset to: {output_path}")
         return output_path
@@ -1,11 +1,55 @@
 import base64
 import random
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence
 import numpy as np
 from midi_analysis import compute_midi_stats
 from config import DEFAULT_FRAME_SIZE
 
 
+@lru_cache(maxsize=8)
+def _phase_vector(frame_size: int) -> np.ndarray:
+    """Cached, read-only phase ramp [0, 2π) shared by every frame generator."""
+    phase = np.linspace(0, 2 * np.pi, frame_size, endpoint=False)
+    phase.setflags(write=False)
+    return phase
+
+
+@lru_cache(maxsize=32)
+def _harmonic_phase_matrix(num_harmonics: int, frame_size: int) -> np.ndarray:
+    """Cached (num_harmonics, frame_size) matrix holding h * phase for h = 1..num_harmonics."""
+    harmonics = np.arange(1, num_harmonics + 1, dtype=np.float64)
+    matrix = np.outer(harmonics, _phase_vector(frame_size))
+    matrix.setflags(write=False)
+    return matrix
+
+
+def additive_frame(amplitudes: Sequence[float],
+                   phase_offsets: Sequence[float],
+                   frame_size: int = DEFAULT_FRAME_SIZE) -> np.ndarray:
+    """
+    Additive synthesis of harmonics 1..N in a single broadcast matrix op.
+
+    Equivalent to summing amplitudes[h-1] * sin(h * phase + phase_offsets[h-1])
+    over every harmonic, but evaluated as one sin() over a cached phase matrix
+    followed by one matrix-vector product.
+
+    Args:
+        amplitudes (Sequence[float]): Amplitude per harmonic, starting at the fundamental.
+        phase_offsets (Sequence[float]): Phase offset (radians) per harmonic.
+        frame_size (int): Number of samples in the frame.
+
+    Returns:
+        np.ndarray: The summed waveform (float64, length frame_size).
+    """
+    amplitudes = np.asarray(amplitudes, dtype=np.float64)
+    if amplitudes.size == 0:
+        return np.zeros(frame_size)
+    offsets = np.asarray(phase_offsets, dtype=np.float64)[:, None]
+    matrix = _harmonic_phase_matrix(amplitudes.size, frame_size)
+    return amplitudes @ np.sin(matrix + offsets)
+
+
 def get_shape_for_osc1(stats):
     """
     OSC1 → Attack Phase: Sharper = more aggression, smoother = more mellow.
@@ -114,11 +158,10 @@ def get_shape_for_osc3(stats):
 
 
 
-def generate_osc1_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE, shape: str = "sine") -> str:
-    import base64, random
-    from midi_analysis import compute_midi_stats
-
-    stats = compute_midi_stats(midi_data)
+def generate_osc1_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE, shape: str = "sine",
+                        stats: Optional[Dict[str, Any]] = None) -> str:
+    if stats is None:
+        stats = compute_midi_stats(midi_data)
     velocity = stats.get("avg_velocity", 0.5)
     pitch_range = stats.get("pitch_range", 12)
     note_density = stats.get("note_density", 4.0)
@@ -126,16 +169,14 @@ def generate_osc1_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRA
     modwheel = ccs.get(1, 0.5)
     rng = random.Random(int(stats["avg_pitch"] * 1234))
 
-    phase = np.linspace(0, 2 * np.pi, frame_size, endpoint=False)
+    phase = _phase_vector(frame_size)
 
     if shape == "sine":
         waveform = np.sin(phase + modwheel * np.sin(phase * 2))
     elif shape == "saw":
-        max_h = int(6 + pitch_range + note_density)
-        waveform = np.sum([
-            (1.0 / h) * np.sin(h * phase + rng.uniform(0, 0.2))
-            for h in range(1, max_h)
-        ], axis=0)
+        harmonics = np.arange(1, max(int(6 + pitch_range + note_density), 1))
+        offsets = [rng.uniform(0, 0.2) for _ in harmonics]
+        waveform = additive_frame(1.0 / harmonics, offsets, frame_size)
     elif shape == "triangle":
         base = 2 * np.abs(np.mod(phase / np.pi, 2) - 1) - 1
         harmonic = 0.3 * np.sin(phase * 3 + modwheel * 2)
@@ -152,29 +193,25 @@ def generate_osc1_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRA
     return base64.b64encode(waveform.astype(np.float32).tobytes()).decode("utf-8")
 
 
-def generate_osc2_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE, shape: str = "saw") -> str:
-    import base64, random
-    from midi_analysis import compute_midi_stats
-
-    stats = compute_midi_stats(midi_data)
+def generate_osc2_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE, shape: str = "saw",
+                        stats: Optional[Dict[str, Any]] = None) -> str:
+    if stats is None:
+        stats = compute_midi_stats(midi_data)
     velocity = stats.get("avg_velocity", 0.5)
     pitch_range = stats.get("pitch_range", 12)
     note_density = stats.get("note_density", 4.0)
     rng = random.Random(int(stats["avg_pitch"] * 4321))
 
-    phase = np.linspace(0, 2 * np.pi, frame_size, endpoint=False)
+    phase = _phase_vector(frame_size)
 
     if shape == "saw":
-        max_harm = int(8 + pitch_range + note_density)
-        waveform = np.sum([
-            (1.0 / h) * np.sin(h * phase + rng.uniform(0, 0.3))
-            for h in range(1, max_harm)
-        ], axis=0)
+        harmonics = np.arange(1, max(int(8 + pitch_range + note_density), 1))
+        offsets = [rng.uniform(0, 0.3) for _ in harmonics]
+        waveform = additive_frame(1.0 / harmonics, offsets, frame_size)
     elif shape == "harmonic_buzz":
-        base = np.sum([
-            np.sin(h * phase + rng.uniform(0, 0.1)) * (1.0 / (h ** 0.9))
-            for h in range(1, 20)
-        ], axis=0)
+        harmonics = np.arange(1, 20)
+        offsets = [rng.uniform(0, 0.1) for _ in harmonics]
+        base = additive_frame(1.0 / (harmonics ** 0.9), offsets, frame_size)
         detune = 0.1 * np.sin(phase * rng.randint(2, 6))
         waveform = base + detune
     elif shape == "chaotic":
@@ -188,17 +225,16 @@ def generate_osc2_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRA
     return base64.b64encode(waveform.astype(np.float32).tobytes()).decode("utf-8")
 
 
-def generate_osc3_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE, shape: str = "triangle") -> str:
-    import base64, random
-    from midi_analysis import compute_midi_stats
-
-    stats = compute_midi_stats(midi_data)
+def generate_osc3_frame(midi_data: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE, shape: str = "triangle",
+                        stats: Optional[Dict[str, Any]] = None) -> str:
+    if stats is None:
+        stats = compute_midi_stats(midi_data)
     velocity = stats.get("avg_velocity", 0.5)
     pitch_range = stats.get("pitch_range", 12)
     avg_pitch = stats.get("avg_pitch", 60.0)
     rng = random.Random(int(avg_pitch * 5678))
 
-    phase = np.linspace(0, 2 * np.pi, frame_size, endpoint=False)
+    phase = _phase_vector(frame_size)
 
     if shape == "triangle":
         tri = 2 * np.abs(np.mod(phase / np.pi, 2) - 1) - 1
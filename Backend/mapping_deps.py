@@ -0,0 +1,299 @@
+# mapping_deps.py
+"""
+Dependency tracking for incremental re-conversion.
+
+Every virus_to_vital_map entry gets a fingerprint (its targets plus the bytecode
+of its scale/extra lambdas and handler, and of every helper, constant and
+project module those functions reach through their globals). Each output
+folder keeps a manifest with
+those fingerprints, the settings keys each entry wrote and the source parameter
+blocks. After a mapping edit, only outputs whose entries changed are touched,
+and only the affected settings keys are rewritten.
+"""
+
+import os
+import sys
+import json
+import types
+import hashlib
+import importlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from virus_sysex_param_map import virus_sysex_param_map
+
+MANIFEST_FILENAME = ".deps.json"
+MANIFEST_VERSION = 2  # 2: fingerprints cover the helpers and globals functions use
+STAGE_OWNER = "__stages__"
+
+# Modules whose code affects every output; any edit here forces a full reconvert.
+PIPELINE_MODULES = [
+    "config",
+    "virus_sysex_param_map",
+    "virus_patch",
+    "virus_sysex_to_vital",
+    "virus_to_vital_converter",
+    "virus_lfo_generator",
+    "vital_wavetable_generator",
+    "wavetable_engine",
+    "frame_encoder",
+    "template_index",
+    "shared_assets",
+    "mapping_registry",
+    "effects_mapper.master_fx",
+    "effects_mapper.chorus",
+    "effects_mapper.delay",
+    "modulations.master_m",
+]
+
+
+# -------------------------------------------------------------------
+# Fingerprints
+# -------------------------------------------------------------------
+def _mapping() -> Dict[str, Any]:
+    # Imported on use: the converter needs STAGE_OWNER in worker processes, which must
+    # not execute the map on disk (they run the parent's, see mapping_registry)
+    from virus_to_vital_map import virus_to_vital_map
+    return virus_to_vital_map
+
+
+def _code_fingerprint(code, digest) -> None:
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _code_fingerprint(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+_PLAIN_TYPES = (int, float, complex, str, bytes, bool, type(None), dict, list, tuple)
+
+
+def _code_names(code) -> Set[str]:
+    """Global and attribute names a code object (or any code nested in it) reads."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            names |= _code_names(const)
+    return names
+
+
+def _referenced_fingerprint(value: Any, digest, seen: Set[int]) -> None:
+    """A global or closure value a function reads: helpers recursively, project modules by source."""
+    if id(value) in seen:
+        digest.update(b"seen")
+        return
+    if isinstance(value, types.ModuleType):
+        path = getattr(value, "__file__", None)
+        # Third-party and stdlib modules don't change with a mapping edit
+        if path and os.path.abspath(path).startswith(_PROJECT_DIR + os.sep):
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha1(f.read()).digest())
+    elif (callable(value) and hasattr(value, "__code__")) or isinstance(value, _PLAIN_TYPES):
+        _value_fingerprint(value, digest, seen)
+    else:
+        digest.update(type(value).__qualname__.encode())  # reprs of other objects may hold addresses
+
+
+def _value_fingerprint(value: Any, digest, seen: Optional[Set[int]] = None) -> None:
+    seen = set() if seen is None else seen
+    if callable(value) and hasattr(value, "__code__"):
+        seen.add(id(value))
+        digest.update(b"fn:")
+        _code_fingerprint(value.__code__, digest)
+        # Helpers and module globals the function uses, so editing them invalidates it too
+        namespace = getattr(value, "__globals__", {})
+        for name in sorted(_code_names(value.__code__)):
+            if name in namespace:
+                digest.update(name.encode())
+                _referenced_fingerprint(namespace[name], digest, seen)
+        for cell in value.__closure__ or ():
+            _referenced_fingerprint(cell.cell_contents, digest, seen)
+    elif isinstance(value, dict):
+        seen.add(id(value))
+        digest.update(b"{")
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _value_fingerprint(value[key], digest, seen)
+        digest.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        seen.add(id(value))
+        digest.update(b"[")
+        for item in value:
+            _value_fingerprint(item, digest, seen)
+        digest.update(b"]")
+    else:
+        digest.update(repr(value).encode())
+
+
+def entry_fingerprint(entry: Any) -> str:
+    """Stable hash of one mapping entry, including the code of any handler it names and what that code uses."""
+    digest = hashlib.sha1()
+    _value_fingerprint(entry, digest)
+    if isinstance(entry, dict) and "handler" in entry:
+        from custom_handlers import __dict__ as handler_funcs
+        _value_fingerprint(handler_funcs.get(entry["handler"]), digest)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def mapping_fingerprints() -> Dict[str, str]:
+    return {name: entry_fingerprint(entry) for name, entry in _mapping().items()}
+
+
+def is_modulation_entry(entry: Any) -> bool:
+    """Modulation entries share slot allocation, so changing one shifts the others."""
+    return isinstance(entry, dict) and ("modulate_target" in entry or "modulation_target" in entry)
+
+
+@lru_cache(maxsize=1)
+def pipeline_fingerprint() -> str:
+    digest = hashlib.sha1()
+    for module_name in PIPELINE_MODULES:
+        module = sys.modules.get(module_name) or importlib.import_module(module_name)
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def template_fingerprint(template_json: str) -> str:
+    return hashlib.sha1(template_json.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------------
+# Manifests
+# -------------------------------------------------------------------
+def new_manifest(template_json: str) -> Dict[str, Any]:
+    return {
+        "version": MANIFEST_VERSION,
+        "template": template_fingerprint(template_json),
+        "pipeline": pipeline_fingerprint(),
+        "fingerprints": mapping_fingerprints(),
+        "entry_keys": {},
+        "outputs": {},
+    }
+
+
+def record_output(manifest: Dict[str, Any], output_name: str, param_block: bytes,
+                  key_log: Dict[str, Set[str]]) -> None:
+    """Add one converted output and the keys each mapping entry wrote for it."""
+    manifest["outputs"][output_name] = bytes(param_block).hex()
+    entry_keys = manifest["entry_keys"]
+    for owner, keys in key_log.items():
+        entry_keys[owner] = sorted(set(entry_keys.get(owner, [])) | keys)
+
+
+def load_manifest(out_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def save_manifest(out_dir: str, manifest: Dict[str, Any]) -> None:
+    with open(os.path.join(out_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+
+
+def plan_update(manifest: Optional[Dict[str, Any]], template_json: str) -> Tuple[str, List[str]]:
+    """
+    Decide what to do with an existing output folder after a code or mapping change.
+
+    Returns:
+        ("skip", []) when nothing it depends on changed,
+        ("patch", [entry names]) when only independently patchable entries changed,
+        ("reconvert", []) otherwise.
+    """
+    if manifest is None:
+        return "reconvert", []
+    if manifest["template"] != template_fingerprint(template_json) or manifest["pipeline"] != pipeline_fingerprint():
+        return "reconvert", []
+
+    old = manifest["fingerprints"]
+    new = mapping_fingerprints()
+    changed = sorted(name for name in set(old) | set(new) if old.get(name) != new.get(name))
+    if not changed:
+        return "skip", []
+
+    entry_keys = manifest["entry_keys"]
+    for name in changed:
+        if is_modulation_entry(_mapping().get(name)) or name not in new:
+            return "reconvert", []
+
+    # A changed entry is only patchable if no other entry or later stage writes its keys
+    changed_keys = set()
+    for name in changed:
+        changed_keys.update(entry_keys.get(name, []))
+    for owner, keys in entry_keys.items():
+        if owner not in changed and changed_keys.intersection(keys):
+            return "reconvert", []
+
+    return "patch", changed
+
+
+def patch_outputs(out_dir: str, manifest: Dict[str, Any], changed: List[str], template: Dict[str, Any],
+                  compact: bool, compress: bool) -> Optional[int]:
+    """
+    Re-apply only the changed mapping entries to every cached output in out_dir.
+
+    Keys an entry used to write are first reset to the template value, then the
+    current entry is applied and the keys it writes now are recorded.
+
+    Returns:
+        Number of outputs patched, or None if an edited entry now writes keys owned
+        by another entry; the folder must then be reconverted (manifest untouched).
+    """
+    from virus_sysex_to_vital import RecordingDict, apply_mapping_entry
+    from virus_to_vital_converter import build_virus_params, load_vital_file_as_dict, serialize_vital_preset, \
+        write_vital_file
+
+    virus_to_vital_map = _mapping()
+    offsets = {}
+    for idx, name in virus_sysex_param_map.items():
+        offsets.setdefault(name, []).append(idx)
+
+    template_settings = template["settings"]
+    entry_keys = manifest["entry_keys"]
+    patched = 0
+    new_keys: Dict[str, Set[str]] = {name: set() for name in changed}
+
+    for output_name, params_hex in sorted(manifest["outputs"].items()):
+        path = os.path.join(out_dir, output_name)
+        preset = load_vital_file_as_dict(path)
+        param_block = list(bytes.fromhex(params_hex))
+        virus_params = build_virus_params(param_block)
+        settings = preset["settings"]
+
+        for name in changed:
+            for key in entry_keys.get(name, []):
+                if key in template_settings:
+                    settings[key] = template_settings[key]
+                else:
+                    settings.pop(key, None)
+
+        recorder = RecordingDict(settings)
+        preset["settings"] = recorder
+        for name in changed:
+            recorder.owner = name
+            for idx in offsets.get(name, []):
+                apply_mapping_entry(virus_to_vital_map.get(name), param_block[idx], preset, virus_params)
+        preset["settings"] = dict(recorder)
+
+        for name, keys in recorder.written.items():
+            new_keys[name].update(keys)
+            for owner, owned in entry_keys.items():
+                if owner not in changed and keys.intersection(owned):
+                    return None
+
+        write_vital_file(path, serialize_vital_preset(preset, compact), compress)
+        patched += 1
+
+    for name in changed:
+        entry_keys[name] = sorted(new_keys[name])
+    manifest["fingerprints"] = mapping_fingerprints()
+    save_manifest(out_dir, manifest)
+    return patched
@@ -0,0 +1,361 @@
+# mapping_registry.py
+"""
+Compiled, hot-reloadable view of virus_to_vital_map.
+
+Every map entry is validated and compiled once into a plain function
+op(virus_value, vital_preset, virus_params) indexed by SysEx byte, so the
+per-patch loop does no dict inspection, handler lookup or signature guessing.
+Unknown handler names are rejected at compile time instead of being skipped
+on every byte.
+
+reload() executes fresh copies of the map and custom_handlers sources,
+compiles them and only then swaps the active plan (a single reference
+assignment), so a broken edit never replaces a working plan. The plan's token
+is the hash of exactly the source text it was compiled from; worker processes
+are handed that text (MappingSources) rather than re-reading the files, so
+they always run the map the parent accepted.
+"""
+
+import sys
+import time
+import hashlib
+import inspect
+import threading
+import importlib
+import importlib.util
+from types import ModuleType
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from virus_sysex_param_map import virus_sysex_param_map
+
+MAP_MODULE = "virus_to_vital_map"
+HANDLERS_MODULE = "custom_handlers"
+
+# Handler names in the map that are applied by dedicated pipeline stages
+# (LFO / wavetable injection in virus_to_vital_converter), not per byte.
+STAGE_HANDLERS = {
+    "inject_osc1_waveform_from_sysex": ("vital_wavetable_generator", "inject_oscillator_wavetables"),
+    "inject_osc2_waveform_from_sysex": ("vital_wavetable_generator", "inject_oscillator_wavetables"),
+    "inject_osc3_waveform_from_shape": ("vital_wavetable_generator", "inject_oscillator_wavetables"),
+    "inject_lfo1_shape_from_sysex": ("virus_lfo_generator", "inject_lfo1_shape_from_sysex"),
+    "inject_lfo2_shape_from_sysex": ("virus_lfo_generator", "inject_lfo2_shape_from_sysex"),
+    "inject_lfo3_shape_from_sysex": ("virus_lfo_generator", "inject_lfo3_shape_from_sysex"),
+}
+
+MappingOp = Callable[[int, Dict[str, Any], Dict[str, int]], None]
+
+
+class MappingError(ValueError):
+    """An entry in virus_to_vital_map is invalid (e.g. names a handler that doesn't exist)."""
+
+
+# -------------------------------------------------------------------
+# Compilation
+# -------------------------------------------------------------------
+def _identity(x):
+    return x
+
+
+def _compile_handler(name: str, handler_name: str, handlers: Dict[str, Any]) -> Tuple[str, Optional[MappingOp]]:
+    if handler_name in STAGE_HANDLERS:
+        module_name, func_name = STAGE_HANDLERS[handler_name]
+        if not callable(getattr(importlib.import_module(module_name), func_name, None)):
+            raise MappingError(f"{name}: stage handler {module_name}.{func_name} not found")
+        return "stage", None
+
+    handler = handlers.get(handler_name)
+    if not callable(handler):
+        raise MappingError(f"{name}: unknown handler '{handler_name}'")
+
+    params = inspect.signature(handler).parameters.values()
+    takes_params = any(p.kind == p.VAR_POSITIONAL for p in params) or len(params) >= 3
+    if takes_params:
+        return "handler", lambda value, preset, virus_params: handler(value, preset, virus_params)
+    return "handler", lambda value, preset, virus_params: handler(value, preset)
+
+
+def compile_entry(name: str, mapping: Any, handlers: Dict[str, Any]) -> Tuple[str, Optional[MappingOp]]:
+    """
+    Compile one map entry.
+
+    Returns:
+        (kind, op) where kind is one of "handler", "scalar", "multi", "list",
+        "modulation", "stage" or "unmapped", and op is None when the entry
+        writes nothing in the scalar-mapping stage.
+
+    Raises:
+        MappingError: If the entry is malformed or names an unknown handler.
+    """
+    if not mapping:
+        return "unmapped", None
+
+    if isinstance(mapping, list):
+        items = []
+        for item in mapping:
+            if not isinstance(item, dict):
+                raise MappingError(f"{name}: list entries must be dicts")
+            scale = item.get("scale") if callable(item.get("scale")) else _identity
+            if item.get("vital_target"):
+                items.append((item["vital_target"], scale))
+        if not items:
+            return "unmapped", None
+        items = tuple(items)
+
+        def apply_list(value, preset, virus_params):
+            settings = preset["settings"]
+            for target, scale in items:
+                settings[target] = scale(value)
+        return "list", apply_list
+
+    if not isinstance(mapping, dict):
+        raise MappingError(f"{name}: entry must be a dict, list or None, not {type(mapping).__name__}")
+
+    if "handler" in mapping:
+        return _compile_handler(name, mapping["handler"], handlers)
+
+    scale = mapping.get("scale") if callable(mapping.get("scale")) else _identity
+    extra = mapping.get("extra") if callable(mapping.get("extra")) else None
+    target = mapping.get("vital_target")
+
+    if isinstance(target, list):
+        targets = tuple(target)
+
+        def apply_multi(value, preset, virus_params):
+            settings = preset["settings"]
+            scaled = scale(value)
+            for key in targets:
+                settings[key] = scaled[key]
+            if extra is not None:
+                extra(value, preset["settings"])
+        return "multi", apply_multi
+
+    if target:
+        def apply_scalar(value, preset, virus_params):
+            preset["settings"][target] = scale(value)
+            if extra is not None:
+                extra(value, preset["settings"])
+        return "scalar", apply_scalar
+
+    if extra is not None:
+        return "scalar", lambda value, preset, virus_params: extra(value, preset["settings"])
+
+    if "modulation_target" in mapping or "modulate_target" in mapping:
+        return "modulation", None  # applied by modulations.master_m
+    return "unmapped", None
+
+
+class CompiledPlan:
+    """
+    Immutable compiled map.
+
+    Attributes:
+        ops (tuple): (byte_index, param_name, op) for every byte whose entry writes settings.
+        mapping (dict): The raw map the plan was compiled from (used by the modulation stage).
+        kinds (dict): Entry count per kind.
+        token (str): Content hash of the map and handler sources.
+        compile_seconds (float): Time spent loading and compiling.
+    """
+
+    __slots__ = ("ops", "mapping", "kinds", "token", "compile_seconds", "loaded_at")
+
+    def __init__(self, ops, mapping, kinds, token, compile_seconds):
+        self.ops: Tuple[Tuple[int, str, MappingOp], ...] = ops
+        self.mapping: Dict[str, Any] = mapping
+        self.kinds: Dict[str, int] = kinds
+        self.token: str = token
+        self.compile_seconds: float = compile_seconds
+        self.loaded_at = time.time()
+
+
+def compile_plan(mapping: Dict[str, Any], handlers: Dict[str, Any], token: str = "") -> CompiledPlan:
+    started = time.perf_counter()
+    compiled: Dict[str, Tuple[str, Optional[MappingOp]]] = {}
+    errors: List[str] = []
+    for name, entry in mapping.items():
+        try:
+            compiled[name] = compile_entry(name, entry, handlers)
+        except MappingError as e:
+            errors.append(str(e))
+    if errors:
+        raise MappingError("Invalid virus_to_vital_map entries:\n  " + "\n  ".join(errors))
+
+    kinds: Dict[str, int] = {}
+    for kind, _ in compiled.values():
+        kinds[kind] = kinds.get(kind, 0) + 1
+
+    ops = []
+    for idx in range(256):
+        name = virus_sysex_param_map.get(idx)
+        if name and name in compiled and compiled[name][1] is not None:
+            ops.append((idx, name, compiled[name][1]))
+
+    return CompiledPlan(tuple(ops), mapping, kinds, token, time.perf_counter() - started)
+
+
+# -------------------------------------------------------------------
+# Registry
+# -------------------------------------------------------------------
+class MappingSources(NamedTuple):
+    """Source text of the map and handler modules a plan was compiled from; `token` is their hash."""
+    token: str
+    texts: Tuple[Tuple[str, str], ...]  # (module name, source) in load order
+
+
+def _module_path(module_name: str) -> str:
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module.__file__
+    return importlib.util.find_spec(module_name).origin  # locate without executing a possibly broken edit
+
+
+def read_sources() -> MappingSources:
+    """Current map and handler sources on disk."""
+    texts = []
+    for module_name in (HANDLERS_MODULE, MAP_MODULE):
+        with open(_module_path(module_name), "r", encoding="utf-8") as f:
+            texts.append((module_name, f.read()))
+    return MappingSources(_token(texts), tuple(texts))
+
+
+def _token(texts) -> str:
+    digest = hashlib.sha1()
+    for _, text in texts:
+        digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _exec_source(module_name: str, text: str) -> ModuleType:
+    """Execute `text` as a new module object named `module_name` (sys.modules untouched)."""
+    module = ModuleType(module_name)
+    module.__file__ = _module_path(module_name)
+    exec(compile(text, module.__file__, "exec"), module.__dict__)
+    return module
+
+
+def compile_sources(sources: MappingSources) -> CompiledPlan:
+    """
+    Execute and compile exactly the given sources, whatever is on disk now.
+
+    Raises:
+        MappingError: The sources don't match their token or the map is invalid.
+        Exception: Any error raised while executing the modules.
+    """
+    if _token(sources.texts) != sources.token:
+        raise MappingError(f"Mapping sources don't match token {sources.token[:12]}")
+    texts = dict(sources.texts)
+    handlers = _exec_source(HANDLERS_MODULE, texts[HANDLERS_MODULE])
+    previous = sys.modules.get(HANDLERS_MODULE)
+    sys.modules[HANDLERS_MODULE] = handlers  # the map imports helpers from custom_handlers
+    try:
+        mapping = _exec_source(MAP_MODULE, texts[MAP_MODULE])
+    finally:
+        if previous is None:
+            del sys.modules[HANDLERS_MODULE]
+        else:
+            sys.modules[HANDLERS_MODULE] = previous
+    return compile_plan(mapping.virus_to_vital_map, vars(handlers), sources.token)
+
+
+class MappingRegistry:
+    """
+    Holds the active CompiledPlan and swaps it atomically on reload.
+
+    Args:
+        sources: Compile these instead of the files on disk (worker processes get the parent's).
+    """
+
+    def __init__(self, sources: Optional[MappingSources] = None):
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._sources = sources or read_sources()
+        self._plan = compile_sources(self._sources)
+        self._initial_sources = self._sources  # what ensure() can go back to without being sent it
+
+    @property
+    def plan(self) -> CompiledPlan:
+        """Current plan; grab it once per patch so a concurrent reload can't mix plans."""
+        return self._plan
+
+    @property
+    def sources(self) -> MappingSources:
+        """The sources the current plan was compiled from (what to send to worker processes)."""
+        return self._sources
+
+    def reload(self, sources: Optional[MappingSources] = None) -> Dict[str, Any]:
+        """
+        Recompile from `sources` (default: the current files) and swap the plan in.
+
+        Raises:
+            MappingError: The new map is invalid; the previous plan stays active.
+            Exception: Any error raised while executing the edited modules.
+        """
+        with self._lock:
+            try:
+                sources = sources or read_sources()
+                plan = compile_sources(sources)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+
+            self._plan, self._sources = plan, sources
+            self.reloads += 1
+            self.last_error = None
+            return self.stats()
+
+    def ensure(self, token: str, sources: Optional[MappingSources] = None) -> None:
+        """
+        Make the active plan the one with `token` (used by worker processes).
+
+        Args:
+            token: The parent's plan token.
+            sources: The parent's sources, sent when the worker may not have them yet.
+                If omitted, the sources this registry was created with are used when
+                they match (a reload that was reverted).
+
+        Raises:
+            MappingError: The plan differs and no matching sources were sent.
+        """
+        if token == self._plan.token:
+            return
+        if sources is None and token == self._initial_sources.token:
+            sources = self._initial_sources
+        if sources is None or sources.token != token:
+            raise MappingError(f"Mapping {self._plan.token[:12]} is active, {token[:12]} was requested "
+                               f"without its sources")
+        self.reload(sources)
+
+    def stats(self) -> Dict[str, Any]:
+        plan = self._plan
+        return {
+            "token": plan.token[:12],
+            "entries": sum(plan.kinds.values()),
+            "kinds": dict(sorted(plan.kinds.items())),
+            "active_bytes": len(plan.ops),
+            "compile_ms": round(plan.compile_seconds * 1000, 2),
+            "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(plan.loaded_at)),
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+_registry: Optional[MappingRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MappingRegistry:
+    """Process-wide registry, compiled on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MappingRegistry()
+    return _registry
+
+
+def install_sources(sources: MappingSources) -> MappingRegistry:
+    """Make the process-wide registry compile `sources` (a worker adopting its parent's map)."""
+    global _registry
+    with _registry_lock:
+        _registry = MappingRegistry(sources)
+    return _registry
@@ -1,12 +1,17 @@
-def apply_virus_modulations(virus_params: dict, preset: dict, virus_to_vital_map: dict):
+def apply_virus_modulations(virus_params: dict, preset: dict, virus_to_vital_map: dict, slots=None):
     """
     Injects modulation into Vital preset's settings block based on Virus modulation parameters.
+
+    If `slots` (a template_index.PresetSlots) is given, free modulation slots come
+    from its precomputed free-slot list instead of scanning the slot list.
     """
     settings = preset.get("settings")
-    if not settings or not isinstance(settings.get("modulations"), list):
-        settings["modulations"] = [{"source": "", "destination": ""} for _ in range(64)]
-
-    mod_list = settings["modulations"]
+    if slots is not None:
+        mod_list = slots.modulations
+    else:
+        if not settings or not isinstance(settings.get("modulations"), list):
+            settings["modulations"] = [{"source": "", "destination": ""} for _ in range(64)]
+        mod_list = settings["modulations"]
 
     for virus_param, value in virus_params.items():
         if value == 0:
@@ -36,12 +41,15 @@ def apply_virus_modulations(virus_params: dict, preset: dict, virus_to_vital_map
             continue
 
         # Find empty modulation slot
-        try:
+        if slots is not None:
+            mod_index = slots.allocate_modulation_slot()
+        else:
             mod_index = next(
-                i for i, mod in enumerate(mod_list)
-                if mod.get("source") == "" and mod.get("destination") == ""
+                (i for i, mod in enumerate(mod_list)
+                 if mod.get("source") == "" and mod.get("destination") == ""),
+                None,
             )
-        except StopIteration:
+        if mod_index is None:
             print(f"⚠️ No modulation slots left — skipping {virus_param}")
             continue
 
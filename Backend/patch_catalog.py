@@ -0,0 +1,239 @@
+# patch_catalog.py
+"""
+SQLite catalog of every ingested Virus patch.
+
+One row per distinct parameter block (keyed by its SHA-1), with the patch
+name, the raw 256 bytes and a set of key parameters stored as indexed
+integer columns. The sources a block was found in and the outputs it was
+converted to live in their own tables, so filters like
+"Chorus_Mode > 0 and Osc3 on" or "already converted?" are index lookups.
+
+    catalog = PatchCatalog("patch_catalog.sqlite")
+    catalog.ingest_source("bank.mid")
+    catalog.find("Chorus_Mode>0", "Osc3_Wave_Select>0")
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+
+# Parameters stored as indexed columns (column name = lower-cased parameter name)
+KEY_PARAMS = (
+    "Osc1_Shape", "Osc1_Wave_Select", "Osc2_Shape", "Osc2_Wave_Select", "Osc3_Wave_Select",
+    "Suboscillator_Volume", "Noise_Volume", "Ringmodulator_Volume",
+    "Filter1_Mode", "Filter2_Mode", "Filter_Routing", "Cutoff", "Cutoff2", "Saturation_Curve",
+    "Lfo1_Shape", "Lfo2_Shape", "Lfo3_Shape",
+    "Unison_Mode", "Key_Mode", "Arp_Mode", "Chorus_Mode", "Effect_Send", "Delay_Time", "Vocoder_Mode",
+)
+KEY_COLUMNS = {name: name.lower() for name in KEY_PARAMS}
+_COLUMN_LOOKUP = {name.lower(): column for name, column in KEY_COLUMNS.items()}
+
+OPERATORS = ("!=", ">=", "<=", "=", ">", "<")
+_CONDITION = re.compile(r"^\s*([A-Za-z0-9_]+)\s*(!=|>=|<=|==|=|>|<)\s*(-?\d+)\s*$")
+
+Condition = Union[str, Tuple[str, str, int]]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS patches (
+    block_hash TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    params BLOB NOT NULL,
+    ingested_at REAL NOT NULL,
+    {", ".join(f"{column} INTEGER NOT NULL" for column in KEY_COLUMNS.values())}
+);
+CREATE INDEX IF NOT EXISTS patches_name ON patches (name);
+{"".join(f"CREATE INDEX IF NOT EXISTS patches_{c} ON patches ({c});" for c in KEY_COLUMNS.values())}
+
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    block_hash TEXT NOT NULL REFERENCES patches (block_hash),
+    PRIMARY KEY (source, position)
+);
+CREATE INDEX IF NOT EXISTS sources_block ON sources (block_hash);
+
+CREATE TABLE IF NOT EXISTS outputs (
+    output_path TEXT PRIMARY KEY,
+    block_hash TEXT NOT NULL REFERENCES patches (block_hash),
+    cache_key TEXT NOT NULL,
+    converted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_block ON outputs (block_hash);
+CREATE INDEX IF NOT EXISTS outputs_cache_key ON outputs (cache_key);
+"""
+
+
+def block_hash(param_block: Union[bytes, Sequence[int]]) -> str:
+    return hashlib.sha1(bytes(param_block)).hexdigest()
+
+
+def conversion_key(param_block: Union[bytes, Sequence[int]], manifest: Dict[str, Any]) -> str:
+    """Identifies a conversion result: the block plus the template, pipeline and mapping it was made with."""
+    digest = hashlib.sha1(bytes(param_block))
+    digest.update(manifest["template"].encode())
+    digest.update(manifest["pipeline"].encode())
+    digest.update(json.dumps(manifest["fingerprints"], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def parse_condition(condition: Condition) -> Tuple[str, str, int]:
+    """"Chorus_Mode>0" or ("Chorus_Mode", ">", 0) → (column, operator, value)."""
+    if isinstance(condition, str):
+        match = _CONDITION.match(condition)
+        if not match:
+            raise ValueError(f"Bad condition {condition!r}; expected e.g. 'Chorus_Mode>0'")
+        name, op, value = match.group(1), match.group(2), int(match.group(3))
+    else:
+        name, op, value = condition
+    op = "=" if op == "==" else op
+    if op not in OPERATORS:
+        raise ValueError(f"Unsupported operator {op!r}")
+    column = _COLUMN_LOOKUP.get(name.lower())
+    if column is None:
+        raise ValueError(f"{name} is not an indexed parameter; indexed: {', '.join(KEY_PARAMS)}")
+    return column, op, int(value)
+
+
+class PatchCatalog:
+    """
+    Args:
+        path (str): SQLite database file (created if missing).
+        check_same_thread (bool): False to share one connection between threads
+            (the caller then serialises access, e.g. with a lock).
+    """
+
+    def __init__(self, path: str, check_same_thread: bool = True):
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA cache_size=-65536")  # 64 MB: keeps the key-column indexes in memory on bulk inserts
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.execute("PRAGMA optimize")  # refresh planner statistics after bulk inserts
+        self.db.close()
+
+    def __enter__(self) -> "PatchCatalog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ---------------------------------------------------------------
+    # Ingest
+    # ---------------------------------------------------------------
+    def add_blocks(self, blocks: Iterable[Union[bytes, Sequence[int]]], source: Optional[str] = None) -> List[str]:
+        """
+        Record parameter blocks (and, if given, the source they came from, replacing
+        that source's previous entries). Returns the block hashes in order.
+        """
+        from virus_bank import VirusBank
+
+        bank = VirusBank.from_blocks(blocks)
+        if not len(bank):
+            return []
+
+        now = time.time()
+        hashes = [block_hash(row) for row in bank.blocks]
+        key_values = bank.columns(KEY_PARAMS).tolist()
+        rows = [
+            (h, name, row.tobytes(), now, *values)
+            for h, name, row, values in zip(hashes, bank.names, bank.blocks, key_values)
+        ]
+        columns = ", ".join(["block_hash", "name", "params", "ingested_at", *KEY_COLUMNS.values()])
+        with self.db:
+            self.db.executemany(
+                f"INSERT OR IGNORE INTO patches ({columns}) VALUES ({', '.join('?' * (4 + len(KEY_PARAMS)))})", rows)
+            if source is not None:
+                self.db.execute("DELETE FROM sources WHERE source = ?", (source,))
+                self.db.executemany("INSERT INTO sources (source, position, block_hash) VALUES (?, ?, ?)",
+                                    [(source, i, h) for i, h in enumerate(hashes, start=1)])
+        return hashes
+
+    def ingest_source(self, path: str, source_name: Optional[str] = None) -> int:
+        """Record every Virus single dump in a .mid/.midi/.syx file or .npy bank. Returns the patch count."""
+        from conversion_pipeline import ingest_source
+
+        blocks = [block for _, block in ingest_source(path)]
+        return len(self.add_blocks(blocks, source_name or os.path.abspath(path)))
+
+    def record_outputs(self, out_dir: str, manifest: Dict[str, Any], source: Optional[str] = None) -> int:
+        """Record the outputs listed in a conversion manifest (mapping_deps) as converted, and their source."""
+        now = time.time()
+        blocks, rows = [], []
+        for output_name, params_hex in sorted(manifest["outputs"].items()):
+            block = bytes.fromhex(params_hex)
+            blocks.append(block)
+            rows.append((os.path.abspath(os.path.join(out_dir, output_name)), block_hash(block),
+                         conversion_key(block, manifest), now))
+        self.add_blocks(blocks, source)
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO outputs (output_path, block_hash, cache_key, converted_at) VALUES (?, ?, ?, ?)",
+                rows)
+        return len(rows)
+
+    # ---------------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------------
+    def find(self, *conditions: Condition, name: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Patches matching all conditions on indexed parameters (and an optional
+        SQL LIKE pattern on the name). Each result has block_hash, name, the key
+        parameters, one source and the latest output path (if converted).
+        """
+        where, args = [], []
+        for condition in conditions:
+            column, op, value = parse_condition(condition)
+            where.append(f"p.{column} {op} ?")
+            args.append(value)
+        if name is not None:
+            where.append("p.name LIKE ?")
+            args.append(name)
+
+        sql = (
+            f"SELECT p.block_hash, p.name, {', '.join(f'p.{c}' for c in KEY_COLUMNS.values())}, "
+            "(SELECT s.source FROM sources s WHERE s.block_hash = p.block_hash LIMIT 1) AS source, "
+            "(SELECT o.output_path FROM outputs o WHERE o.block_hash = p.block_hash "
+            "ORDER BY o.converted_at DESC LIMIT 1) AS output_path "
+            "FROM patches p"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Results come in ingestion order; ORDER BY name would make SQLite walk the name index instead
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.db.execute(sql, args)]
+
+    def converted_output(self, param_block: Union[bytes, Sequence[int]],
+                         cache_key: Optional[str] = None) -> Optional[str]:
+        """Latest output path for this block (optionally for an exact conversion key), or None."""
+        if cache_key is not None:
+            row = self.db.execute("SELECT output_path FROM outputs WHERE cache_key = ? "
+                                  "ORDER BY converted_at DESC LIMIT 1", (cache_key,)).fetchone()
+        else:
+            row = self.db.execute("SELECT output_path FROM outputs WHERE block_hash = ? "
+                                  "ORDER BY converted_at DESC LIMIT 1", (block_hash(param_block),)).fetchone()
+        return row["output_path"] if row else None
+
+    def params(self, block_hash_hex: str) -> Optional[bytes]:
+        row = self.db.execute("SELECT params FROM patches WHERE block_hash = ?", (block_hash_hex,)).fetchone()
+        return bytes(row["params"]) if row else None
+
+    def stats(self) -> Dict[str, int]:
+        count = lambda sql: self.db.execute(sql).fetchone()[0]
+        return {
+            "patches": count("SELECT COUNT(*) FROM patches"),
+            "sources": count("SELECT COUNT(DISTINCT source) FROM sources"),
+            "converted": count("SELECT COUNT(DISTINCT block_hash) FROM outputs"),
+            "outputs": count("SELECT COUNT(*) FROM outputs"),
+        }
@@ -0,0 +1,247 @@
+# patch_similarity.py
+"""
+Nearest-neighbour search and near-duplicate detection over Virus patches.
+
+Each 256-byte parameter block becomes a weighted feature vector. Name bytes,
+undefined/reserved bytes and MIDI performance controllers get weight 0, and
+the oscillator waveforms and filter type/cutoff count double. The distance
+between two patches is the weighted RMS difference of their parameters
+(0 = identical sound parameters, 1 = every weighted byte differs by 127).
+
+Small banks are searched exactly with vectorised distance matrices. Large
+libraries use a Euclidean LSH index (random projections quantised into
+buckets, several tables); only patches that share a bucket are compared.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from virus_sysex_param_map import virus_sysex_param_map
+from virus_patch import PARAM_BLOCK_SIZE
+from config import (
+    SIMILARITY_DUP_THRESHOLD,
+    SIMILARITY_EXACT_MAX,
+    SIMILARITY_LSH_TABLES,
+    SIMILARITY_LSH_HASHES,
+    SIMILARITY_LSH_WIDTH,
+    SIMILARITY_SEED,
+)
+
+# Bytes that don't affect the sound (or aren't documented)
+IGNORED_PREFIXES = ("undefined_", "Single_Name_Char", "Reserved_", "Contr_", "Bank_Select")
+IGNORED_PARAMS = {
+    "Modulation_Wheel", "Breath_Controller", "Foot_Controller", "Data_Slider", "Channel_Volume",
+    "Balance", "Expression", "Hold_Pedal", "Portamento_Pedal", "Sostenuto_Pedal", "All_Notes_Off",
+}
+# Parameters that define a patch's character more than the rest
+EMPHASISED_PARAMS = {
+    "Osc1_Shape": 2.0, "Osc2_Shape": 2.0, "Osc1_Wave_Select": 2.0, "Osc2_Wave_Select": 2.0,
+    "Osc3_Wave_Select": 2.0, "Suboscillator_Shape": 2.0, "Filter1_Mode": 2.0, "Filter2_Mode": 2.0,
+    "Filter_Routing": 2.0, "Cutoff": 2.0, "Cutoff2": 2.0,
+}
+
+# Cap on distance-matrix elements computed at once (float64 → 32 MB)
+_MATRIX_BUDGET = 4_000_000
+
+
+def parameter_weights() -> np.ndarray:
+    """(256,) float weights per parameter byte, keyed by virus_sysex_param_map names."""
+    weights = np.ones(PARAM_BLOCK_SIZE, dtype=np.float64)
+    for idx in range(PARAM_BLOCK_SIZE):
+        name = virus_sysex_param_map.get(idx, f"undefined_{idx}")
+        if name.startswith(IGNORED_PREFIXES) or name in IGNORED_PARAMS:
+            weights[idx] = 0.0
+        else:
+            weights[idx] = EMPHASISED_PARAMS.get(name, 1.0)
+    return weights
+
+
+def featurize(blocks: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    (N, 256) uint8 blocks → (N, D) float64 features whose Euclidean distance is
+    the weighted RMS parameter distance. Zero-weight bytes are dropped.
+    """
+    if weights is None:
+        weights = parameter_weights()
+    columns = np.flatnonzero(weights)
+    scale = np.sqrt(weights[columns] / weights.sum()) / 127.0
+    return np.asarray(blocks)[:, columns].astype(np.float64) * scale
+
+
+def _distance_matrix(a: np.ndarray, b: np.ndarray, a_sq: np.ndarray, b_sq: np.ndarray) -> np.ndarray:
+    d2 = a_sq[:, None] + b_sq[None, :] - 2.0 * (a @ b.T)
+    np.maximum(d2, 0.0, out=d2)
+    return np.sqrt(d2, out=d2)
+
+
+def _connected_labels(n: int, pairs_a: np.ndarray, pairs_b: np.ndarray) -> np.ndarray:
+    """Label every node with the smallest index in its connected component."""
+    labels = np.arange(n)
+    if not len(pairs_a):
+        return labels
+    while True:
+        low = np.minimum(labels[pairs_a], labels[pairs_b])
+        updated = labels.copy()
+        np.minimum.at(updated, pairs_a, low)
+        np.minimum.at(updated, pairs_b, low)
+        updated = updated[updated]  # pointer jumping
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+class _LshTables:
+    """E2LSH: h(x) = floor((a·x + b) / w), `hashes` of them concatenated per table."""
+
+    def __init__(self, features: np.ndarray, tables: int, hashes: int, width: float, seed: int):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.projections = rng.standard_normal((tables, features.shape[1], hashes))
+        self.offsets = rng.uniform(0.0, width, size=(tables, 1, hashes))
+        self.mix = rng.integers(1, 1 << 61, size=hashes, dtype=np.int64) | 1
+
+        self.keys = self._keys(features)              # (tables, N)
+        self.order = np.argsort(self.keys, axis=1, kind="stable")
+        self.sorted_keys = np.take_along_axis(self.keys, self.order, axis=1)
+
+    def _keys(self, features: np.ndarray) -> np.ndarray:
+        projected = np.einsum("nd,tdh->tnh", features, self.projections) + self.offsets
+        codes = np.floor(projected / self.width).astype(np.int64)
+        return (codes * self.mix).sum(axis=2)  # int64 wrap-around is fine for a bucket key
+
+    def buckets(self):
+        """Yield member-index arrays of every bucket with at least two members, per table."""
+        for sorted_keys, order in zip(self.sorted_keys, self.order):
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1], True])
+            for start, end in zip(starts[:-1], starts[1:]):
+                if end - start > 1:
+                    yield order[start:end]
+
+    def candidates(self, features: np.ndarray) -> np.ndarray:
+        """Indices sharing at least one bucket with the given (1, D) query."""
+        keys = self._keys(features)[:, 0]
+        found = []
+        for table, key in enumerate(keys):
+            lo = np.searchsorted(self.sorted_keys[table], key, side="left")
+            hi = np.searchsorted(self.sorted_keys[table], key, side="right")
+            found.append(self.order[table, lo:hi])
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+
+class SimilarityIndex:
+    """
+    Index over a bank of parameter blocks.
+
+    Args:
+        blocks (np.ndarray): (N, 256) uint8 array (e.g. VirusBank.blocks).
+        approximate (bool, optional): Use the LSH index. Default: only when N > SIMILARITY_EXACT_MAX.
+    """
+
+    def __init__(self, blocks: np.ndarray, approximate: Optional[bool] = None,
+                 tables: int = SIMILARITY_LSH_TABLES, hashes: int = SIMILARITY_LSH_HASHES,
+                 width: float = SIMILARITY_LSH_WIDTH, seed: int = SIMILARITY_SEED):
+        self.weights = parameter_weights()
+        self.features = featurize(blocks, self.weights)
+        self.squared = np.einsum("nd,nd->n", self.features, self.features)
+        self.approximate = len(self.features) > SIMILARITY_EXACT_MAX if approximate is None else approximate
+        self._lsh = _LshTables(self.features, tables, hashes, width, seed) if self.approximate else None
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def query(self, block: Sequence[int], k: int = 5) -> List[Tuple[int, float]]:
+        """The k nearest patches to `block` as (index, distance), closest first."""
+        query = featurize(np.asarray(block, dtype=np.uint8).reshape(1, -1), self.weights)
+        candidates = self._lsh.candidates(query) if self._lsh is not None else np.arange(len(self))
+        if not len(candidates):
+            return []
+
+        distances = _distance_matrix(query, self.features[candidates],
+                                     np.einsum("nd,nd->n", query, query), self.squared[candidates])[0]
+        k = min(k, len(candidates))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return [(int(candidates[i]), float(distances[i])) for i in nearest]
+
+    def _close_pairs(self, members: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Pairs (i < j) among `members` within `threshold`, computed in row chunks."""
+        features, squared = self.features[members], self.squared[members]
+        rows = max(1, _MATRIX_BUDGET // max(len(members), 1))
+        found_a, found_b = [], []
+        for start in range(0, len(members), rows):
+            block = _distance_matrix(features[start:start + rows], features[start:], squared[start:start + rows],
+                                     squared[start:])
+            i, j = np.nonzero(block <= threshold)
+            upper = j > i  # block column 0 is row `start` itself
+            found_a.append(members[start + i[upper]])
+            found_b.append(members[start + j[upper]])
+        return np.concatenate(found_a), np.concatenate(found_b)
+
+    def near_duplicates(self, threshold: float = SIMILARITY_DUP_THRESHOLD) -> np.ndarray:
+        """
+        Group patches whose distance chains stay within `threshold`.
+
+        Returns:
+            (N,) array: for each patch, the index of the first patch in its group.
+        """
+        n = len(self)
+        if not n:
+            return np.empty(0, dtype=np.int64)
+
+        # Byte-identical (weighted) patches are merged first, so big piles of copies don't cost N² pairs
+        _, first, inverse = np.unique(self.features, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        distinct = np.sort(first)
+
+        pairs_a, pairs_b = [np.arange(n)], [first[inverse]]
+        if self._lsh is None:
+            a, b = self._close_pairs(distinct, threshold)
+            pairs_a.append(a)
+            pairs_b.append(b)
+        else:
+            is_distinct = np.zeros(n, dtype=bool)
+            is_distinct[distinct] = True
+            for members in self._lsh.buckets():
+                members = members[is_distinct[members]]
+                if len(members) > 1:
+                    a, b = self._close_pairs(members, threshold)
+                    pairs_a.append(a)
+                    pairs_b.append(b)
+
+        return _connected_labels(n, np.concatenate(pairs_a), np.concatenate(pairs_b))
+
+
+def find_duplicates(blocks: np.ndarray, threshold: float = SIMILARITY_DUP_THRESHOLD,
+                    approximate: Optional[bool] = None, names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Dedup report for a bank.
+
+    Returns:
+        {"patches", "unique", "method", "threshold", "seconds",
+         "keep": [indices to keep (first of each group), in bank order],
+         "groups": [[kept index, duplicate indices...], ...]  (only groups with duplicates),
+         "names": [[names per group...], ...]  (when names are given)}
+    """
+    started = time.perf_counter()
+    index = SimilarityIndex(blocks, approximate)
+    labels = index.near_duplicates(threshold)
+
+    keep = np.flatnonzero(labels == np.arange(len(labels)))
+    order = np.argsort(labels, kind="stable")
+    bounds = np.flatnonzero(np.r_[True, labels[order][1:] != labels[order][:-1], True])
+    groups = [order[s:e].tolist() for s, e in zip(bounds[:-1], bounds[1:]) if e - s > 1]
+
+    report = {
+        "patches": len(labels),
+        "unique": len(keep),
+        "method": "lsh" if index.approximate else "exact",
+        "threshold": threshold,
+        "seconds": round(time.perf_counter() - started, 4),
+        "keep": keep.tolist(),
+        "groups": groups,
+    }
+    if names is not None:
+        report["names"] = [[names[i] for i in group] for group in groups]
+    return report
@@ -0,0 +1,196 @@
+# precompressed_zip.py
+"""
+Precompressed ZIP entries and a copy-only ZIP writer.
+
+A converted preset is deflated once (raw deflate, as stored inside ZIPs)
+and kept with its CRC32 and sizes in a byte-bounded LRU EntryCache.
+ZipAssembler (and iter_zip/write_zip on top of it) then builds an archive
+by writing each local header followed by the stored compressed bytes, then
+the central directory. Nothing is recompressed, so zipping a cached bank
+is pure I/O.
+"""
+
+import time
+import zlib
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from config import ENTRY_CACHE_MAX_BYTES, VITAL_COMPRESSION_LEVEL
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_OF_CENTRAL_DIR = struct.Struct("<IHHHHIIH")
+
+_VERSION = 20  # 2.0: deflate
+_MADE_BY_UNIX = (3 << 8) | _VERSION  # so external attributes are read as Unix permissions
+_FLAG_UTF8 = 0x800
+_DEFLATED = 8
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+
+
+class CompressedEntry(NamedTuple):
+    """Raw-deflated file contents plus what a ZIP header needs."""
+    data: bytes
+    crc32: int
+    size: int
+
+    @property
+    def compressed_size(self) -> int:
+        return len(self.data)
+
+    def decompress(self) -> bytes:
+        return zlib.decompress(self.data, -15)
+
+
+def compress_entry(data: bytes, level: int = VITAL_COMPRESSION_LEVEL) -> CompressedEntry:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return CompressedEntry(compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data))
+
+
+def gzip_member(entry: CompressedEntry) -> bytes:
+    """The entry as a standalone gzip file (gzip.decompress-able), built without recompressing."""
+    return (b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff" + entry.data
+            + struct.pack("<II", entry.crc32, entry.size & _MAX_32))
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+# -------------------------------------------------------------------
+# Cache
+# -------------------------------------------------------------------
+class EntryCache:
+    """
+    Thread-safe LRU of CompressedEntry objects, bounded by total compressed bytes.
+
+    Args:
+        max_bytes (int): Evict least recently used entries beyond this size.
+    """
+
+    def __init__(self, max_bytes: int = ENTRY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CompressedEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CompressedEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CompressedEntry) -> None:
+        if entry.compressed_size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.compressed_size
+            self._entries[key] = entry
+            self._bytes += entry.compressed_size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.compressed_size
+
+    def get_or_compress(self, data: bytes, key: Optional[str] = None) -> CompressedEntry:
+        """Cached entry for `data` (keyed by its SHA-1 unless `key` is given), compressing on a miss."""
+        key = key or content_key(data)
+        entry = self.get(key)
+        if entry is None:
+            entry = compress_entry(data)
+            self.put(key, entry)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+_cache: Optional[EntryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_entry_cache() -> EntryCache:
+    """Process-wide entry cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EntryCache()
+    return _cache
+
+
+# -------------------------------------------------------------------
+# ZIP writer
+# -------------------------------------------------------------------
+def _dos_datetime(timestamp: float) -> Tuple[int, int]:
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+class ZipAssembler:
+    """
+    Incremental copy-only ZIP writer: add() returns the bytes for one entry
+    (local header + stored deflate data), finish() the central directory.
+
+    Raises:
+        ValueError: If the archive would need ZIP64 (> 65535 entries or > 4 GB).
+    """
+
+    def __init__(self, timestamp: Optional[float] = None):
+        self.dos_time, self.dos_date = _dos_datetime(time.time() if timestamp is None else timestamp)
+        self.offset = 0
+        self._central: List[bytes] = []
+
+    def add(self, name: str, entry: CompressedEntry) -> bytes:
+        encoded = name.encode("utf-8")
+        flags = 0 if encoded.isascii() else _FLAG_UTF8
+        if self.offset > _MAX_32 or entry.size > _MAX_32 or len(self._central) >= _MAX_16:
+            raise ValueError("Archive too large for a non-ZIP64 writer")
+
+        header = _LOCAL_HEADER.pack(0x04034B50, _VERSION, flags, _DEFLATED, self.dos_time, self.dos_date,
+                                    entry.crc32, entry.compressed_size, entry.size, len(encoded), 0)
+        self._central.append(_CENTRAL_HEADER.pack(0x02014B50, _MADE_BY_UNIX, _VERSION, flags, _DEFLATED,
+                                                  self.dos_time, self.dos_date, entry.crc32, entry.compressed_size,
+                                                  entry.size, len(encoded), 0, 0, 0, 0, 0o100644 << 16,
+                                                  self.offset) + encoded)
+        chunk = header + encoded + entry.data
+        self.offset += len(chunk)
+        return chunk
+
+    def finish(self) -> bytes:
+        directory = b"".join(self._central)
+        if self.offset + len(directory) > _MAX_32:
+            raise ValueError("Archive too large for a non-ZIP64 writer")
+        return directory + _END_OF_CENTRAL_DIR.pack(0x06054B50, 0, 0, len(self._central), len(self._central),
+                                                    len(directory), self.offset, 0)
+
+
+def iter_zip(entries: Iterable[Tuple[str, CompressedEntry]], timestamp: Optional[float] = None) -> Iterator[bytes]:
+    """Yield a ZIP archive chunk by chunk: one chunk per entry, then the central directory."""
+    assembler = ZipAssembler(timestamp)
+    for name, entry in entries:
+        yield assembler.add(name, entry)
+    yield assembler.finish()
+
+
+def write_zip(path: str, entries: Iterable[Tuple[str, CompressedEntry]]) -> int:
+    """Write a ZIP file from precompressed entries. Returns the archive size in bytes."""
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in iter_zip(entries):
+            f.write(chunk)
+            written += len(chunk)
+    return written
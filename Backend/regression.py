@@ -0,0 +1,211 @@
+# regression.py
+"""
+Golden-output regression harness.
+
+Converts the bundled reference sources, compares every preset against the
+checked-in digests in Tests/golden/ and fails if conversion throughput drops
+more than a configurable percentage below the stored baseline.
+
+Usage (from the Backend folder):
+    python regression.py                    # check
+    python regression.py --update           # re-record digests and baseline
+    python regression.py --dump out/        # also write the presets (for `cli.py diff`)
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import binascii
+import argparse
+import logging
+import platform
+import contextlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import REGRESSION_MAX_SLOWDOWN, REGRESSION_FLOAT_DIGITS, REGRESSION_WAVE_STEP
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(REPO_ROOT, "Tests", "golden")
+DIGESTS_PATH = os.path.join(GOLDEN_DIR, "digests.json")
+BASELINE_PATH = os.path.join(GOLDEN_DIR, "throughput.json")
+TEMPLATE_PATH = os.path.join(REPO_ROOT, "Presets", "Default.vital")
+
+GOLDEN_SOURCES = [
+    os.path.join("Presets", "404studio_Virus_C_Soundset.mid"),
+    "1.syx",
+    "2.syx",
+]
+
+
+# -------------------------------------------------------------------
+# Digests
+# -------------------------------------------------------------------
+def _canonical(value: Any, key: str = "") -> Any:
+    """Round floats and quantise decoded wave_data so digests survive harmless float noise."""
+    if isinstance(value, dict):
+        return {k: _canonical(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_canonical(v) for v in value]
+    if isinstance(value, float):
+        rounded = round(value, REGRESSION_FLOAT_DIGITS)
+        return 0.0 if rounded == 0 else rounded  # fold -0.0
+    if key == "wave_data" and isinstance(value, str):
+        samples = np.frombuffer(binascii.a2b_base64(value), dtype=np.float32)
+        quantised = np.round(samples / REGRESSION_WAVE_STEP).astype(np.int32)
+        return hashlib.sha1(quantised.tobytes()).hexdigest()
+    return value
+
+
+def preset_digest(preset: Dict[str, Any]) -> str:
+    canonical = _canonical(preset)
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------------
+# Conversion run
+# -------------------------------------------------------------------
+def load_golden_blocks() -> List[Tuple[str, bytes]]:
+    """(name, param_block) for every patch in the golden sources, e.g. ("1.syx/patch_001.vital", ...)."""
+    from cli import read_param_blocks
+
+    blocks = []
+    for source in GOLDEN_SOURCES:
+        for i, block in enumerate(read_param_blocks(os.path.join(REPO_ROOT, source)), start=1):
+            blocks.append((f"{os.path.basename(source)}/patch_{i:03}.vital", block))
+    return blocks
+
+
+def convert_golden(blocks: List[Tuple[str, bytes]], template_json: str) -> Tuple[Dict[str, str], float]:
+    """
+    Convert every golden block once.
+
+    Returns:
+        ({name: preset_json}, seconds spent converting)
+    """
+    from virus_to_vital_converter import convert_param_block
+
+    outputs = {}
+    started = time.perf_counter()
+    for name, block in blocks:
+        outputs[name] = convert_param_block(block, template_json)
+    return outputs, time.perf_counter() - started
+
+
+def measure(repeat: int) -> Tuple[Dict[str, str], float]:
+    """Run the conversion `repeat` times and keep the best throughput (patches/s)."""
+    with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        template_json = f.read()
+
+    logging.disable(logging.INFO)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            blocks = load_golden_blocks()
+            outputs, best = {}, float("inf")
+            for _ in range(max(repeat, 1)):
+                outputs, seconds = convert_golden(blocks, template_json)
+                best = min(best, seconds)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    return outputs, len(blocks) / best if best > 0 else 0.0
+
+
+# -------------------------------------------------------------------
+# Golden files
+# -------------------------------------------------------------------
+def _load_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_json(path: str, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare_digests(digests: Dict[str, str], golden: Dict[str, str]) -> Dict[str, List[str]]:
+    return {
+        "changed": sorted(n for n in digests if n in golden and digests[n] != golden[n]),
+        "missing": sorted(n for n in golden if n not in digests),
+        "unexpected": sorted(n for n in digests if n not in golden),
+    }
+
+
+def run(args: argparse.Namespace) -> int:
+    outputs, patches_per_sec = measure(args.repeat)
+    digests = {name: preset_digest(json.loads(preset_json)) for name, preset_json in outputs.items()}
+    print(f"⏱️  {len(outputs)} patches at {patches_per_sec:.1f} patches/s (best of {args.repeat})")
+
+    if args.dump:
+        from virus_to_vital_converter import write_vital_file
+        for name, preset_json in outputs.items():
+            out_path = os.path.join(args.dump, name)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            write_vital_file(out_path, preset_json, compress=False)
+        print(f"📁 Wrote presets to {args.dump}")
+
+    if args.update:
+        _save_json(DIGESTS_PATH, {"digests": digests})
+        _save_json(BASELINE_PATH, {"patches_per_sec": round(patches_per_sec, 1),
+                                   "machine": platform.machine(), "python": platform.python_version()})
+        print(f"✅ Recorded {len(digests)} golden digests and baseline in {GOLDEN_DIR}")
+        return 0
+
+    failed = False
+    golden = _load_json(DIGESTS_PATH)
+    if golden is None:
+        print(f"❌ No golden digests at {DIGESTS_PATH} (run with --update)")
+        return 1
+
+    result = compare_digests(digests, golden["digests"])
+    for kind, names in result.items():
+        for name in names:
+            print(f"❌ {kind}: {name}")
+        failed = failed or bool(names)
+    if not failed:
+        print(f"✅ All {len(digests)} presets match the golden digests")
+    elif not args.dump:
+        print("ℹ️  Re-run with --dump DIR and compare against a known-good folder via `cli.py diff`")
+
+    baseline = _load_json(BASELINE_PATH)
+    if args.max_slowdown is not None and baseline and baseline.get("patches_per_sec"):
+        floor = baseline["patches_per_sec"] * (1 - args.max_slowdown / 100)
+        change = 100 * (patches_per_sec / baseline["patches_per_sec"] - 1)
+        if patches_per_sec < floor:
+            print(f"❌ Throughput {patches_per_sec:.1f} patches/s is {-change:.1f}% below the baseline "
+                  f"{baseline['patches_per_sec']:.1f} (allowed: {args.max_slowdown:.0f}%)")
+            failed = True
+        else:
+            print(f"✅ Throughput {change:+.1f}% vs baseline {baseline['patches_per_sec']:.1f} patches/s")
+
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="regression.py", description="Golden-output and throughput regression check")
+    parser.add_argument("--update", action="store_true", help="Re-record golden digests and the throughput baseline")
+    parser.add_argument("--max-slowdown", type=float, default=REGRESSION_MAX_SLOWDOWN,
+                        help="Fail if patches/s drops more than this percentage below the baseline")
+    parser.add_argument("--no-perf", dest="max_slowdown", action="store_const", const=None,
+                        help="Skip the throughput gate (e.g. on shared CI runners)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs; the fastest one counts")
+    parser.add_argument("--dump", help="Write the converted presets to this folder")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
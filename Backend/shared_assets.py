@@ -0,0 +1,98 @@
+# shared_assets.py
+"""
+Read-only conversion assets shared by worker processes.
+
+The parent renders the template text, the OSC morph / OSC3 frame tables and
+the LFO curve table once into a single file-backed segment. Workers map it
+with np.memmap (mode "r"), so every process reads the same page-cache pages
+instead of parsing and rendering its own copies.
+
+A file segment is used rather than multiprocessing.shared_memory because
+attaching processes would otherwise register the segment with their own
+resource tracker, which unlinks it when a worker exits.
+"""
+
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def build_shared_assets(template_path: str, folder: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Render all shared assets into one file.
+
+    Args:
+        template_path (str): Template .vital preset.
+        folder (str, optional): Where to create the segment (default: system temp dir).
+
+    Returns:
+        dict layout (picklable, pass it to worker initializers):
+            {"path": str, "template": (offset, length),
+             "arrays": {name: (offset, shape, dtype str)}}
+    """
+    from vital_wavetable_generator import precompute_osc_tables
+    from virus_lfo_generator import precompute_lfo_table
+
+    with open(template_path, "rb") as f:
+        template_bytes = f.read()
+
+    arrays = dict(precompute_osc_tables())
+    arrays["lfo_curves"] = precompute_lfo_table()
+
+    fd, path = tempfile.mkstemp(prefix="vital_assets_", suffix=".bin", dir=folder)
+    layout = {"path": path, "template": (0, len(template_bytes)), "arrays": {}}
+    with os.fdopen(fd, "wb") as f:
+        f.write(template_bytes)
+        offset = len(template_bytes)
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            offset = _align(offset)
+            f.seek(offset)
+            f.write(array.tobytes())
+            layout["arrays"][name] = (offset, array.shape, array.dtype.str)
+            offset += array.nbytes
+
+    return layout
+
+
+def attach_shared_assets(layout: Dict[str, Any]) -> str:
+    """
+    Map the segment read-only and install its tables in the converter modules.
+
+    Returns:
+        The template JSON text (its index is built here too, so the first patch
+        in a worker doesn't pay for it).
+    """
+    from vital_wavetable_generator import use_shared_tables
+    from virus_lfo_generator import use_shared_lfo_table
+    from template_index import get_template_index
+
+    path = layout["path"]
+    offset, length = layout["template"]
+    template_json = bytes(np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(length,))).decode("utf-8")
+
+    arrays = {
+        name: np.memmap(path, dtype=np.dtype(dtype), mode="r", offset=array_offset, shape=tuple(shape))
+        for name, (array_offset, shape, dtype) in layout["arrays"].items()
+    }
+    use_shared_tables({name: arrays[name] for name in ("osc_morph", "osc3_frames")})
+    use_shared_lfo_table(arrays["lfo_curves"])
+
+    get_template_index(template_json)
+    return template_json
+
+
+def release_shared_assets(layout: Dict[str, Any]) -> None:
+    """Delete the segment file (workers that still map it keep their mapping)."""
+    try:
+        os.remove(layout["path"])
+    except OSError:
+        pass
@@ -1,6 +1,157 @@
 import os
+from typing import Iterator, List, Optional, Tuple
 from mido import MidiFile
 
+VIRUS_PARAM_BLOCK_SIZE = 256
+
+
+def is_virus_single_dump(data) -> bool:
+    """True if SysEx data (without the F0/F7 wrapper) is a Virus single dump with a full parameter block."""
+    return (
+        len(data) >= 265 and
+        list(data[1:5]) == [0x20, 0x33, 0x01, 0x00] and
+        data[5] == 0x10
+    )
+
+
+def iter_virus_param_blocks(midi_path: str) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Yields every 256-byte Virus parameter block found in a .mid file.
+
+    Yields:
+        (track_index, message_index, param_block) tuples.
+    """
+    midi = MidiFile(midi_path)
+    for i, track in enumerate(midi.tracks):
+        for j, msg in enumerate(track):
+            if msg.type == 'sysex' and is_virus_single_dump(msg.data):
+                param_block = bytes(msg.data[8:8 + VIRUS_PARAM_BLOCK_SIZE])
+                if len(param_block) == VIRUS_PARAM_BLOCK_SIZE:
+                    yield i, j, param_block
+
+
+def extract_param_blocks_from_midi(midi_path: str) -> List[bytes]:
+    """Returns all 256-byte Virus parameter blocks in a .mid file, in file order."""
+    return [block for _, _, block in iter_virus_param_blocks(midi_path)]
+
+
+def extract_param_blocks_from_syx(syx_path: str) -> List[bytes]:
+    """Returns every 256-byte parameter block in a raw .syx file (one or more Virus single dumps), in file order."""
+    with open(syx_path, "rb") as f:
+        data = f.read()
+
+    if data[:1] != b"\xF0":
+        data = b"\xF0" + data  # a bare dump saved without its SysEx wrapper
+    return SysExStreamScanner().feed(data)
+
+
+def extract_param_block_from_syx(syx_path: str) -> Optional[bytes]:
+    """Returns the first 256-byte parameter block of a raw Virus single-dump .syx file, or None."""
+    blocks = extract_param_blocks_from_syx(syx_path)
+    return blocks[0] if blocks else None
+
+
+class SysExStreamScanner:
+    """
+    Incremental scanner that pulls Virus single-dump parameter blocks out of a
+    byte stream fed in arbitrary chunks (e.g. an HTTP upload body).
+
+    A dump is recognised by F0 followed by the Virus single-dump header
+    (00 20 33 01 00 10), either directly (raw .syx) or after a MIDI
+    variable-length size (SysEx event in a .mid track). Dumps too short to
+    hold a parameter block are skipped, by the same rule as
+    iter_virus_param_blocks. Anything else in the stream (SMF chunks,
+    multipart boundaries, other SysEx) is skipped, so a whole
+    multipart/form-data body can be fed as-is. Only bytes that might still
+    start a dump are kept between feeds.
+    """
+
+    HEADER = bytes([0x00, 0x20, 0x33, 0x01, 0x00, 0x10])
+    MIN_DUMP_SIZE = 265  # Dump data (without F0/F7) must hold the full parameter block
+    _MAX_VARLEN = 4
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.bytes_seen = 0
+        self.blocks_found = 0
+
+    def _header_offset(self, start: int) -> Optional[Tuple[int, Optional[int]]]:
+        """
+        (offset of the dump data, declared event size) for the F0 at `start`;
+        the size is None for a raw dump, which has no length prefix. Returns
+        (-1, None) if more bytes are needed to decide, or None if this F0 does
+        not start a Virus dump.
+        """
+        buf = self._buffer
+        if len(buf) < start + 1 + self._MAX_VARLEN + len(self.HEADER):
+            # Decide as soon as the direct (.syx) form can be checked
+            if len(buf) >= start + 1 + len(self.HEADER) and buf.startswith(self.HEADER, start + 1):
+                return start + 1, None
+            return -1, None
+
+        if buf.startswith(self.HEADER, start + 1):
+            return start + 1, None
+
+        pos = start + 1
+        size = 0
+        for _ in range(self._MAX_VARLEN):
+            byte = buf[pos]
+            pos += 1
+            size = (size << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                break
+        else:
+            return None
+        return (pos, size) if buf.startswith(self.HEADER, pos) else None
+
+    def _is_full_dump(self, data_at: int, size: Optional[int]) -> bool:
+        """True if the dump at `data_at` holds a whole parameter block rather than running into the next event."""
+        if size is None:
+            # Raw dump: SysEx data is 7-bit, so an F7/F0 inside the window means it ended early
+            return max(self._buffer[data_at:data_at + self.MIN_DUMP_SIZE]) < 0x80
+        # SMF event: like mido, the data is `size` bytes without a trailing F7
+        return size > self.MIN_DUMP_SIZE or (
+            size == self.MIN_DUMP_SIZE and self._buffer[data_at + size - 1] != 0xF7)
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Add the next chunk of the stream.
+
+        Returns:
+            The 256-byte parameter blocks completed by this chunk, in stream order.
+        """
+        buf = self._buffer
+        buf += chunk
+        self.bytes_seen += len(chunk)
+
+        blocks = []
+        pos = 0
+        while True:
+            start = buf.find(0xF0, pos)
+            if start < 0:
+                pos = len(buf)
+                break
+
+            found = self._header_offset(start)
+            if found is None:
+                pos = start + 1
+                continue
+            data_at, size = found
+            if data_at < 0 or len(buf) < data_at + self.MIN_DUMP_SIZE:
+                pos = start  # keep the partial dump for the next feed
+                break
+            if not self._is_full_dump(data_at, size):
+                pos = start + 1  # truncated dump; never complete it with the next event's bytes
+                continue
+
+            blocks.append(bytes(buf[data_at + 8:data_at + 8 + VIRUS_PARAM_BLOCK_SIZE]))
+            pos = data_at + 8 + VIRUS_PARAM_BLOCK_SIZE
+
+        del buf[:pos]
+        self.blocks_found += len(blocks)
+        return blocks
+
+
 def extract_sysex_from_midi(
     midi_path: str,
     output_dir: str,
@@ -17,31 +168,20 @@ def extract_sysex_from_midi(
     Returns:
         List of full paths to saved SysEx .txt files.
     """
-    midi = MidiFile(midi_path)
     os.makedirs(output_dir, exist_ok=True)
 
     sysex_files = []
     patch_index = 0
 
-    for i, track in enumerate(midi.tracks):
-        for j, msg in enumerate(track):
-            if (
-                msg.type == 'sysex' and 
-                len(msg.data) >= 265 and
-                list(msg.data[1:5]) == [0x20, 0x33, 0x01, 0x00] and 
-                msg.data[5] == 0x10
-            ):
-                param_block = msg.data[8:8 + 256]
-
-                if len(param_block) == 256:
-                    patch_index += 1
-                    filename = os.path.join(output_dir, f"track{i:02}_msg{j:03}_patch{patch_index:03}.txt")
-                    with open(filename, "w") as f:
-                        f.write(" ".join(f"{b:02X}" for b in param_block))
-                    sysex_files.append(filename)
-
-                    if verbose:
-                        print(f"🎛️ Extracted patch #{patch_index} from Track {i}, Msg {j} → {filename}")
+    for i, j, param_block in iter_virus_param_blocks(midi_path):
+        patch_index += 1
+        filename = os.path.join(output_dir, f"track{i:02}_msg{j:03}_patch{patch_index:03}.txt")
+        with open(filename, "w") as f:
+            f.write(" ".join(f"{b:02X}" for b in param_block))
+        sysex_files.append(filename)
+
+        if verbose:
+            print(f"🎛️ Extracted patch #{patch_index} from Track {i}, Msg {j} → {filename}")
 
     if verbose and patch_index == 0:
         print("⚠️ No valid Virus SysEx patches found in the MIDI file.")
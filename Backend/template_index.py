@@ -0,0 +1,120 @@
+# template_index.py
+"""
+Pre-indexed Vital template.
+
+The template is parsed and walked once. The index records where the
+oscillator keyframes, LFO slots and modulation slots live, and which
+modulation slots are free. Each patch then gets a PresetSlots handle: a
+fresh preset in which only those indexed locations (plus the settings
+dict) are copied, with direct references the conversion stages write to
+instead of searching the tree or the serialised JSON.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import json
+
+NUM_OSCILLATORS = 3
+
+
+class TemplateIndex:
+    """Parsed template plus the locations every conversion stage writes to."""
+
+    def __init__(self, template_json: str):
+        self.template: Dict[str, Any] = json.loads(template_json)
+        settings = self.template.setdefault("settings", {})
+
+        wavetables = settings.get("wavetables", [])
+        # (wavetable index, group index, component index) of each oscillator's keyframes
+        self.keyframe_paths: List[Tuple[int, int, int]] = []
+        for osc_index, wavetable in enumerate(wavetables[:NUM_OSCILLATORS]):
+            try:
+                component = wavetable["groups"][0]["components"][0]
+            except (KeyError, IndexError, TypeError):
+                break
+            if "keyframes" not in component:
+                break
+            self.keyframe_paths.append((osc_index, 0, 0))
+
+        if not isinstance(settings.get("modulations"), list):
+            settings["modulations"] = [{"source": "", "destination": ""} for _ in range(64)]
+        self.free_modulation_slots: Tuple[int, ...] = tuple(
+            i for i, slot in enumerate(settings["modulations"])
+            if slot.get("source") == "" and slot.get("destination") == ""
+        )
+
+    def instantiate(self) -> "PresetSlots":
+        """
+        Fresh preset for one patch. The settings dict and every indexed container
+        are copied; everything else is shared with the template and must not be
+        mutated in place (stages only assign settings keys or indexed slots).
+        """
+        template_settings = self.template["settings"]
+        settings = dict(template_settings)
+        preset = dict(self.template)
+        preset["settings"] = settings
+
+        settings["lfos"] = list(template_settings.get("lfos", []))
+        settings["modulations"] = list(template_settings["modulations"])
+
+        components = []
+        if "wavetables" in template_settings:
+            wavetables = list(template_settings["wavetables"])
+            for osc_index, group_index, component_index in self.keyframe_paths:
+                wavetable = dict(wavetables[osc_index])
+                groups = list(wavetable["groups"])
+                group = dict(groups[group_index])
+                group["components"] = list(group["components"])
+                component = dict(group["components"][component_index])
+                group["components"][component_index] = component
+                groups[group_index] = group
+                wavetable["groups"] = groups
+                wavetables[osc_index] = wavetable
+                components.append(component)
+            settings["wavetables"] = wavetables
+
+        return PresetSlots(preset, components, settings["lfos"], settings["modulations"],
+                           self.free_modulation_slots)
+
+
+class PresetSlots:
+    """
+    Direct references into one patch's preset.
+
+    Attributes:
+        preset (dict): The preset to serialise.
+        components (list): Wavetable component dict per oscillator (holds "keyframes").
+        lfos (list): settings["lfos"].
+        modulations (list): settings["modulations"].
+    """
+
+    __slots__ = ("preset", "components", "lfos", "modulations", "_free_slots", "_next_free")
+
+    def __init__(self, preset: Dict[str, Any], components: List[Dict[str, Any]], lfos: List[Dict[str, Any]],
+                 modulations: List[Dict[str, str]], free_slots: Tuple[int, ...]):
+        self.preset = preset
+        self.components = components
+        self.lfos = lfos
+        self.modulations = modulations
+        self._free_slots = free_slots
+        self._next_free = 0
+
+    def set_lfo(self, lfo_index: int, shape: Dict[str, Any]) -> None:
+        while len(self.lfos) <= lfo_index:
+            self.lfos.append({})
+        self.lfos[lfo_index] = shape
+
+    def allocate_modulation_slot(self) -> Optional[int]:
+        """Index of the next free modulation slot (in template order), or None when all are used."""
+        if self._next_free >= len(self._free_slots):
+            return None
+        slot = self._free_slots[self._next_free]
+        self._next_free += 1
+        return slot
+
+
+@lru_cache(maxsize=4)
+def get_template_index(template_json: str) -> TemplateIndex:
+    """Index for a template's JSON text, built once per process."""
+    return TemplateIndex(template_json)
@@ -0,0 +1,167 @@
+# upload_progress.py
+"""
+Live progress for /upload jobs (ASGI app).
+
+The page picks a job id, subscribes to GET /progress/<job> (Server-Sent
+Events) and posts the file to /upload?job=<job>. The upload handler updates
+one UploadProgress with what really happened: bytes received, patches
+found, patches converted and ZIP bytes sent, plus the time to the first
+converted patch and to the first response byte. POST /progress/<job>/cancel
+(or the client disconnecting) stops the job and drops its queued work.
+"""
+
+import re
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional
+
+from config import PROGRESS_EVENT_INTERVAL, PROGRESS_KEEPALIVE, PROGRESS_KEEP_SECONDS, PROGRESS_MAX_JOBS
+
+JOB_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+FINAL_STATES = ("done", "cancelled", "failed")
+
+
+class UploadCancelled(Exception):
+    """The job was cancelled by the client."""
+
+
+class UploadProgress:
+    """
+    Counters for one upload. Every update wakes all subscribers; events() throttles them.
+
+    States: waiting → receiving → converting → sending → done | cancelled | failed
+    """
+
+    def __init__(self, job_id: str):
+        self.job = job_id
+        self.state = "waiting"
+        self.bytes_received = 0
+        self.bytes_total: Optional[int] = None
+        self.patches_found = 0
+        self.patches_converted = 0
+        self.zip_bytes_sent = 0
+        self.first_result_ms: Optional[float] = None
+        self.first_byte_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.started = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+        self._changed = asyncio.Event()
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def update(self, **fields: Any) -> None:
+        for key, value in fields.items():
+            setattr(self, key, value)
+        if self.state in FINAL_STATES and self.finished_at is None:
+            self.finished_at = time.time()
+        # Swap in a fresh event so every current waiter wakes exactly once
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def start(self, bytes_total: Optional[int]) -> None:
+        self.started = time.perf_counter()
+        self.update(state="receiving", bytes_total=bytes_total)
+
+    def converted(self) -> None:
+        if self.first_result_ms is None:
+            self.first_result_ms = self._elapsed_ms()
+        self.update(patches_converted=self.patches_converted + 1)
+
+    def sent(self, size: int) -> None:
+        if self.first_byte_ms is None:
+            self.first_byte_ms = self._elapsed_ms()
+        self.update(zip_bytes_sent=self.zip_bytes_sent + size,
+                    state="sending" if self.state not in FINAL_STATES else self.state)
+
+    def cancel(self) -> None:
+        if self.state not in FINAL_STATES:
+            self.cancelled = True
+            self.update(state="cancelled")
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise UploadCancelled(f"Upload {self.job} cancelled")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job": self.job,
+            "state": self.state,
+            "bytes_received": self.bytes_received,
+            "bytes_total": self.bytes_total,
+            "patches_found": self.patches_found,
+            "patches_converted": self.patches_converted,
+            "zip_bytes_sent": self.zip_bytes_sent,
+            "first_result_ms": self.first_result_ms,
+            "first_byte_ms": self.first_byte_ms,
+            "elapsed_ms": self._elapsed_ms() if self.state != "waiting" else 0,
+            "error": self.error,
+        }
+
+    async def events(self, interval: float = PROGRESS_EVENT_INTERVAL,
+                     keepalive: float = PROGRESS_KEEPALIVE) -> AsyncIterator[bytes]:
+        """Server-Sent Events: a "progress" event per change (at most one per `interval`), then "done"."""
+        while True:
+            changed = self._changed
+            snapshot = self.snapshot()
+            if self.state in FINAL_STATES:
+                yield _sse("done", snapshot)
+                return
+            yield _sse("progress", snapshot)
+            try:
+                await asyncio.wait_for(changed.wait(), keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            await asyncio.sleep(interval)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+class ProgressRegistry:
+    """
+    Jobs by id. A subscriber may connect before the upload starts, so get() creates
+    missing jobs. Finished jobs are kept PROGRESS_KEEP_SECONDS for late subscribers.
+    Beyond PROGRESS_MAX_JOBS the oldest finished jobs are dropped first, then the
+    oldest jobs nobody has started an upload for. Running jobs are never dropped
+    (admission control bounds how many there are), so they can always be cancelled.
+    """
+
+    def __init__(self, max_jobs: int = PROGRESS_MAX_JOBS, keep_seconds: float = PROGRESS_KEEP_SECONDS):
+        self.max_jobs = max_jobs
+        self.keep_seconds = keep_seconds
+        self._jobs: "OrderedDict[str, UploadProgress]" = OrderedDict()
+
+    def get(self, job_id: str) -> UploadProgress:
+        if not JOB_ID.match(job_id):
+            raise ValueError("Job id must be 1-64 characters of A-Z, a-z, 0-9, '_' or '-'")
+        self._prune()
+        progress = self._jobs.get(job_id)
+        if progress is None:
+            progress = self._jobs[job_id] = UploadProgress(job_id)
+        return progress
+
+    def find(self, job_id: str) -> Optional[UploadProgress]:
+        return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [j for j, p in self._jobs.items() if p.finished_at is not None and p.finished_at < cutoff]:
+            del self._jobs[job_id]
+        excess = len(self._jobs) - self.max_jobs + 1
+        for states in (FINAL_STATES, ("waiting",)):
+            if excess <= 0:
+                break
+            evict = [j for j, p in self._jobs.items() if p.state in states][:excess]
+            for job_id in evict:
+                del self._jobs[job_id]
+            excess -= len(evict)
+
+    def stats(self) -> Dict[str, int]:
+        active = sum(1 for p in self._jobs.values() if p.state not in FINAL_STATES)
+        return {"jobs": len(self._jobs), "active": active}
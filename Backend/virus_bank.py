@@ -0,0 +1,113 @@
+# virus_bank.py
+"""
+VirusBank: every patch of one or more Virus dumps as a single contiguous
+(N, 256) uint8 array.
+
+Batch stages can work on whole columns (bank.column("Osc1_Shape") is an
+(N,) view), and single patches are VirusPatch views over one row (no copy).
+A bank saves to a plain .npy file; load() memory-maps it, so opening a
+50k-patch library is one mmap and pages are read only when touched.
+"""
+
+import os
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from virus_patch import PARAM_BLOCK_SIZE, PARAM_OFFSETS, VirusPatch
+
+NAME_START = PARAM_OFFSETS["Single_Name_Char1"]   # byte 240
+NAME_END = PARAM_OFFSETS["Single_Name_Char10"] + 1  # byte 250, exclusive
+
+
+class VirusBank:
+    """
+    Args:
+        blocks (np.ndarray): (N, 256) uint8 array (may be a read-only memmap).
+    """
+
+    __slots__ = ("blocks", "_names")
+
+    def __init__(self, blocks: np.ndarray):
+        if blocks.ndim != 2 or blocks.shape[1] != PARAM_BLOCK_SIZE or blocks.dtype != np.uint8:
+            raise ValueError(f"VirusBank needs an (N, {PARAM_BLOCK_SIZE}) uint8 array, got {blocks.shape} {blocks.dtype}")
+        self.blocks = blocks
+        self._names: Optional[List[str]] = None
+
+    # ---------------------------------------------------------------
+    # Construction
+    # ---------------------------------------------------------------
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[Union[bytes, Sequence[int]]]) -> "VirusBank":
+        """Stack 256-byte parameter blocks (bytes, lists or arrays) into one bank."""
+        buffer = bytearray()
+        for block in blocks:
+            block = bytes(block)
+            if len(block) != PARAM_BLOCK_SIZE:
+                raise ValueError(f"Virus param_block must have exactly {PARAM_BLOCK_SIZE} entries, got {len(block)}.")
+            buffer += block
+        return cls(np.frombuffer(bytes(buffer), dtype=np.uint8).reshape(-1, PARAM_BLOCK_SIZE))
+
+    @classmethod
+    def from_sources(cls, paths: Iterable[str]) -> "VirusBank":
+        """Collect every Virus single dump from .mid/.midi/.syx files, in the order given."""
+        from sysex_parser import iter_virus_param_blocks, extract_param_blocks_from_syx
+
+        def blocks():
+            for path in paths:
+                if path.lower().endswith(".syx"):
+                    yield from extract_param_blocks_from_syx(path)
+                else:
+                    for _, _, block in iter_virus_param_blocks(path):
+                        yield block
+
+        return cls.from_blocks(blocks())
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "VirusBank":
+        """Open a bank saved with save(); memory-mapped read-only unless mmap=False."""
+        return cls(np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False))
+
+    def save(self, path: str) -> str:
+        """Write the bank as a .npy file (names are decoded from the name bytes, so nothing else is stored)."""
+        if not path.endswith(".npy"):
+            path += ".npy"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.save(path, np.ascontiguousarray(self.blocks), allow_pickle=False)
+        return path
+
+    # ---------------------------------------------------------------
+    # Access
+    # ---------------------------------------------------------------
+    def __len__(self) -> int:
+        return self.blocks.shape[0]
+
+    def __getitem__(self, index: int) -> VirusPatch:
+        return VirusPatch(memoryview(self.blocks[index]))
+
+    def __iter__(self) -> Iterator[VirusPatch]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, name: str) -> np.ndarray:
+        """(N,) view of one parameter across the bank, e.g. bank.column("Osc1_Shape")."""
+        return self.blocks[:, PARAM_OFFSETS[name]]
+
+    def columns(self, names: Sequence[str]) -> np.ndarray:
+        """(N, len(names)) copy of several parameters."""
+        return self.blocks[:, [PARAM_OFFSETS[name] for name in names]]
+
+    @property
+    def names(self) -> List[str]:
+        """Patch names from Single_Name_Char1..10 (non-printable bytes become spaces, trailing spaces stripped)."""
+        if self._names is None:
+            raw = self.blocks[:, NAME_START:NAME_END]
+            printable = np.where((raw >= 32) & (raw < 127), raw, 32).astype(np.uint8)
+            width = NAME_END - NAME_START
+            self._names = [name.decode("ascii").rstrip() for name in printable.view(f"S{width}").ravel()]
+        return self._names
+
+    def iter_blocks(self) -> Iterator[Tuple[str, bytes]]:
+        """Yield (patch_filename, param_block) for conversion_pipeline.convert_stream."""
+        for index in range(len(self)):
+            yield f"patch_{index + 1:03}.vital", self.blocks[index].tobytes()
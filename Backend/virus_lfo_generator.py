@@ -1,8 +1,12 @@
 # virus_lfo_generator.py
 
+import zlib
 import numpy as np
-from typing import Dict, Any
-from config import DEFAULT_LFO_FRAME_SIZE
+from typing import Dict, Any, Optional, TYPE_CHECKING
+from config import DEFAULT_LFO_FRAME_SIZE, LFO_RANDOM_SEED
+
+if TYPE_CHECKING:
+    from template_index import PresetSlots
   # Ensure this constant is defined
 
 
@@ -25,6 +29,56 @@ def virus_lfo_shape_number_to_name(value: int) -> str:
         return "unknown"
 
 
+def _lfo_rng(virus_params: Dict[str, Any], lfo_number: int) -> np.random.Generator:
+    """
+    Random source for S&H / glide shapes, seeded from the patch itself so the
+    same patch always converts to the same preset.
+    """
+    patch_hash = zlib.crc32(repr(sorted(virus_params.items())).encode("utf-8"))
+    return np.random.default_rng([LFO_RANDOM_SEED, lfo_number, patch_hash])
+
+
+RANDOM_LFO_SHAPES = ("sample_and_hold", "sample_and_glide")
+NUM_VIRUS_VALUES = 128
+
+_shared_lfo_table: Optional[np.ndarray] = None
+
+
+def _lfo_curve(shape_name: str, x: np.ndarray) -> np.ndarray:
+    """Raw -1..1 curve for the shapes that don't depend on the patch."""
+    if shape_name == "sine":
+        return np.sin(2 * np.pi * x)
+    elif shape_name == "triangle":
+        return 2 * np.abs(2 * (x % 1) - 1) - 1
+    elif shape_name == "saw":
+        return 2 * (x % 1) - 1
+    elif shape_name == "square":
+        return np.sign(np.sin(2 * np.pi * x))
+    elif shape_name.startswith("wave_"):
+        return 2 * np.abs(2 * (x % 1) - 1) - 1
+    return np.zeros(x.size)
+
+
+def precompute_lfo_table(frame_size: int = DEFAULT_LFO_FRAME_SIZE) -> np.ndarray:
+    """
+    Normalised (0..1) LFO curves for every Lfo*_Shape value, shape (128, frame_size).
+    Rows for the random shapes are left at zero; those are always generated per patch.
+    """
+    x = np.linspace(0, 1, frame_size)
+    table = np.zeros((NUM_VIRUS_VALUES, frame_size))
+    for value in range(NUM_VIRUS_VALUES):
+        shape_name = virus_lfo_shape_number_to_name(value)
+        if shape_name not in RANDOM_LFO_SHAPES:
+            table[value] = (_lfo_curve(shape_name, x) + 1) / 2
+    return table
+
+
+def use_shared_lfo_table(table: Optional[np.ndarray]) -> None:
+    """Serve deterministic LFO curves from a precomputed (e.g. memory-mapped) table."""
+    global _shared_lfo_table
+    _shared_lfo_table = table
+
+
 def generate_lfo_shape_from_sysex(virus_params: Dict[str, Any], lfo_number: int = 1, frame_size: int = DEFAULT_LFO_FRAME_SIZE) -> Dict[str, Any]:
     """
     Generates an LFO shape for Vital from Virus LFO shape parameter, in Vital-compatible format.
@@ -34,28 +88,20 @@ def generate_lfo_shape_from_sysex(virus_params: Dict[str, Any], lfo_number: int
     shape_name = virus_lfo_shape_number_to_name(shape_value)
 
     x = np.linspace(0, 1, frame_size)
+    table = _shared_lfo_table
 
-    if shape_name == "sine":
-        y = np.sin(2 * np.pi * x)
-    elif shape_name == "triangle":
-        y = 2 * np.abs(2 * (x % 1) - 1) - 1
-    elif shape_name == "saw":
-        y = 2 * (x % 1) - 1
-    elif shape_name == "square":
-        y = np.sign(np.sin(2 * np.pi * x))
-    elif shape_name == "sample_and_hold":
+    if shape_name == "sample_and_hold":
         block_size = frame_size // 8
-        y = np.repeat(np.random.uniform(-1, 1, 8), block_size)
+        y = (np.repeat(_lfo_rng(virus_params, lfo_number).uniform(-1, 1, 8), block_size) + 1) / 2
     elif shape_name == "sample_and_glide":
-        points = np.random.uniform(-1, 1, 8)
-        y = np.interp(x, np.linspace(0, 1, 8), points)
-    elif shape_name.startswith("wave_"):
-        y = 2 * np.abs(2 * (x % 1) - 1) - 1
+        points = _lfo_rng(virus_params, lfo_number).uniform(-1, 1, 8)
+        y = (np.interp(x, np.linspace(0, 1, 8), points) + 1) / 2
+    elif table is not None and table.shape[1] == frame_size and 0 <= shape_value < table.shape[0]:
+        y = table[shape_value]
     else:
-        y = np.zeros(frame_size)
+        y = (_lfo_curve(shape_name, x) + 1) / 2
 
-    # Normalize y to [0, 1] for Vital
-    y = (y + 1) / 2
+    # y is normalised to [0, 1] for Vital
     points = [val for pair in zip(x, y) for val in pair]  # [x0, y0, x1, y1, ...]
     powers = [0.0] * frame_size
 
@@ -68,42 +114,54 @@ def generate_lfo_shape_from_sysex(virus_params: Dict[str, Any], lfo_number: int
     }
 
 
-def inject_lfo1_shape_from_sysex(virus_params: Dict[str, Any], preset: Dict[str, Any]) -> None:
+def inject_lfo1_shape_from_sysex(virus_params: Dict[str, Any], preset: Dict[str, Any],
+                                slots: Optional["PresetSlots"] = None) -> None:
     shape_dict = generate_lfo_shape_from_sysex(virus_params, lfo_number=1)
 
-    preset.setdefault("settings", {})
-    preset["settings"].setdefault("lfos", [])
+    if slots is not None:
+        slots.set_lfo(0, shape_dict)
+    else:
+        preset.setdefault("settings", {})
+        preset["settings"].setdefault("lfos", [])
 
-    while len(preset["settings"]["lfos"]) < 1:
-        preset["settings"]["lfos"].append({})
+        while len(preset["settings"]["lfos"]) < 1:
+            preset["settings"]["lfos"].append({})
 
-    preset["settings"]["lfos"][0] = shape_dict
+        preset["settings"]["lfos"][0] = shape_dict
     print(f"🎛️ Injected LFO1 shape → {shape_dict['name']}")
 
 
 
-def inject_lfo2_shape_from_sysex(virus_params: Dict[str, Any], preset: Dict[str, Any]) -> None:
+def inject_lfo2_shape_from_sysex(virus_params: Dict[str, Any], preset: Dict[str, Any],
+                                slots: Optional["PresetSlots"] = None) -> None:
     shape_dict = generate_lfo_shape_from_sysex(virus_params, lfo_number=2)
 
-    preset.setdefault("settings", {})
-    preset["settings"].setdefault("lfos", [])
+    if slots is not None:
+        slots.set_lfo(1, shape_dict)
+    else:
+        preset.setdefault("settings", {})
+        preset["settings"].setdefault("lfos", [])
 
-    while len(preset["settings"]["lfos"]) < 2:
-        preset["settings"]["lfos"].append({})
+        while len(preset["settings"]["lfos"]) < 2:
+            preset["settings"]["lfos"].append({})
 
-    preset["settings"]["lfos"][1] = shape_dict
+        preset["settings"]["lfos"][1] = shape_dict
     print(f"🎛️ Injected LFO2 shape → {shape_dict['name']}")
 
 
 
-def inject_lfo3_shape_from_sysex(virus_params: Dict[str, Any], preset: Dict[str, Any]) -> None:
+def inject_lfo3_shape_from_sysex(virus_params: Dict[str, Any], preset: Dict[str, Any],
+                                slots: Optional["PresetSlots"] = None) -> None:
     shape_dict = generate_lfo_shape_from_sysex(virus_params, lfo_number=3)
 
-    preset.setdefault("settings", {})
-    preset["settings"].setdefault("lfos", [])
+    if slots is not None:
+        slots.set_lfo(2, shape_dict)
+    else:
+        preset.setdefault("settings", {})
+        preset["settings"].setdefault("lfos", [])
 
-    while len(preset["settings"]["lfos"]) < 3:
-        preset["settings"]["lfos"].append({})
+        while len(preset["settings"]["lfos"]) < 3:
+            preset["settings"]["lfos"].append({})
 
-    preset["settings"]["lfos"][2] = shape_dict
+        preset["settings"]["lfos"][2] = shape_dict
     print(f"🎛️ Injected LFO3 shape → {shape_dict['name']}")
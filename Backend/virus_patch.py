@@ -0,0 +1,101 @@
+# virus_patch.py
+"""
+VirusPatch: a read-only, name-addressable view over one 256-byte Virus
+parameter block.
+
+It replaces the per-patch {param_name: value} dict. Name → offset lookups
+are precomputed once for the whole process, so a patch is a single slot
+holding the raw bytes. It behaves like the old dict for every consumer
+(patch["Lfo1_Shape"], .get(), .items(), iteration order, equality), and
+parameters are also available as attributes (patch.Lfo1_Shape).
+
+Duplicate names in virus_sysex_param_map (e.g. "Reserved_Unknown") resolve
+to the last offset and keep the position of the first, exactly like the dict
+comprehension they replace. Unnamed bytes are exposed as "undefined_<idx>".
+"""
+
+from collections.abc import ItemsView, Mapping, ValuesView
+from operator import itemgetter
+from typing import Any, Dict, Iterator, Sequence, Tuple, Union
+
+from virus_sysex_param_map import virus_sysex_param_map
+
+PARAM_BLOCK_SIZE = 256
+
+
+def _build_offsets() -> Dict[str, int]:
+    offsets: Dict[str, int] = {}
+    for idx in range(PARAM_BLOCK_SIZE):
+        offsets[virus_sysex_param_map.get(idx, f"undefined_{idx}")] = idx  # last index wins
+    return offsets
+
+
+PARAM_OFFSETS: Dict[str, int] = _build_offsets()
+PARAM_NAMES: Tuple[str, ...] = tuple(PARAM_OFFSETS)
+_values_of = itemgetter(*(PARAM_OFFSETS[name] for name in PARAM_NAMES))
+
+
+class _PatchItems(ItemsView):
+    def __iter__(self):
+        return zip(PARAM_NAMES, _values_of(self._mapping.data))
+
+
+class _PatchValues(ValuesView):
+    def __iter__(self):
+        return iter(_values_of(self._mapping.data))
+
+
+class VirusPatch(Mapping):
+    """
+    Mapping view of a Virus parameter block.
+
+    Args:
+        data: 256 parameter bytes (bytes, memoryview, a uint8 NumPy row or a list of ints).
+            bytes and memoryview are used as-is (no copy); anything else is copied once.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Union[bytes, memoryview, Sequence[int]]):
+        if not isinstance(data, (bytes, memoryview)):
+            data = bytes(data)
+        if len(data) != PARAM_BLOCK_SIZE:
+            raise ValueError(f"Virus param_block must have exactly {PARAM_BLOCK_SIZE} entries, got {len(data)}.")
+        self.data = data
+
+    def __getitem__(self, name: str) -> int:
+        return self.data[PARAM_OFFSETS[name]]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        offset = PARAM_OFFSETS.get(name)
+        return default if offset is None else self.data[offset]
+
+    def __contains__(self, name: object) -> bool:
+        return name in PARAM_OFFSETS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(PARAM_NAMES)
+
+    def __len__(self) -> int:
+        return len(PARAM_NAMES)
+
+    def items(self) -> ItemsView:
+        return _PatchItems(self)
+
+    def values(self) -> ValuesView:
+        return _PatchValues(self)
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(zip(PARAM_NAMES, _values_of(self.data)))
+
+    def __repr__(self) -> str:
+        return f"VirusPatch({bytes(self.data).hex()})"
+
+
+def _param_property(offset: int) -> property:
+    return property(lambda self: self.data[offset], doc=f"Byte {offset} of the parameter block.")
+
+
+for _name, _offset in PARAM_OFFSETS.items():
+    if _name.isidentifier() and not hasattr(VirusPatch, _name):
+        setattr(VirusPatch, _name, _param_property(_offset))
@@ -1,76 +1,84 @@
-from typing import Dict, Any
-from virus_sysex_param_map import virus_sysex_param_map
-from virus_to_vital_map import virus_to_vital_map
-from custom_handlers import __dict__ as handler_funcs
+from typing import Dict, Any, Mapping, Optional, Set
+from virus_patch import VirusPatch
+from mapping_registry import CompiledPlan, compile_entry, get_registry
 
-def apply_virus_sysex_params_to_vital_preset(param_block: list[int], vital_preset: Dict[str, Any]) -> None:
+class RecordingDict(dict):
+    """dict that remembers which keys were assigned, attributed to the current `owner`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.owner = None
+        self.written: Dict[str, Set[str]] = {}
+
+    def __setitem__(self, key, value):
+        self.written.setdefault(self.owner, set()).add(key)
+        super().__setitem__(key, value)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+def apply_mapping_entry(mapping: Any, virus_value: int, vital_preset: Dict[str, Any],
+                        virus_params: Mapping[str, int]) -> None:
+    """
+    Apply a single virus_to_vital_map entry for one Virus parameter value
+    (compiles the entry on the spot; the full-block path uses the registry's precompiled plan).
+    """
+    from custom_handlers import __dict__ as handler_funcs
+
+    _, op = compile_entry("", mapping, handler_funcs)
+    if op is not None:
+        op(virus_value, vital_preset, virus_params)
+
+
+def apply_virus_sysex_params_to_vital_preset(
+    param_block: list[int],
+    vital_preset: Dict[str, Any],
+    key_log: Optional[Dict[str, Set[str]]] = None,
+    plan: Optional[CompiledPlan] = None,
+    virus_params: Optional[Mapping[str, int]] = None,
+) -> None:
     """
     Given a 256-byte Virus parameter block, apply the parameter values to the provided
-    Vital preset dictionary using virus_sysex_param_map and virus_to_vital_map.
+    Vital preset dictionary using the compiled mapping plan (see mapping_registry).
 
     Args:
         param_block (list[int]): Exactly 256 ints representing Virus sysex parameter bytes.
         vital_preset (dict): Vital preset dictionary, where Vital parameters typically reside 
                              in vital_preset["settings"].
+        key_log (dict, optional): If given, filled with {virus_param_name: {settings keys written}}.
+        plan (CompiledPlan, optional): Plan to apply (default: the registry's current plan).
+        virus_params (Mapping, optional): VirusPatch view of param_block, if the caller already has one.
     """
     if len(param_block) != 256:
         raise ValueError("Virus param_block must have exactly 256 entries.")
 
-    # Precompute full Virus param dictionary
-    virus_params = {
-        virus_sysex_param_map.get(idx, f"undefined_{idx}"): val
-        for idx, val in enumerate(param_block)
-    }
-
-    for idx, virus_value in enumerate(param_block):
-        virus_param_name = virus_sysex_param_map.get(idx)
-        if not virus_param_name:
-            continue
-
-        mapping = virus_to_vital_map.get(virus_param_name)
-        if not mapping:
-            continue
-
-        # 1) If there's a custom handler, run it
-        if isinstance(mapping, dict) and "handler" in mapping:
-            handler_name = mapping["handler"]
-            handler_func = handler_funcs.get(handler_name)
-            if handler_func:
-                try:
-                    handler_func(virus_value, vital_preset, virus_params)
-                except TypeError:
-                    handler_func(virus_value, vital_preset)  # Fallback for older handlers
-            continue
-
-        # 2) Standard dictionary-based mapping
-        if isinstance(mapping, dict):
-            vital_target = mapping.get("vital_target")
-            scale_fn = mapping.get("scale")
-            if not callable(scale_fn):
-                scale_fn = lambda x: x
-            scaled_value = scale_fn(virus_value)
-
-            if isinstance(vital_target, list):
-                for target_key in vital_target:
-                    vital_preset["settings"][target_key] = scaled_value[target_key]
-            elif vital_target:
-                vital_preset["settings"][vital_target] = scaled_value
+    if virus_params is None:
+        virus_params = VirusPatch(param_block)
 
-            extra_fn = mapping.get("extra")
-            if callable(extra_fn):
-                extra_fn(virus_value, vital_preset["settings"])
+    settings = vital_preset.get("settings")
+    recorder = None
+    if key_log is not None and isinstance(settings, dict):
+        recorder = RecordingDict(settings)
+        vital_preset["settings"] = recorder
 
-        # 3) List-based mapping (multi-target)
-        elif isinstance(mapping, list):
-            for item in mapping:
-                vital_target = item.get("vital_target")
-                scale_fn = item.get("scale")
-                if not callable(scale_fn):
-                    scale_fn = lambda x: x
-                scaled_value = scale_fn(virus_value)
-                if vital_target:
-                    vital_preset["settings"][vital_target] = scaled_value
+    if plan is None:
+        plan = get_registry().plan
 
-        # 4) Otherwise, skip
-        else:
-            continue
+    try:
+        for idx, virus_param_name, op in plan.ops:
+            if recorder is not None:
+                recorder.owner = virus_param_name
+            op(param_block[idx], vital_preset, virus_params)
+    finally:
+        if recorder is not None:
+            settings.update(recorder)
+            vital_preset["settings"] = settings
+            for owner, keys in recorder.written.items():
+                key_log.setdefault(owner, set()).update(keys)
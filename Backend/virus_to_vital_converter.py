@@ -1,21 +1,24 @@
 import os
 import json
+import zlib
 import logging
-from typing import List, Tuple, Dict, Any
-
-from virus_sysex_to_vital import apply_virus_sysex_params_to_vital_preset
-from vital_wavetable_generator import (
-    generate_osc1_frame_from_sysex,
-    generate_osc2_frame_from_sysex,
-    generate_osc3_frame_from_sysex,
-    replace_three_wavetables,
-)
+import contextlib
+from typing import List, Tuple, Dict, Any, Iterable, Iterator, Mapping, Optional, Sequence, Set
+
+from virus_sysex_to_vital import apply_virus_sysex_params_to_vital_preset, RecordingDict
+from vital_wavetable_generator import inject_oscillator_wavetables
 from virus_lfo_generator import (
     inject_lfo1_shape_from_sysex,
     inject_lfo2_shape_from_sysex,
     inject_lfo3_shape_from_sysex,
 )
 from effects_mapper.master_fx import inject_all_effects  # 👈 NEW
+from modulations.master_m import apply_virus_modulations
+from virus_patch import VirusPatch
+from mapping_registry import get_registry
+from mapping_deps import STAGE_OWNER
+from template_index import get_template_index, PresetSlots
+from config import VITAL_OUTPUT_COMPACT, VITAL_OUTPUT_COMPRESS, VITAL_COMPRESSION_LEVEL
 
 # -------------------------------------------------------------------
 # LOGGING CONFIGURATION
@@ -36,107 +39,208 @@ logging.basicConfig(
 # Helper functions
 # -------------------------------------------------------------------
 def load_vital_file_as_dict(vital_file_path: str) -> Dict[str, Any]:
-    """Load a .vital file from disk and parse it as a JSON dictionary."""
-    with open(vital_file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """Load a .vital file (plain or zlib-compressed) from disk and parse it as a JSON dictionary."""
+    with open(vital_file_path, "rb") as f:
+        file_data = f.read()
+
+    try:
+        file_data = zlib.decompress(file_data)
+    except zlib.error:
+        pass  # Plain JSON preset
+    return json.loads(file_data)
 
 
-def load_sysex_txt_files(folder_path: str, default_vital_patch: str) -> List[Tuple[str, str]]:
+def serialize_vital_preset(preset: Dict[str, Any], compact: bool = VITAL_OUTPUT_COMPACT) -> str:
+    """Serialise a preset dict to JSON, optionally with compact separators."""
+    if compact:
+        return json.dumps(preset, separators=(",", ":"))
+    return json.dumps(preset)
+
+
+def write_vital_file(out_path: str, preset_json: str, compress: bool = VITAL_OUTPUT_COMPRESS) -> int:
     """
-    Load all Virus SysEx parameter .txt files from a folder and use them
-    to generate customised Vital patch files.
+    Write a serialised preset to disk, zlib-compressed at VITAL_COMPRESSION_LEVEL when
+    `compress` is set. Compressed files are for this tool's caches and archives
+    (load_vital_file_as_dict reads both forms); Vital itself expects plain JSON.
 
     Returns:
-        List of tuples -> (preset_json_str, output_filename)
+        Number of bytes written.
     """
-    with open(default_vital_patch, "r", encoding="utf-8") as f:
-        base_vital_json = f.read()
+    data = preset_json.encode("utf-8")
+    if compress:
+        data = zlib.compress(data, VITAL_COMPRESSION_LEVEL)
+    with open(out_path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def build_virus_params(param_block: Sequence[int]) -> VirusPatch:
+    """Wrap a 256-byte Virus parameter block in a name-addressable VirusPatch view (no dict is built)."""
+    return VirusPatch(param_block)
+
+
+@contextlib.contextmanager
+def _record_stage_keys(preset: Dict[str, Any], key_log: Optional[Dict[str, Set[str]]]) -> Iterator[None]:
+    """Log the settings keys written inside the block under mapping_deps.STAGE_OWNER."""
+    if key_log is None:
+        yield
+        return
+
+    recorder = RecordingDict(preset["settings"])
+    recorder.owner = STAGE_OWNER
+    preset["settings"] = recorder
+    try:
+        yield
+    finally:
+        preset["settings"] = dict(recorder)
+        key_log.setdefault(STAGE_OWNER, set()).update(recorder.written.get(STAGE_OWNER, set()))
+
+
+def map_param_block(
+    param_block: Sequence[int],
+    base_vital_json: str,
+    virus_params: Optional[Mapping[str, int]] = None,
+    key_log: Optional[Dict[str, Set[str]]] = None,
+) -> Tuple[PresetSlots, VirusPatch]:
+    """
+    Map stage: scalar mappings, LFOs, effects and modulations.
 
-    sysex_files = sorted(
-        os.path.join(folder_path, f)
-        for f in os.listdir(folder_path)
-        if f.endswith(".txt")
-    )
+    Returns:
+        (PresetSlots for the new preset, virus_params)
+    """
+    param_block = bytes(param_block)
+    if virus_params is None:
+        virus_params = build_virus_params(param_block)
 
-    patches: List[Tuple[str, str]] = []
+    # Fresh preset from the pre-indexed template (no per-patch json.loads / tree search)
+    slots = get_template_index(base_vital_json).instantiate()
+    base_dict = slots.preset
 
-    for i, file_path in enumerate(sysex_files, start=1):
-        with open(file_path, "r") as f:
-            hex_values = f.read().strip().split()
+    # One plan snapshot per patch, so a hot reload never mixes two maps in one preset
+    plan = get_registry().plan
 
-        if len(hex_values) != 256:
-            logging.warning(f"⚠️  Skipping {file_path}: expected 256 params, got {len(hex_values)}")
-            continue
+    # 1) Apply scalar mappings
+    apply_virus_sysex_params_to_vital_preset(param_block, base_dict, key_log, plan, virus_params)
 
-        param_block = [int(h, 16) for h in hex_values]
+    with _record_stage_keys(base_dict, key_log):
+        # 2) Inject LFOs
+        inject_lfo1_shape_from_sysex(virus_params, base_dict, slots)
+        inject_lfo2_shape_from_sysex(virus_params, base_dict, slots)
+        inject_lfo3_shape_from_sysex(virus_params, base_dict, slots)
 
-        from virus_sysex_param_map import virus_sysex_param_map
+        # 3) Inject effects
+        inject_all_effects(virus_params, base_dict)
 
-        virus_params = {
-            virus_sysex_param_map.get(idx, f"undefined_{idx}"): val
-            for idx, val in enumerate(param_block)
-        }
+        # 4) Inject modulations
+        apply_virus_modulations(virus_params, base_dict, plan.mapping, slots)
 
-        # ───── DEBUG: confirm byte alignment ─────────────────────────
-        raw_lfo1_shape = param_block[68]
-        parsed_lfo1_shape = virus_params["Lfo1_Shape"]
-        logging.info(
-            f"🪛  DEBUG | Byte 68 raw = {raw_lfo1_shape:02X} ({raw_lfo1_shape})"
-            f" → virus_params['Lfo1_Shape'] = {parsed_lfo1_shape}"
-        )
-        # ─────────────────────────────────────────────────────────────
+    return slots, virus_params
 
-        base_dict = json.loads(base_vital_json)
 
-        # 1) Apply scalar mappings
-        apply_virus_sysex_params_to_vital_preset(param_block, base_dict)
+def render_param_block(
+    slots: PresetSlots,
+    virus_params: Mapping[str, int],
+    key_log: Optional[Dict[str, Set[str]]] = None,
+) -> Dict[str, Any]:
+    """Render stage: oscillator wavetables (Osc Shape morph tables). Returns the finished preset."""
+    with _record_stage_keys(slots.preset, key_log):
+        # 5) Inject oscillator wavetables
+        inject_oscillator_wavetables(virus_params, slots.preset, slots)
+    return slots.preset
 
-        # 2) Inject LFOs
-        inject_lfo1_shape_from_sysex(virus_params, base_dict)
-        inject_lfo2_shape_from_sysex(virus_params, base_dict)
-        inject_lfo3_shape_from_sysex(virus_params, base_dict)
 
-        # 3) Inject effects
-        inject_all_effects(virus_params, base_dict)
+def convert_param_block(
+    param_block: Sequence[int],
+    base_vital_json: str,
+    compact: bool = VITAL_OUTPUT_COMPACT,
+    virus_params: Optional[Mapping[str, int]] = None,
+    key_log: Optional[Dict[str, Set[str]]] = None,
+) -> str:
+    """
+    Convert one 256-byte Virus parameter block into a serialised Vital preset
+    (map → render → serialise in one call).
+
+    Args:
+        param_block: The 256 Virus parameter bytes.
+        base_vital_json (str): Raw JSON text of the template preset (e.g. Default.vital).
+        compact (bool): Use compact JSON separators.
+        virus_params (Mapping, optional): Precomputed build_virus_params(param_block).
+        key_log (dict, optional): Filled with the settings keys each mapping entry wrote;
+            keys written by the later stages are logged under mapping_deps.STAGE_OWNER.
+
+    Returns:
+        The preset JSON string.
+    """
+    slots, virus_params = map_param_block(param_block, base_vital_json, virus_params, key_log)
+    return serialize_vital_preset(render_param_block(slots, virus_params, key_log), compact)
 
-        # 4) Inject modulations (NEW)
-        from modulations.master_m import apply_virus_modulations
-        from virus_to_vital_map import virus_to_vital_map  # or wherever it's stored
-        apply_virus_modulations(virus_params, base_dict, virus_to_vital_map)
 
-        # 5) Inject oscillator frames
-        osc1_frame = generate_osc1_frame_from_sysex(virus_params)
-        osc2_frame = generate_osc2_frame_from_sysex(virus_params)
-        osc3_frame = generate_osc3_frame_from_sysex(virus_params)
+def stream_sysex_txt_files(
+    folder_path: str,
+    default_vital_patch: str,
+    compact: bool = VITAL_OUTPUT_COMPACT,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily convert every Virus SysEx parameter .txt file in a folder, one patch
+    at a time (see conversion_pipeline). Feed the result straight into
+    save_vital_patches to keep memory constant for any bank size.
 
+    Yields:
+        Tuples -> (preset_json_str, output_filename)
+    """
+    from conversion_pipeline import convert_stream, ingest_txt_folder
 
-        modified_json = json.dumps(base_dict)
-        modified_json = replace_three_wavetables(
-            modified_json,
-            [osc1_frame, osc2_frame, osc3_frame],
-            virus_params,
-        )
+    with open(default_vital_patch, "r", encoding="utf-8") as f:
+        base_vital_json = f.read()
+
+    yield from convert_stream(ingest_txt_folder(folder_path), base_vital_json, compact)
 
-        patch_filename = f"patch_{i:03}.vital"
-        patches.append((modified_json, patch_filename))
 
+def load_sysex_txt_files(
+    folder_path: str,
+    default_vital_patch: str,
+    compact: bool = VITAL_OUTPUT_COMPACT,
+) -> List[Tuple[str, str]]:
+    """
+    Load all Virus SysEx parameter .txt files from a folder and use them
+    to generate customised Vital patch files.
+
+    Holds every converted patch in memory; prefer stream_sysex_txt_files for large banks.
+
+    Returns:
+        List of tuples -> (preset_json_str, output_filename)
+    """
+    patches = list(stream_sysex_txt_files(folder_path, default_vital_patch, compact))
     logging.info(f"✅ Prepared {len(patches)} patch(es) from SysEx files.")
     return patches
 
 
 def save_vital_patches(
-    patches: List[Tuple[str, str]],
+    patches: Iterable[Tuple[str, str]],
     output_folder: str,
+    compress: bool = VITAL_OUTPUT_COMPRESS,
 ) -> None:
-    """Save each JSON string as a .vital file in the specified output folder."""
+    """
+    Save each JSON string as a .vital file in the specified output folder.
+    Accepts any iterable, so patches from stream_sysex_txt_files are written as they are produced.
+    """
     os.makedirs(output_folder, exist_ok=True)
 
+    raw_bytes = 0
+    written_bytes = 0
+
     for preset_json, patch_filename in patches:
         if not patch_filename.lower().endswith(".vital"):
             patch_filename += ".vital"
 
         out_path = os.path.join(output_folder, patch_filename)
-        with open(out_path, "w", encoding="utf-8") as f:
-            f.write(preset_json)
+        raw_bytes += len(preset_json)
+        written_bytes += write_vital_file(out_path, preset_json, compress)
 
         logging.info(f"📎 Saved Vital patch: {out_path}")
+
+    if compress and raw_bytes:
+        logging.info(
+            f"🗜️  Compressed {raw_bytes / 1024:.0f} KB → {written_bytes / 1024:.0f} KB "
+            f"({100 * (1 - written_bytes / raw_bytes):.1f}% smaller)"
+        )
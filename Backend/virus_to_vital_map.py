@@ -46,7 +46,8 @@ virus_to_vital_map = {
     "Contr_16": None,
     
     "Osc1_Shape": {
-    "vital_target": None
+    "vital_target": "osc_1_wave_frame",
+    "scale": lambda x: (x / 127) * 256,  # Position in the OSC1 Shape morph table (wave → saw → pulse)
     },
 
     "Osc1_Pulsewidth": {
@@ -71,7 +72,10 @@ virus_to_vital_map = {
     "note": "Vital has no keytracking for oscillator pitch — skipping."
     },
 
-    "Osc2_Shape": None,
+    "Osc2_Shape": {
+    "vital_target": "osc_2_wave_frame",
+    "scale": lambda x: (x / 127) * 256,  # Position in the OSC2 Shape morph table (wave → saw → pulse)
+    },
     
     "Osc2_Pulsewidth": {
     "modulate_target": "osc_2_wave_frame",
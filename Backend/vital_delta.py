@@ -0,0 +1,230 @@
+# vital_delta.py
+"""
+Delta-encoded Vital presets for archives (cli.py archive pack/unpack).
+
+A converted preset is the template (Presets/Default.vital) with a few dozen
+settings, some modulation slots, the LFO shapes and three wavetables
+changed. A delta keeps only those changes, plus the SHA-1 of the template
+it was made against. apply_delta() rebuilds the full preset, identical to
+the original (including key order).
+
+Wave frames are the bulk of a delta, and they come from a small set of
+precomputed tables. So "wave_data" blobs can be moved into a shared frame
+pool and referenced by hash; a whole archive then stores every distinct
+frame once. Deltas are a storage format, not a cache format: rebuilding a
+preset from its delta costs more than converting the patch again, so the
+in-memory EntryCache (precompressed_zip) keeps deflated presets instead.
+
+Delta nodes:
+    {"v": value}                        replace
+    {"d": {key: node}, "x": [keys]}     patch a dict (x = removed keys)
+    {"l": {"index": node}}              patch a list of the same length
+"""
+
+import os
+import json
+import zlib
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from config import DELTA_TEMPLATE_STORE, VITAL_COMPRESSION_LEVEL
+
+DELTA_FORMAT = "vital-delta/1"
+ARCHIVE_FORMAT = "vital-delta-archive/1"
+FRAME_KEY = "wave_data"
+FRAME_REF = "$frame"
+
+FramePool = Dict[str, str]
+
+
+def template_version(template_json: str) -> str:
+    """Version of a template = SHA-1 of its JSON text (same as mapping_deps.template_fingerprint)."""
+    return hashlib.sha1(template_json.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------------
+# Versioned templates
+# -------------------------------------------------------------------
+class TemplateStore:
+    """
+    Folder of templates saved as <version>.vital, so deltas made against an
+    older Default.vital can still be rebuilt after the template changes.
+    """
+
+    def __init__(self, folder: str = DELTA_TEMPLATE_STORE):
+        self.folder = folder
+
+    def put(self, template_json: str) -> str:
+        version = template_version(template_json)
+        path = os.path.join(self.folder, f"{version}.vital")
+        if not os.path.exists(path):
+            os.makedirs(self.folder, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(template_json)
+        return version
+
+    def get(self, version: str) -> Dict[str, Any]:
+        """Parsed template for a version (cached; treat it as read-only)."""
+        return _load_template(os.path.join(self.folder, f"{version}.vital"))
+
+
+@lru_cache(maxsize=8)
+def _load_template(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(f"Template {os.path.basename(path)} is not in the template store "
+                       f"({os.path.dirname(path)}); add it with TemplateStore.put()") from None
+
+
+# -------------------------------------------------------------------
+# Diff / patch
+# -------------------------------------------------------------------
+def _frame_ref(value: str, frames: FramePool) -> Dict[str, str]:
+    frame_id = hashlib.sha1(value.encode("ascii")).hexdigest()[:20]
+    frames.setdefault(frame_id, value)
+    return {FRAME_REF: frame_id}
+
+
+def _pool_frames(value: Any, frames: FramePool) -> Any:
+    """Copy of `value` with every wave_data string replaced by a frame reference."""
+    if isinstance(value, dict):
+        return {k: _frame_ref(v, frames) if k == FRAME_KEY and isinstance(v, str) else _pool_frames(v, frames)
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [_pool_frames(v, frames) for v in value]
+    return value
+
+
+def _resolve_frames(value: Any, frames: FramePool) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and FRAME_REF in value:
+            return frames[value[FRAME_REF]]
+        return {k: _resolve_frames(v, frames) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve_frames(v, frames) for v in value]
+    return value
+
+
+def _same_key_order(new: Dict[str, Any], old: Dict[str, Any]) -> bool:
+    """True if patching `old` key by key (kept keys in place, added keys appended) reproduces `new`'s order."""
+    kept = [key for key in old if key in new]
+    return list(new) == kept + [key for key in new if key not in old]
+
+
+def _diff(new: Any, old: Any, frames: Optional[FramePool]) -> Optional[Dict[str, Any]]:
+    """Delta node turning `old` into `new`, or None if they are equal."""
+    if type(new) is type(old):
+        if isinstance(new, dict) and _same_key_order(new, old):
+            changed = {}
+            for key, value in new.items():
+                if key in old:
+                    node = _diff(value, old[key], frames)
+                    if node is not None and frames is not None and key == FRAME_KEY and isinstance(value, str):
+                        node = {"v": _frame_ref(value, frames)}
+                    if node is not None:
+                        changed[key] = node
+                else:
+                    changed[key] = {"v": _pool_frames(value, frames) if frames is not None else value}
+            removed = [key for key in old if key not in new]
+            if not changed and not removed:
+                return None
+            node = {"d": changed}
+            if removed:
+                node["x"] = removed
+            return node
+        if isinstance(new, list) and len(new) == len(old):
+            changed = {}
+            for index, (a, b) in enumerate(zip(new, old)):
+                node = _diff(a, b, frames)
+                if node is not None:
+                    changed[str(index)] = node
+            return {"l": changed} if changed else None
+        if new == old:
+            return None
+    return {"v": _pool_frames(new, frames) if frames is not None else new}
+
+
+def _patch(base: Any, node: Dict[str, Any], frames: Optional[FramePool]) -> Any:
+    """Apply a delta node to `base`, copying only what changes (base is never mutated)."""
+    if "v" in node:
+        return _resolve_frames(node["v"], frames) if frames is not None else node["v"]
+    if "d" in node:
+        removed = set(node.get("x", ()))
+        changed = node["d"]
+        result = {key: (_patch(value, changed[key], frames) if key in changed else value)
+                  for key, value in base.items() if key not in removed}
+        for key, child in changed.items():
+            if key not in base:
+                result[key] = _patch(None, child, frames)
+        return result
+    result = list(base)
+    for index, child in node["l"].items():
+        result[int(index)] = _patch(base[int(index)], child, frames)
+    return result
+
+
+def make_delta(preset: Dict[str, Any], template: Dict[str, Any], version: str,
+               frames: Optional[FramePool] = None) -> Dict[str, Any]:
+    """
+    Delta of `preset` against `template` (whose version is `version`).
+
+    Args:
+        frames (dict, optional): Frame pool; when given, wave_data blobs are stored
+            there and the delta only references them.
+    """
+    return {"format": DELTA_FORMAT, "template": version, "pooled": frames is not None,
+            "patch": _diff(preset, template, frames) or {"d": {}}}
+
+
+def apply_delta(delta: Dict[str, Any], template: Dict[str, Any],
+                frames: Optional[FramePool] = None) -> Dict[str, Any]:
+    """
+    Rebuild the full preset. `frames` is required if the delta was made with a frame pool.
+    Unchanged sub-objects are shared with `template`: serialise the result, or
+    copy.deepcopy it before mutating.
+    """
+    if delta.get("format") != DELTA_FORMAT:
+        raise ValueError(f"Not a {DELTA_FORMAT} delta")
+    if delta["pooled"] and frames is None:
+        raise ValueError("Delta references pooled frames; pass the frame pool")
+    return _patch(template, delta["patch"], frames if delta["pooled"] else None)
+
+
+# -------------------------------------------------------------------
+# Archives (many presets, one frame pool)
+# -------------------------------------------------------------------
+def write_archive(path: str, presets: Iterable[Tuple[str, Dict[str, Any]]], template_json: str,
+                  store: Optional[TemplateStore] = None, level: int = VITAL_COMPRESSION_LEVEL) -> Dict[str, int]:
+    """
+    Write (name, preset) pairs as one compressed archive of deltas sharing a frame pool.
+
+    Returns:
+        {"presets", "frames", "bytes"}
+    """
+    store = store or TemplateStore()
+    version = store.put(template_json)
+    template = store.get(version)
+    frames: FramePool = {}
+    deltas = {name: make_delta(preset, template, version, frames)["patch"] for name, preset in presets}
+
+    archive = {"format": ARCHIVE_FORMAT, "template": version, "frames": frames, "presets": deltas}
+    data = zlib.compress(json.dumps(archive, separators=(",", ":")).encode("utf-8"), level)
+    with open(path, "wb") as f:
+        f.write(data)
+    return {"presets": len(deltas), "frames": len(frames), "bytes": len(data)}
+
+
+def read_archive(path: str, store: Optional[TemplateStore] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (name, full preset) for every preset in an archive (see apply_delta about shared sub-objects)."""
+    with open(path, "rb") as f:
+        archive = json.loads(zlib.decompress(f.read()))
+    if archive.get("format") != ARCHIVE_FORMAT:
+        raise ValueError(f"{path} is not a {ARCHIVE_FORMAT} file")
+
+    template = (store or TemplateStore()).get(archive["template"])
+    frames = archive["frames"]
+    for name, patch in archive["presets"].items():
+        yield name, _patch(template, patch, frames)
@@ -0,0 +1,280 @@
+# vital_diff.py
+"""
+Structural diff for .vital presets.
+
+Settings are flattened into dotted paths and compared as one float matrix per
+bank (with absolute/relative tolerances), modulation slots are compared as
+source → destination routes regardless of slot order, and wave_data is decoded
+and compared by sample error instead of string equality.
+"""
+
+import os
+import re
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import DIFF_ATOL, DIFF_RTOL, DIFF_WAVE_TOL
+
+WAVE_KEYS = {"wave_data"}
+MODULATION_KEY = re.compile(r"^modulation_(\d+)_(\w+)$")
+
+
+# -------------------------------------------------------------------
+# Flattening
+# -------------------------------------------------------------------
+def flatten_preset(preset: Dict[str, Any], ignore: Tuple[str, ...] = ()) -> Dict[str, Dict[str, Any]]:
+    """
+    Split a preset into the parts the diff compares.
+
+    Returns:
+        dict with:
+            "numbers": {path: float} for every numeric leaf (bools included),
+            "strings": {path: value} for other leaves (names, metadata, samples),
+            "waves":   {path: base64 str} for wave_data blobs,
+            "routes":  {(source, destination): {attr: float}} for used modulation slots.
+    """
+    numbers: Dict[str, float] = {}
+    strings: Dict[str, Any] = {}
+    waves: Dict[str, str] = {}
+    slot_attrs: Dict[int, Dict[str, float]] = {}
+
+    def walk(value: Any, path: str) -> None:
+        if path in ignore:
+            return
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(item, f"{path}.{key}" if path else key)
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                walk(item, f"{path}.{i}")
+        elif isinstance(value, (bool, int, float)):
+            numbers[path] = float(value)
+        elif path.rsplit(".", 1)[-1] in WAVE_KEYS:
+            waves[path] = value
+        else:
+            strings[path] = value
+
+    settings = preset.get("settings", {})
+    for key, value in preset.items():
+        if key != "settings":
+            walk(value, key)
+
+    for key, value in settings.items():
+        if key == "modulations":
+            continue
+        match = MODULATION_KEY.match(key)
+        if match and isinstance(value, (bool, int, float)):
+            slot_attrs.setdefault(int(match.group(1)), {})[match.group(2)] = float(value)
+            continue
+        walk(value, f"settings.{key}")
+
+    routes = {}
+    if "settings.modulations" not in ignore:
+        for i, slot in enumerate(settings.get("modulations", []), start=1):
+            source, destination = slot.get("source", ""), slot.get("destination", "")
+            if source or destination:
+                routes[(source, destination)] = slot_attrs.get(i, {})
+
+    return {"numbers": numbers, "strings": strings, "waves": waves, "routes": routes}
+
+
+def decode_wave(wave_data: str) -> np.ndarray:
+    return np.frombuffer(binascii.a2b_base64(wave_data), dtype=np.float32)
+
+
+# -------------------------------------------------------------------
+# Bank diff
+# -------------------------------------------------------------------
+def _diff_numbers(flat_a: List[Dict[str, Any]], flat_b: List[Dict[str, Any]], atol: float, rtol: float,
+                  reports: List[Dict[str, Any]]) -> None:
+    keys = sorted(set().union(*(f["numbers"] for f in flat_a), *(f["numbers"] for f in flat_b)))
+    if not keys:
+        return
+    column = {key: i for i, key in enumerate(keys)}
+
+    def matrix(flats):
+        values = np.full((len(flats), len(keys)), np.nan)
+        for row, flat in enumerate(flats):
+            numbers = flat["numbers"]
+            values[row, [column[k] for k in numbers]] = list(numbers.values())
+        return values
+
+    a, b = matrix(flat_a), matrix(flat_b)
+    missing_a, missing_b = np.isnan(a), np.isnan(b)
+    close = np.isclose(a, b, atol=atol, rtol=rtol) | (missing_a & missing_b)
+
+    for row, col in zip(*np.nonzero(~close)):
+        report = reports[row]
+        key = keys[col]
+        if missing_a[row, col]:
+            report["added"].append(key)
+        elif missing_b[row, col]:
+            report["removed"].append(key)
+        else:
+            report["settings"].append({"key": key, "a": float(a[row, col]), "b": float(b[row, col])})
+
+
+def _diff_waves(flat_a: List[Dict[str, Any]], flat_b: List[Dict[str, Any]], wave_tol: float,
+                reports: List[Dict[str, Any]]) -> None:
+    # Group decoded frame pairs by sample count so each group is one (M, N) comparison
+    groups: Dict[int, List[Tuple[int, str, np.ndarray, np.ndarray]]] = {}
+    for row, (fa, fb) in enumerate(zip(flat_a, flat_b)):
+        waves_a, waves_b = fa["waves"], fb["waves"]
+        for path in sorted(set(waves_a) | set(waves_b)):
+            if path not in waves_a:
+                reports[row]["added"].append(path)
+            elif path not in waves_b:
+                reports[row]["removed"].append(path)
+            elif waves_a[path] != waves_b[path]:
+                samples_a, samples_b = decode_wave(waves_a[path]), decode_wave(waves_b[path])
+                if samples_a.size != samples_b.size:
+                    reports[row]["waves"].append({"path": path, "max_error": float("inf"), "rms_error": float("inf")})
+                    continue
+                groups.setdefault(samples_a.size, []).append((row, path, samples_a, samples_b))
+
+    for pairs in groups.values():
+        a = np.stack([p[2] for p in pairs]).astype(np.float64)
+        b = np.stack([p[3] for p in pairs]).astype(np.float64)
+        error = np.abs(a - b)
+        max_error = error.max(axis=1)
+        rms_error = np.sqrt(np.mean(error ** 2, axis=1))
+        for i in np.nonzero(max_error > wave_tol)[0]:
+            row, path = pairs[i][0], pairs[i][1]
+            reports[row]["waves"].append({"path": path, "max_error": float(max_error[i]),
+                                          "rms_error": float(rms_error[i])})
+
+
+def _diff_routes(routes_a: Dict[Tuple[str, str], Dict[str, float]], routes_b: Dict[Tuple[str, str], Dict[str, float]],
+                 atol: float, rtol: float) -> Dict[str, List[Any]]:
+    result = {"added": [], "removed": [], "changed": []}
+    for route in sorted(set(routes_a) | set(routes_b)):
+        name = f"{route[0]} → {route[1]}"
+        if route not in routes_a:
+            result["added"].append(name)
+        elif route not in routes_b:
+            result["removed"].append(name)
+        else:
+            attrs_a, attrs_b = routes_a[route], routes_b[route]
+            for attr in sorted(set(attrs_a) | set(attrs_b)):
+                va, vb = attrs_a.get(attr, np.nan), attrs_b.get(attr, np.nan)
+                if not np.isclose(va, vb, atol=atol, rtol=rtol):
+                    result["changed"].append({"route": name, "attr": attr, "a": va, "b": vb})
+    return result
+
+
+def diff_banks(bank_a: List[Dict[str, Any]], bank_b: List[Dict[str, Any]],
+               names: Optional[List[str]] = None,
+               atol: float = DIFF_ATOL,
+               rtol: float = DIFF_RTOL,
+               wave_tol: float = DIFF_WAVE_TOL,
+               ignore: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+    """
+    Diff two equally long lists of presets pairwise.
+
+    Args:
+        bank_a, bank_b (list): Parsed .vital presets; bank_a[i] is compared with bank_b[i].
+        names (list, optional): Labels for the reports (e.g. relative file paths).
+        atol, rtol (float): Tolerances for numeric settings and modulation amounts.
+        wave_tol (float): Maximum absolute sample error tolerated in wave_data.
+        ignore (tuple): Dotted paths to skip, e.g. ("settings.lfos",).
+
+    Returns:
+        list: One report per pair; see is_identical() for what counts as a difference.
+    """
+    if len(bank_a) != len(bank_b):
+        raise ValueError(f"Bank sizes differ: {len(bank_a)} vs {len(bank_b)}")
+
+    names = names or [str(i) for i in range(len(bank_a))]
+    flat_a = [flatten_preset(p, ignore) for p in bank_a]
+    flat_b = [flatten_preset(p, ignore) for p in bank_b]
+    reports = [{"name": name, "settings": [], "added": [], "removed": [], "strings": [], "waves": []}
+               for name in names]
+
+    _diff_numbers(flat_a, flat_b, atol, rtol, reports)
+    _diff_waves(flat_a, flat_b, wave_tol, reports)
+
+    for report, fa, fb in zip(reports, flat_a, flat_b):
+        strings_a, strings_b = fa["strings"], fb["strings"]
+        for path in sorted(set(strings_a) | set(strings_b)):
+            if path not in strings_a:
+                report["added"].append(path)
+            elif path not in strings_b:
+                report["removed"].append(path)
+            elif strings_a[path] != strings_b[path]:
+                report["strings"].append({"key": path, "a": strings_a[path], "b": strings_b[path]})
+        report["modulations"] = _diff_routes(fa["routes"], fb["routes"], atol, rtol)
+
+    return reports
+
+
+def diff_presets(preset_a: Dict[str, Any], preset_b: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    """Diff a single pair of presets; takes the same keyword arguments as diff_banks."""
+    return diff_banks([preset_a], [preset_b], **kwargs)[0]
+
+
+def is_identical(report: Dict[str, Any]) -> bool:
+    modulations = report["modulations"]
+    return not (report["settings"] or report["added"] or report["removed"] or report["strings"]
+                or report["waves"] or modulations["added"] or modulations["removed"] or modulations["changed"])
+
+
+# -------------------------------------------------------------------
+# Folders
+# -------------------------------------------------------------------
+def list_presets(folder: str) -> List[str]:
+    found = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.lower().endswith(".vital"):
+                found.append(os.path.relpath(os.path.join(root, name), folder))
+    return sorted(found)
+
+
+def diff_folders(folder_a: str, folder_b: str, max_workers: int = 8, **kwargs) -> Dict[str, Any]:
+    """
+    Diff every .vital file that exists under both folders (matched by relative path).
+
+    Returns:
+        dict with "reports" (one per shared preset), plus "only_a" and "only_b"
+        listing presets present on one side only.
+    """
+    from virus_to_vital_converter import load_vital_file_as_dict
+
+    presets_a, presets_b = list_presets(folder_a), list_presets(folder_b)
+    shared = sorted(set(presets_a) & set(presets_b))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        bank_a = list(pool.map(load_vital_file_as_dict, (os.path.join(folder_a, p) for p in shared)))
+        bank_b = list(pool.map(load_vital_file_as_dict, (os.path.join(folder_b, p) for p in shared)))
+
+    return {
+        "reports": diff_banks(bank_a, bank_b, names=shared, **kwargs),
+        "only_a": sorted(set(presets_a) - set(presets_b)),
+        "only_b": sorted(set(presets_b) - set(presets_a)),
+    }
+
+
+def format_report(report: Dict[str, Any], limit: int = 10) -> List[str]:
+    """Human-readable lines for one preset report (at most `limit` per section)."""
+    lines = [f"❗ {report['name']}"]
+    for item in report["settings"][:limit]:
+        lines.append(f"    {item['key']}: {item['a']:.6g} → {item['b']:.6g}")
+    for item in report["strings"][:limit]:
+        lines.append(f"    {item['key']}: {item['a']!r} → {item['b']!r}")
+    for key in report["added"][:limit]:
+        lines.append(f"    + {key}")
+    for key in report["removed"][:limit]:
+        lines.append(f"    - {key}")
+    for item in report["waves"][:limit]:
+        lines.append(f"    {item['path']}: max error {item['max_error']:.3g}, rms {item['rms_error']:.3g}")
+    modulations = report["modulations"]
+    for route in modulations["added"][:limit]:
+        lines.append(f"    + mod {route}")
+    for route in modulations["removed"][:limit]:
+        lines.append(f"    - mod {route}")
+    for item in modulations["changed"][:limit]:
+        lines.append(f"    mod {item['route']} {item['attr']}: {item['a']:.6g} → {item['b']:.6g}")
+    return lines
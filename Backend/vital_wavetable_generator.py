@@ -1,9 +1,21 @@
-import base64
 import numpy as np
+from functools import lru_cache
 from typing import Dict, Any
-from config import DEFAULT_FRAME_SIZE  # Make sure this is defined
+from config import DEFAULT_FRAME_SIZE, DEFAULT_MORPH_FRAMES, VITAL_MAX_WAVE_FRAME
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
+from frame_encoder import encode_frame
+from wavetable_engine import (
+    num_bins,
+    sine_spectrum,
+    triangle_spectrum,
+    saw_spectrum,
+    pulse_spectrum,
+    spectra_to_frames,
+)
+
+if TYPE_CHECKING:
+    from template_index import PresetSlots
 
 
 def virus_shape_number_to_name(value: int) -> str:
@@ -44,71 +56,226 @@ def virus_shape_number_to_name_osc3(value: int) -> str:
     else:
         return "custom_undefined"
 
-def generate_osc1_frame_from_sysex(virus_params: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE) -> str:
-    shape_value = virus_params.get("Osc1_Wave_Select", 0)
-    shape = virus_shape_number_to_name(shape_value)
-
-    velocity = 0.8
-    phase = np.linspace(0, 2 * np.pi, frame_size, endpoint=False)
+@lru_cache(maxsize=128)
+def shape_spectrum(shape: str, frame_size: int = DEFAULT_FRAME_SIZE) -> np.ndarray:
+    """
+    Band-limited harmonic spectrum for a named oscillator shape.
 
-    if shape == "sine":
-        waveform = np.sin(phase)
-    elif shape == "triangle":
-    # Triangle wave derived from sine
-        waveform = (2/np.pi) * np.arcsin(np.sin(phase))
+    Returns a read-only complex array in numpy.fft.irfft layout (see wavetable_engine).
+    """
+    if shape == "triangle":
+        spectrum = triangle_spectrum(frame_size=frame_size)
+    elif shape == "saw":
+        spectrum = saw_spectrum(frame_size=frame_size)
+    elif shape == "pulse":
+        spectrum = pulse_spectrum(0.5, frame_size=frame_size)
+    elif shape.startswith("custom_"):
+        # Placeholder for Virus wavetables: sin(x) * cos(2x) = 0.5 * (sin(3x) - sin(x))
+        spectrum = np.zeros(num_bins(frame_size), dtype=np.complex128)
+        spectrum[1] = 0.5j
+        spectrum[3] = -0.5j
     else:
-        waveform = np.sin(phase)  # fallback
+        spectrum = sine_spectrum(frame_size)
 
-    waveform *= velocity
-    waveform /= (np.max(np.abs(waveform)) or 1.0)
-    return base64.b64encode(waveform.astype(np.float32).tobytes()).decode("utf-8")
+    spectrum.setflags(write=False)
+    return spectrum
 
-def generate_osc2_frame_from_sysex(virus_params: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE) -> str:
-    shape_value = virus_params.get("Osc2_Wave_Select", 0)
-    shape = virus_shape_number_to_name(shape_value)
 
-    velocity = 0.8
-    phase = np.linspace(0, 2 * np.pi, frame_size, endpoint=False)
+def render_shape_frames(shapes: List[str], frame_size: int = DEFAULT_FRAME_SIZE) -> np.ndarray:
+    """
+    Render any number of named shapes in one batched inverse FFT.
 
-    if shape == "sine":
-        waveform = np.sin(phase)
-    elif shape == "triangle":
-    # Triangle wave derived from sine
-        waveform = (2/np.pi) * np.arcsin(np.sin(phase))
-    else:
-        waveform = np.sin(phase)  # fallback to sine
+    Args:
+        shapes (List[str]): Shape names as returned by virus_shape_number_to_name*.
+        frame_size (int): Samples per frame.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(shapes), frame_size), peak-normalised.
+    """
+    if not shapes:
+        return np.zeros((0, frame_size), dtype=np.float32)
+    spectra = np.stack([shape_spectrum(shape, frame_size) for shape in shapes])
+    return spectra_to_frames(spectra, frame_size)
 
-    waveform *= velocity
-    waveform /= (np.max(np.abs(waveform)) or 1.0)
-    return base64.b64encode(waveform.astype(np.float32).tobytes()).decode("utf-8")
+
+def generate_osc1_frame_from_sysex(virus_params: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE) -> str:
+    shape = virus_shape_number_to_name(virus_params.get("Osc1_Wave_Select", 0))
+    if shape != "triangle":
+        shape = "sine"  # custom Virus waves fall back to sine on OSC1
+
+    return encode_frame(render_shape_frames([shape], frame_size)[0])
+
+def generate_osc2_frame_from_sysex(virus_params: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE) -> str:
+    shape = virus_shape_number_to_name_osc2(virus_params.get("Osc2_Wave_Select", 0))
+    if shape != "triangle":
+        shape = "sine"  # fallback to sine
+
+    return encode_frame(render_shape_frames([shape], frame_size)[0])
 
 def generate_osc3_frame_from_sysex(virus_params: Dict[str, Any], frame_size: int = DEFAULT_FRAME_SIZE) -> str:
-    shape_value = virus_params.get("Osc3_Wave_Select", 0)
-    shape = virus_shape_number_to_name_osc3(shape_value)
+    shape = virus_shape_number_to_name_osc3(virus_params.get("Osc3_Wave_Select", 0))
 
     # Treat 'off' and 'slave' as no waveform (OSC3 disabled or sync mode)
     if shape in ("off", "slave"):
         return ""
 
-    velocity = 0.8
-    phase = np.linspace(0, 2 * np.pi, frame_size, endpoint=False)
+    return encode_frame(render_shape_frames([shape], frame_size)[0])
 
-    if shape == "sine":
-        waveform = np.sin(phase)
-    elif shape == "triangle":
-        waveform = (2 / np.pi) * np.arcsin(np.sin(phase))  # Symmetrical triangle wave
-    elif shape == "saw":
-        waveform = 2 * (phase / (2 * np.pi)) - 1  # Linear ramp from -1 to 1
-    elif shape == "pulse":
-        waveform = np.where(np.sin(phase) >= 0, 1.0, -1.0)  # Hard pulse wave
-    elif shape.startswith("custom_"):
-        waveform = np.sin(phase) * np.cos(phase * 2)  # Placeholder for Virus wavetables
+def virus_pulsewidth_to_duty(value: int) -> float:
+    """Virus Pulsewidth 0 = square (50%), 127 = narrowest pulse."""
+    return 0.5 + 0.48 * (min(max(value, 0), 127) / 127.0)
+
+
+@lru_cache(maxsize=512)
+def build_osc_morph_table(wave_shape: str,
+                          pulsewidth: int,
+                          num_frames: int = DEFAULT_MORPH_FRAMES,
+                          frame_size: int = DEFAULT_FRAME_SIZE) -> np.ndarray:
+    """
+    Renders a full Virus Osc Shape sweep as a multi-frame wavetable.
+
+    Frame i sits at Osc Shape value i * 127 / (num_frames - 1) and follows the
+    Virus semantics: 0 = selected wave, 64 = saw, 127 = pulse at the given
+    pulse width, crossfading linearly in between. All frames are mixed in the
+    spectral domain and rendered with a single batched inverse FFT.
+
+    Tables are cached by their parameter tuple, so a bank only renders each
+    (wave, pulsewidth) combination once. The returned array is read-only.
+
+    Args:
+        wave_shape (str): Shape name for Osc Shape = 0 (e.g. "sine", "triangle").
+        pulsewidth (int): Virus Pulsewidth value (0–127).
+        num_frames (int): Number of keyframes in the table.
+        frame_size (int): Samples per frame.
+
+    Returns:
+        np.ndarray: float32 array of shape (num_frames, frame_size).
+    """
+    shape_values = np.linspace(0, 127, max(num_frames, 1))
+    morph = np.interp(shape_values, [0, 64, 127], [0.0, 1.0, 2.0])
+    wave_weight = np.clip(1.0 - morph, 0.0, 1.0)[:, None]
+    pulse_weight = np.clip(morph - 1.0, 0.0, 1.0)[:, None]
+    saw_weight = 1.0 - wave_weight - pulse_weight
+
+    spectra = (
+        wave_weight * shape_spectrum(wave_shape, frame_size)
+        + saw_weight * shape_spectrum("saw", frame_size)
+        + pulse_weight * pulse_spectrum(virus_pulsewidth_to_duty(pulsewidth), frame_size=frame_size)
+    )
+    table = spectra_to_frames(spectra, frame_size)
+    table.setflags(write=False)
+    return table
+
+
+# -------------------------------------------------------------------
+# Precomputed tables (shared read-only across worker processes)
+# -------------------------------------------------------------------
+MORPH_BASE_SHAPES = ("sine", "triangle")  # OSC1/OSC2 wave shapes that get their own morph tables
+NUM_VIRUS_VALUES = 128
+
+_shared_tables: Dict[str, np.ndarray] = {}
+
+
+def precompute_osc_tables(frame_size: int = DEFAULT_FRAME_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Renders every table the wavetable stage can ask for, indexed by Virus value.
+
+    Returns:
+        dict with:
+            "osc_morph": float32 (len(MORPH_BASE_SHAPES), 128, DEFAULT_MORPH_FRAMES, frame_size),
+                indexed by [base shape, Pulsewidth];
+            "osc3_frames": float32 (128, frame_size), indexed by Osc3_Wave_Select
+                (rows for "off"/"slave" are zero).
+    """
+    render_morph = build_osc_morph_table.__wrapped__  # don't fill this process's cache
+    osc_morph = np.stack([
+        np.stack([render_morph(shape, pw, DEFAULT_MORPH_FRAMES, frame_size) for pw in range(NUM_VIRUS_VALUES)])
+        for shape in MORPH_BASE_SHAPES
+    ])
+    osc3_frames = np.zeros((NUM_VIRUS_VALUES, frame_size), dtype=np.float32)
+    osc3_frames[2:] = render_shape_frames(
+        [virus_shape_number_to_name_osc3(v) for v in range(2, NUM_VIRUS_VALUES)], frame_size)
+    return {"osc_morph": osc_morph, "osc3_frames": osc3_frames}
+
+
+def use_shared_tables(tables: Dict[str, np.ndarray]) -> None:
+    """Serve morph and OSC3 tables from precomputed (e.g. memory-mapped) arrays."""
+    _shared_tables.clear()
+    _shared_tables.update(tables)
+
+
+def osc_morph_table(wave_shape: str, pulsewidth: int) -> np.ndarray:
+    """Default-size morph table, from the shared tables when attached."""
+    table = _shared_tables.get("osc_morph")
+    if table is not None and wave_shape in MORPH_BASE_SHAPES and 0 <= pulsewidth < table.shape[1]:
+        return table[MORPH_BASE_SHAPES.index(wave_shape), pulsewidth]
+    return build_osc_morph_table(wave_shape, pulsewidth)
+
+
+def osc3_frames(wave_select: int) -> np.ndarray:
+    """Single-frame OSC3 table for an Osc3_Wave_Select value, from the shared tables when attached."""
+    table = _shared_tables.get("osc3_frames")
+    if table is not None and 2 <= wave_select < table.shape[0]:
+        return table[wave_select:wave_select + 1]
+    return render_shape_frames([virus_shape_number_to_name_osc3(wave_select)])
+
+
+def write_wavetable_keyframes(preset: Dict[str, Any], osc_index: int, frames: np.ndarray,
+                              slots: Optional["PresetSlots"] = None) -> None:
+    """
+    Replaces the keyframes of one oscillator's wavetable with the given frames,
+    spread evenly over Vital's 0–256 wave frame range.
+
+    Args:
+        preset (dict): Vital preset dictionary.
+        osc_index (int): 0-based oscillator index (0 = OSC1).
+        frames (np.ndarray): float32 array of shape (num_frames, frame_size).
+        slots (PresetSlots, optional): Indexed template handle; writes go straight
+            to its component instead of walking groups/components.
+    """
+    if slots is not None:
+        component = slots.components[osc_index]
+    else:
+        component = preset["settings"]["wavetables"][osc_index]["groups"][0]["components"][0]
+    last = max(len(frames) - 1, 1)
+    component["keyframes"] = [
+        {"position": round(i * VITAL_MAX_WAVE_FRAME / last), "wave_data": encode_frame(frame)}
+        for i, frame in enumerate(frames)
+    ]
+
+
+def inject_oscillator_wavetables(virus_params: Dict[str, Any], preset: Dict[str, Any],
+                                 slots: Optional["PresetSlots"] = None) -> None:
+    """
+    Writes OSC1/OSC2 Osc Shape morph tables and the OSC3 frame straight into the
+    preset's wavetable keyframes, and enables oscillators 2 and 3 from the Virus
+    parameters (same rules as replace_three_wavetables).
+    """
+    settings = preset.setdefault("settings", {})
+    settings["osc_2_on"] = 1.0
+
+    osc3_wave_select = virus_params.get("Osc3_Wave_Select", 0)
+    settings["osc_3_on"] = 0.0 if osc3_wave_select in (0, 1) else 1.0
+
+    if slots is not None:
+        has_wavetables = len(slots.components) >= 3
     else:
-        waveform = np.sin(phase)  # Fallback to sine
+        has_wavetables = "wavetables" in settings and len(settings["wavetables"]) >= 3
+    if not has_wavetables:
+        print("⚠️ Preset has no wavetables for all 3 oscillators — skipping wavetable injection.")
+        return
+
+    osc1_shape = virus_shape_number_to_name(virus_params.get("Osc1_Wave_Select", 0))
+    osc2_shape = virus_shape_number_to_name_osc2(virus_params.get("Osc2_Wave_Select", 0))
+    write_wavetable_keyframes(preset, 0, osc_morph_table(
+        osc1_shape if osc1_shape == "triangle" else "sine", virus_params.get("Osc1_Pulsewidth", 0)), slots)
+    write_wavetable_keyframes(preset, 1, osc_morph_table(
+        osc2_shape if osc2_shape == "triangle" else "sine", virus_params.get("Osc2_Pulsewidth", 0)), slots)
+
+    if settings["osc_3_on"] == 1.0:
+        write_wavetable_keyframes(preset, 2, osc3_frames(osc3_wave_select), slots)
 
-    waveform *= velocity
-    waveform /= (np.max(np.abs(waveform)) or 1.0)
-    return base64.b64encode(waveform.astype(np.float32).tobytes()).decode("utf-8")
+    print("✅ Injected wavetables. OSC2 = ON, OSC3 =", settings["osc_3_on"])
 
 def replace_three_wavetables(json_data: str, frame_data_list: List[str], virus_params: Dict[str, Any]) -> str:
     """
@@ -0,0 +1,110 @@
+# wavetable_engine.py
+
+import numpy as np
+from functools import lru_cache
+from typing import Optional, Union
+from config import DEFAULT_FRAME_SIZE
+
+
+# -------------------------------------------------------------------
+# Spectra
+# -------------------------------------------------------------------
+# A spectrum is a complex array with frame_size // 2 + 1 bins (the layout
+# numpy.fft.irfft expects). Bin k holds a_k - i*b_k for the harmonic
+# a_k*cos(k*phase) + b_k*sin(k*phase), so spectra can be mixed, masked and
+# stacked along a leading batch axis before a single inverse FFT.
+
+def num_bins(frame_size: int = DEFAULT_FRAME_SIZE) -> int:
+    return frame_size // 2 + 1
+
+
+def max_harmonics(frame_size: int = DEFAULT_FRAME_SIZE) -> int:
+    """Highest harmonic that fits below Nyquist for a single-cycle frame."""
+    return frame_size // 2 - 1
+
+
+@lru_cache(maxsize=8)
+def _harmonic_index(frame_size: int) -> np.ndarray:
+    k = np.arange(num_bins(frame_size), dtype=np.float64)
+    k.setflags(write=False)
+    return k
+
+
+def _band_limit(spectrum: np.ndarray, num_harmonics: Optional[int], frame_size: int) -> np.ndarray:
+    limit = max_harmonics(frame_size) if num_harmonics is None else min(num_harmonics, max_harmonics(frame_size))
+    spectrum[..., 0] = 0.0  # Vital removes DC anyway; keep frames centred
+    spectrum[..., limit + 1:] = 0.0
+    return spectrum
+
+
+def sine_spectrum(frame_size: int = DEFAULT_FRAME_SIZE) -> np.ndarray:
+    spectrum = np.zeros(num_bins(frame_size), dtype=np.complex128)
+    spectrum[1] = -1j
+    return spectrum
+
+
+def saw_spectrum(num_harmonics: Optional[int] = None, frame_size: int = DEFAULT_FRAME_SIZE) -> np.ndarray:
+    """Rising ramp from -1 to 1 over one cycle: b_k = -2 / (pi * k)."""
+    k = _harmonic_index(frame_size)
+    spectrum = np.zeros(num_bins(frame_size), dtype=np.complex128)
+    spectrum[1:] = 1j * 2.0 / (np.pi * k[1:])
+    return _band_limit(spectrum, num_harmonics, frame_size)
+
+
+def triangle_spectrum(num_harmonics: Optional[int] = None, frame_size: int = DEFAULT_FRAME_SIZE) -> np.ndarray:
+    """Symmetric triangle in phase with sine: odd harmonics, alternating sign, 1/k^2 roll-off."""
+    k = _harmonic_index(frame_size)
+    spectrum = np.zeros(num_bins(frame_size), dtype=np.complex128)
+    odd = k[1::2]
+    signs = np.where(((odd - 1) / 2) % 2 == 0, 1.0, -1.0)
+    spectrum[1::2] = -1j * signs * 8.0 / (np.pi ** 2 * odd ** 2)
+    return _band_limit(spectrum, num_harmonics, frame_size)
+
+
+def pulse_spectrum(width: Union[float, np.ndarray] = 0.5,
+                   num_harmonics: Optional[int] = None,
+                   frame_size: int = DEFAULT_FRAME_SIZE) -> np.ndarray:
+    """
+    Pulse that is high for the first `width` of the cycle and low for the rest.
+
+    Args:
+        width (float or np.ndarray): Duty cycle in (0, 1). An array of widths
+            returns one spectrum per width, shape (len(width), bins).
+        num_harmonics (int, optional): Band limit; defaults to everything below Nyquist.
+        frame_size (int): Samples per frame.
+
+    Returns:
+        np.ndarray: Complex spectrum (or stack of spectra).
+    """
+    k = _harmonic_index(frame_size)[1:]
+    w = np.asarray(width, dtype=np.float64)[..., None]
+    a = (2.0 / (np.pi * k)) * np.sin(2 * np.pi * k * w)
+    b = (2.0 / (np.pi * k)) * (1.0 - np.cos(2 * np.pi * k * w))
+    spectrum = np.zeros(w.shape[:-1] + (num_bins(frame_size),), dtype=np.complex128)
+    spectrum[..., 1:] = a - 1j * b
+    return _band_limit(spectrum, num_harmonics, frame_size)
+
+
+# -------------------------------------------------------------------
+# Rendering
+# -------------------------------------------------------------------
+def spectra_to_frames(spectra: np.ndarray,
+                      frame_size: int = DEFAULT_FRAME_SIZE,
+                      normalize: bool = True) -> np.ndarray:
+    """
+    Render one or many spectra to single-cycle frames with one inverse real FFT.
+
+    Args:
+        spectra (np.ndarray): Complex spectra, shape (..., frame_size // 2 + 1).
+            Any leading axes are treated as a batch.
+        frame_size (int): Samples per output frame.
+        normalize (bool): Peak-normalise every frame to ±1.
+
+    Returns:
+        np.ndarray: float32 frames with shape (..., frame_size).
+    """
+    frames = np.fft.irfft(np.asarray(spectra) * (frame_size / 2), n=frame_size, axis=-1)
+    if normalize:
+        peaks = np.max(np.abs(frames), axis=-1, keepdims=True)
+        frames /= np.where(peaks > 0, peaks, 1.0)
+    return frames.astype(np.float32)